@@ -0,0 +1,138 @@
+"""
+Runs a Scrapy crawl through PaapiMiddleware against benchmarks/mockserver.py and reports requests per second,
+latency percentiles, CPU time and peak RSS of the crawling process.
+
+Usage: poetry run python benchmarks/bench_crawl.py [--requests 2000] [--concurrency 16] [--latency 0.05] ...
+
+Options other than --requests, --concurrency, --paapi-handler and --no-compression are passed to the mock server,
+e.g. --tps 50 to exercise throttling and retries, or --compression to compress responses.
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+
+from scrapy import Spider
+from scrapy.crawler import CrawlerProcess
+
+from scrapy_paapi.request import PaapiRequest
+
+ENDPOINT_HOST = "webservices.amazon.com"
+RESOURCES = ["ItemInfo.Title", "Offers.Listings.Price", "Offers.Listings.IsBuyBoxWinner", "Images.Primary.Large"]
+
+
+class BenchSpider(Spider):
+    name = "bench"
+
+    def __init__(self, base_url: str, request_count: int, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.base_url = base_url
+        self.request_count = request_count
+        self.latencies = []
+        self.item_count = 0
+
+    def start_requests(self):
+        for i in range(self.request_count):
+            item_ids = [f"B{i * 10 + j:09d}" for j in range(10)]
+            request = PaapiRequest.get_items("www.amazon.com", "tag-20", item_ids, resources=RESOURCES)
+            # Send to the mock server while signing for the real endpoint
+            request = request.replace(url=self.base_url + request.url.split(ENDPOINT_HOST, 1)[1])
+            request.headers["Host"] = ENDPOINT_HOST
+            yield request
+
+    async def start(self):
+        # Scrapy >= 2.13 calls start() instead of start_requests()
+        for request in self.start_requests():
+            yield request
+
+    def parse(self, response):
+        self.latencies.append(response.meta["download_latency"])
+        self.item_count += len(response.items)
+
+
+def start_mock_server(args):
+    """
+    Starts the mock server in a separate process so that its CPU time is not counted, and returns the process and
+    the base URL.
+    """
+
+    mockserver = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mockserver.py")
+    process = subprocess.Popen(
+        [sys.executable, mockserver, "--port", "0"] + args, stdout=subprocess.PIPE, universal_newlines=True
+    )
+    line = process.stdout.readline()
+    if not line.startswith("Listening on "):
+        process.kill()
+        raise RuntimeError(f"Mock server failed to start: {line!r}")
+    return process, line.split()[-1]
+
+
+def percentile(values, ratio: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * ratio))] if values else float("nan")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--paapi-handler", action="store_true", help="download with PaapiDownloadHandler")
+    parser.add_argument("--no-compression", action="store_true", help="set PAAPI_COMPRESSION_ENABLED = False")
+    args, server_args = parser.parse_known_args()
+    handler = "scrapy_paapi.handler.PaapiDownloadHandler"
+
+    process, base_url = start_mock_server(server_args)
+    try:
+        crawler_process = CrawlerProcess(
+            {
+                "AMAZON_ACCESS_KEY": "MOCKACCESSKEY",
+                "AMAZON_SECRET_KEY": "MOCKSECRETKEY",
+                "DOWNLOADER_MIDDLEWARES": {
+                    "scrapy_paapi.PaapiRetryMiddleware": 555,
+                    "scrapy_paapi.PaapiMiddleware": 560,
+                },
+                "CONCURRENT_REQUESTS": args.concurrency,
+                "CONCURRENT_REQUESTS_PER_DOMAIN": args.concurrency,
+                "PAAPI_RETRY_BACKOFF_BASE": 0.1,
+                "LOG_LEVEL": os.environ.get("LOG_LEVEL", "WARNING"),
+                "TELNETCONSOLE_ENABLED": False,
+                "COOKIES_ENABLED": False,
+                "DOWNLOAD_HANDLERS": {"http": handler, "https": handler} if args.paapi_handler else {},
+                "PAAPI_COMPRESSION_ENABLED": not args.no_compression,
+            }
+        )
+        crawler = crawler_process.create_crawler(BenchSpider)
+        usage_before = resource.getrusage(resource.RUSAGE_SELF)
+        started_at = time.perf_counter()
+        crawler_process.crawl(crawler, base_url=base_url, request_count=args.requests)
+        crawler_process.start()
+        elapsed = time.perf_counter() - started_at
+        usage_after = resource.getrusage(resource.RUSAGE_SELF)
+    finally:
+        process.terminate()
+        process.wait()
+
+    spider = crawler.spider
+    cpu = (usage_after.ru_utime - usage_before.ru_utime) + (usage_after.ru_stime - usage_before.ru_stime)
+    stats = crawler.stats.get_stats()
+    print(f"{'responses':>16}: {len(spider.latencies):10d} ({spider.item_count} items)")
+    print(f"{'errors':>16}: {stats.get('spider_exceptions/count', 0) + stats.get('log_count/ERROR', 0):10d}")
+    print(f"{'retries':>16}: {stats.get('paapi/retry/count', 0):10d}")
+    print(f"{'elapsed':>16}: {elapsed:10.2f} s")
+    print(f"{'requests/sec':>16}: {len(spider.latencies) / elapsed:10.1f}")
+    print(f"{'latency p50':>16}: {percentile(spider.latencies, 0.5) * 1000:10.1f} ms")
+    print(f"{'latency p99':>16}: {percentile(spider.latencies, 0.99) * 1000:10.1f} ms")
+    response_bytes = stats.get("paapi/response_bytes/GetItems", 0)
+    wire_bytes = stats.get("paapi/wire_bytes/GetItems")  # recorded with --paapi-handler
+    print(f"{'response bytes':>16}: {response_bytes / 2 ** 20:10.1f} MiB")
+    if wire_bytes is not None:
+        print(f"{'wire bytes':>16}: {wire_bytes / 2 ** 20:10.1f} MiB ({1 - wire_bytes / response_bytes:.0%} saved)")
+    print(f"{'CPU':>16}: {cpu:10.2f} s ({cpu / elapsed:.0%} of elapsed)")
+    print(f"{'peak RSS':>16}: {usage_after.ru_maxrss / 1024:10.1f} MiB")  # ru_maxrss is in KiB on Linux
+
+
+if __name__ == "__main__":
+    main()
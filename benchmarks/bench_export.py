@@ -0,0 +1,38 @@
+"""
+Compares the time and the size of exporting items with JsonLinesItemExporter and the columnar exporters.
+
+Usage: poetry run python benchmarks/bench_export.py [number of items]
+"""
+
+import io
+import sys
+import time
+
+from fixtures import make_asins, make_item
+from scrapy.exporters import JsonLinesItemExporter
+
+from scrapy_paapi.exporters import PaapiArrowItemExporter, PaapiParquetItemExporter
+
+
+def export(exporter_cls, items):
+    f = io.BytesIO()
+    started_at = time.perf_counter()
+    exporter = exporter_cls(f)
+    exporter.start_exporting()
+    for item in items:
+        exporter.export_item(item)
+    exporter.finish_exporting()
+    return time.perf_counter() - started_at, len(f.getvalue())
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    items = [make_item(asin) for asin in make_asins(count)]
+
+    for exporter_cls in (JsonLinesItemExporter, PaapiParquetItemExporter, PaapiArrowItemExporter):
+        elapsed, size = export(exporter_cls, items)
+        print(f"{exporter_cls.__name__:>24}: {count / elapsed:10.0f} items/sec {size / count:8.0f} bytes/item")
+
+
+if __name__ == "__main__":
+    main()
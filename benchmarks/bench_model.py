@@ -0,0 +1,41 @@
+"""
+Compares memory usage of items kept as dicts and as Item models.
+
+Usage: poetry run python benchmarks/bench_model.py [number of items]
+"""
+import gc
+import json
+import sys
+import tracemalloc
+
+from fixtures import make_asins, make_get_items_response
+
+from scrapy_paapi.model import Item
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+
+    bodies = [json.dumps(make_get_items_response(item_ids)) for item_ids in zip(*[iter(make_asins(count))] * 10)]
+
+    _, dict_bytes = measure(lambda: [item for body in bodies for item in json.loads(body)["ItemsResult"]["Items"]])
+    _, model_bytes = measure(
+        lambda: [Item.from_dict(item) for body in bodies for item in json.loads(body)["ItemsResult"]["Items"]]
+    )
+
+    print(f" dict: {dict_bytes / count:8.0f} bytes/item")
+    print(f"model: {model_bytes / count:8.0f} bytes/item ({model_bytes / dict_bytes:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Measures GetItems requests built per second with PaapiRequest.get_items() and PaapiRequestTemplate.
+
+Usage: poetry run python benchmarks/bench_request.py [number]
+"""
+
+import sys
+import timeit
+
+from scrapy_paapi.request import PaapiRequest, PaapiRequestTemplate
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    item_ids = [f"B{i:09d}" for i in range(10)]
+
+    elapsed = timeit.timeit(lambda: PaapiRequest.get_items("www.amazon.com", "tag-20", item_ids), number=number)
+    print(f"{'get_items()':>12}: {number / elapsed:10.0f} requests/sec")
+
+    template = PaapiRequestTemplate("www.amazon.com", "tag-20", "GetItems")
+    elapsed = timeit.timeit(lambda: template.request({"ItemIds": item_ids}), number=number)
+    print(f"{'template':>12}: {number / elapsed:10.0f} requests/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""
+Measures parsing of GetItems responses with all resources requested.
+
+Usage: poetry run python benchmarks/bench_response.py [number]
+"""
+import json
+import sys
+import timeit
+
+from fixtures import make_asins, make_get_items_response
+
+from scrapy_paapi import utils
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+
+
+def access_items(response: GetItemsResponse):
+    # Typical callback that reads a few fields of every item through the accessors
+    for item in response.items:
+        item["ItemInfo"]["Title"]["DisplayValue"]
+    for item in response.iter_items():
+        item["Offers"]["Listings"][0]["Price"]["Amount"]
+    len(response.items)
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+    item_ids = make_asins(10)
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", item_ids)
+    body = json.dumps(make_get_items_response(item_ids)).encode("utf-8")
+    print(f"payload: {len(body)} bytes, {len(item_ids)} items")
+
+    backends = [("json", None)]
+    if utils.orjson is not None:
+        backends.append(("orjson", utils.orjson))
+
+    for label, backend in backends:
+        utils.orjson = backend
+        elapsed = timeit.timeit(
+            lambda: access_items(GetItemsResponse(request.url, body=body, request=request)),
+            number=number,
+        )
+        print(f"{label:>8}: {number / elapsed:10.0f} responses/sec")
+
+
+if __name__ == "__main__":
+    main()
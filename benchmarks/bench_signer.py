@@ -0,0 +1,32 @@
+"""
+Measures signatures per second of Signer with and without the signing key cache.
+
+Usage: poetry run python benchmarks/bench_signer.py [number]
+"""
+
+import sys
+import timeit
+
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.signer import Signer
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B00TEST000"])
+    request.headers.setdefault("host", "webservices.amazon.com")
+
+    for label, max_cached_keys in (("before (no key cache)", 0), ("after (key cache)", 16)):
+        signer = Signer("ACCESS_KEY", "SECRET_KEY", max_cached_keys=max_cached_keys)
+        elapsed = timeit.timeit(
+            lambda: signer.get_authorization_headers(
+                "us-east-1", request.method, request.url, request.headers, request.body
+            ),
+            number=number,
+        )
+        print(f"{label:>24}: {number / elapsed:10.0f} signatures/sec")
+
+
+if __name__ == "__main__":
+    main()
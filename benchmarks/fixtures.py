@@ -0,0 +1,146 @@
+"""
+Generators of representative PA-API payloads with all resources requested.
+"""
+
+import random
+from typing import List
+
+
+def _price(amount: float, currency: str = "USD") -> dict:
+    return {"Amount": amount, "Currency": currency, "DisplayAmount": f"${amount:,.2f}"}
+
+
+def _display_value(value, label: str, locale: str = "en_US") -> dict:
+    return {"DisplayValue": value, "Label": label, "Locale": locale}
+
+
+def make_browse_node(node_id: str, depth: int = 3) -> dict:
+    node = {
+        "ContextFreeName": f"Category {node_id}",
+        "DisplayName": f"Category {node_id}",
+        "Id": node_id,
+        "IsRoot": depth == 0,
+        "SalesRank": random.randint(1, 100000),
+    }
+    if depth > 0:
+        node["Ancestor"] = make_browse_node(str(int(node_id) // 10), depth - 1)
+    return node
+
+
+def make_image(size: int) -> dict:
+    return {
+        "URL": f"https://m.media-amazon.com/images/I/{random.getrandbits(48):012x}._SL{size}_.jpg",
+        "Height": size,
+        "Width": size,
+    }
+
+
+def make_listing(index: int) -> dict:
+    amount = round(random.uniform(5, 500), 2)
+    return {
+        "Availability": {"MaxOrderQuantity": 30, "Message": "In Stock.", "MinOrderQuantity": 1, "Type": "Now"},
+        "Condition": {"SubCondition": {"Value": "New"}, "Value": "New"},
+        "DeliveryInfo": {"IsAmazonFulfilled": True, "IsFreeShippingEligible": True, "IsPrimeEligible": True},
+        "Id": f"listing-{random.getrandbits(64):016x}",
+        "IsBuyBoxWinner": index == 0,
+        "LoyaltyPoints": {"Points": 0},
+        "MerchantInfo": {"Id": "ATVPDKIKX0DER", "Name": "Amazon.com"},
+        "Price": _price(amount),
+        "ProgramEligibility": {"IsPrimeExclusive": False, "IsPrimePantry": False},
+        "SavingBasis": _price(round(amount * 1.2, 2)),
+        "ViolatesMAP": False,
+    }
+
+
+def make_item(asin: str, marketplace: str = "www.amazon.com") -> dict:
+    node_id = str(random.randint(1000000, 9999999))
+    return {
+        "ASIN": asin,
+        "BrowseNodeInfo": {
+            "BrowseNodes": [make_browse_node(node_id), make_browse_node(str(int(node_id) + 1))],
+            "WebsiteSalesRank": {"ContextFreeName": "Electronics", "DisplayName": "Electronics", "SalesRank": 123},
+        },
+        "DetailPageURL": f"https://{marketplace}/dp/{asin}?tag=tag-20&linkCode=ogi&th=1&psc=1",
+        "Images": {
+            "Primary": {"Large": make_image(500), "Medium": make_image(160), "Small": make_image(75)},
+            "Variants": [
+                {"Large": make_image(500), "Medium": make_image(160), "Small": make_image(75)} for _ in range(5)
+            ],
+        },
+        "ItemInfo": {
+            "ByLineInfo": {
+                "Brand": _display_value("Brand", "Brand"),
+                "Manufacturer": _display_value("Manufacturer Inc.", "Manufacturer"),
+            },
+            "Classifications": {
+                "Binding": _display_value("Electronics", "Binding"),
+                "ProductGroup": _display_value("Home Theater", "ProductGroup"),
+            },
+            "ExternalIds": {
+                "EANs": {
+                    "DisplayValues": [f"{random.randint(0, 10 ** 13 - 1):013d}"],
+                    "Label": "EAN",
+                    "Locale": "en_US",
+                },
+                "UPCs": {
+                    "DisplayValues": [f"{random.randint(0, 10 ** 12 - 1):012d}"],
+                    "Label": "UPC",
+                    "Locale": "en_US",
+                },
+            },
+            "Features": {
+                "DisplayValues": [f"Feature sentence number {i} describing the product in detail." for i in range(6)],
+                "Label": "Features",
+                "Locale": "en_US",
+            },
+            "ManufactureInfo": {
+                "ItemPartNumber": _display_value("PN-1234", "PartNumber"),
+                "Model": _display_value("M-1", "Model"),
+            },
+            "ProductInfo": {
+                "Color": _display_value("Black", "Color"),
+                "IsAdultProduct": _display_value(False, "IsAdultProduct"),
+                "ItemDimensions": {
+                    "Height": {"DisplayValue": 1.5, "Label": "Height", "Locale": "en_US", "Unit": "Inches"},
+                    "Length": {"DisplayValue": 4.1, "Label": "Length", "Locale": "en_US", "Unit": "Inches"},
+                    "Weight": {"DisplayValue": 0.7, "Label": "Weight", "Locale": "en_US", "Unit": "Pounds"},
+                    "Width": {"DisplayValue": 3.4, "Label": "Width", "Locale": "en_US", "Unit": "Inches"},
+                },
+                "UnitCount": _display_value(1, "NumberOfItems"),
+            },
+            "TechnicalInfo": {"Formats": {"DisplayValues": ["Import"], "Label": "Format", "Locale": "en_US"}},
+            "Title": _display_value(f"Product {asin} with a reasonably long descriptive title, Black", "Title"),
+            "TradeInInfo": {"IsEligibleForTradeIn": True, "Price": _price(10.0)},
+        },
+        "Offers": {
+            "Listings": [make_listing(i) for i in range(2)],
+            "Summaries": [
+                {
+                    "Condition": {"Value": "New"},
+                    "HighestPrice": _price(600.0),
+                    "LowestPrice": _price(5.0),
+                    "OfferCount": 12,
+                }
+            ],
+        },
+        "ParentASIN": "B0PARENT00",
+    }
+
+
+def make_asins(count: int) -> List[str]:
+    return [f"B{i:09d}" for i in range(count)]
+
+
+def make_get_items_response(item_ids: List[str], marketplace: str = "www.amazon.com") -> dict:
+    return {"ItemsResult": {"Items": [make_item(asin, marketplace) for asin in item_ids]}}
+
+
+def make_search_items_response(item_count: int = 10, total_result_count: int = 100, page: int = 1) -> dict:
+    asins = [f"B{page:03d}{i:06d}" for i in range(item_count)]
+    return {
+        "SearchResult": {
+            "Items": [make_item(asin) for asin in asins],
+            "SearchURL": "https://www.amazon.com/s?k=test",
+            "TotalResultCount": total_result_count,
+        }
+    }
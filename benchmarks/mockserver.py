@@ -0,0 +1,428 @@
+"""
+Local stand-in for PA-API 5 to run benchmarks offline.
+
+The server validates SigV4 signatures with scrapy_paapi.signer, serves GetItems, SearchItems, GetVariations and
+GetBrowseNodes with payloads of benchmarks/fixtures.py, returns only the requested resources, and emits the error
+shapes of the real API: signature errors (401), throttling (429), invalid parameters (400), missing results (404)
+and internal failures (500). With --compression, responses are compressed with gzip or br as accepted by the client.
+
+Usage: poetry run python benchmarks/mockserver.py [--port 8765] [--latency 0.05] [--tps 10] ...
+
+Send requests to http://127.0.0.1:<port>/paapi5/<operation> with the Host header of the real endpoint, e.g.
+webservices.amazon.com, so that the signature is computed for the right host and region.
+"""
+
+import argparse
+import datetime
+import gzip
+import json
+import random
+import re
+import sys
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+from twisted.internet import reactor
+from twisted.web.resource import Resource
+from twisted.web.server import NOT_DONE_YET, Site
+
+from fixtures import make_browse_node, make_image, make_item, make_listing
+from scrapy_paapi.constant import HOST_TO_REGIONS
+from scrapy_paapi.signer import Signer
+from scrapy_paapi.bucket import TokenBucket
+
+DEFAULT_CREDENTIALS = {"MOCKACCESSKEY": "MOCKSECRETKEY"}
+
+PATH_TO_OPERATIONS = {
+    "/paapi5/getbrowsenodes": "GetBrowseNodes",
+    "/paapi5/getitems": "GetItems",
+    "/paapi5/getvariations": "GetVariations",
+    "/paapi5/searchitems": "SearchItems",
+}
+
+# Keys returned regardless of the requested resources
+ITEM_BASE_KEYS = ("ASIN", "DetailPageURL")
+BROWSE_NODE_BASE_KEYS = ("ContextFreeName", "DisplayName", "Id", "IsRoot")
+
+AUTHORIZATION_PATTERN = re.compile(
+    r"AWS4-HMAC-SHA256 Credential=(?P<access_key>[^/]+)/(?P<date>\d{8})/(?P<region>[^/]+)/(?P<service>[^/]+)/"
+    r"aws4_request, SignedHeaders=(?P<signed_headers>[^,]+), Signature=(?P<signature>[0-9a-f]+)"
+)
+
+
+class PaapiError(Exception):
+    def __init__(self, status: int, exception: str, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.exception = exception
+        self.code = code
+        self.message = message
+
+    def to_dict(self) -> dict:
+        return {
+            "__type": f"com.amazon.paapi5#{self.exception}",
+            "Errors": [{"Code": self.code, "Message": self.message}],
+        }
+
+
+def item_error(item_id: str) -> dict:
+    return {
+        "__type": "com.amazon.paapi5#ErrorData",
+        "Code": "InvalidParameterValue",
+        "Message": f"The ItemId {item_id} provided in the request is invalid.",
+    }
+
+
+def select_resources(data: dict, resources: List[str], base_keys: Tuple[str, ...], root: str = "") -> dict:
+    """
+    Returns a copy of data containing only base_keys and the paths of resources starting with root,
+    e.g. "Offers.Listings.Price" keeps the Price of every listing.
+    """
+
+    selected = {key: data[key] for key in base_keys if key in data}
+    prefix = root + "." if root else ""
+    for resource in resources:
+        if resource.startswith(prefix):
+            _copy_path(data, selected, resource[len(prefix) :].split("."))
+    return selected
+
+
+def _copy_path(src: dict, dst: dict, path: List[str]):
+    key, rest = path[0], path[1:]
+    if key not in src:
+        return
+    value = src[key]
+    if not rest:
+        dst[key] = value
+    elif isinstance(value, list):
+        target = dst.setdefault(key, [{} for _ in value])
+        for src_element, dst_element in zip(value, target):
+            if isinstance(src_element, dict):
+                _copy_path(src_element, dst_element, rest)
+    elif isinstance(value, dict):
+        _copy_path(value, dst.setdefault(key, {}), rest)
+
+
+class MockPaapi:
+    """
+    Stateful behavior of the server, independent of the transport.
+    """
+
+    def __init__(
+        self,
+        credentials: Optional[Dict[str, str]] = None,
+        tps: Optional[float] = None,
+        error_rate: float = 0.0,
+        listing_count: int = 2,
+        image_variant_count: int = 5,
+        search_result_count: int = 100,
+        variation_count: int = 25,
+        browse_node_children: int = 3,
+        browse_node_depth: int = 4,
+        max_cached_items: int = 100000,
+    ):
+        self._signers = {
+            access_key: Signer(access_key, secret_key)
+            for access_key, secret_key in (credentials or DEFAULT_CREDENTIALS).items()
+        }
+        self._tps = tps
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._error_rate = error_rate
+        self._listing_count = listing_count
+        self._image_variant_count = image_variant_count
+        self._search_result_count = search_result_count
+        self._variation_count = variation_count
+        self._browse_node_children = browse_node_children
+        self._browse_node_depth = browse_node_depth
+        self._max_cached_items = max_cached_items
+        self._items = OrderedDict()  # (marketplace, asin) -> item, so that the same ASIN returns the same item
+
+    def handle(self, method: str, path: str, headers: Dict[bytes, bytes], body: bytes) -> Tuple[int, dict]:
+        """
+        Returns a tuple of the HTTP status and the JSON payload. headers must have lowercase names.
+        """
+
+        try:
+            operation = PATH_TO_OPERATIONS.get(path)
+            if operation is None:
+                raise PaapiError(404, "UnknownOperationException", "UnknownOperation", "The operation is unknown.")
+            access_key = self._verify_signature(method, path, headers, body)
+            self._throttle(access_key)
+            if self._error_rate and random.random() < self._error_rate:
+                raise PaapiError(
+                    500, "InternalFailureException", "InternalFailure", "The request processing has failed."
+                )
+
+            try:
+                data = json.loads(body)
+            except ValueError:
+                raise PaapiError(400, "InvalidPayloadException", "InvalidPayload", "The request has invalid JSON.")
+            if not isinstance(data, dict) or not data.get("PartnerTag"):
+                raise PaapiError(
+                    400, "MissingParameterException", "MissingParameter", "The request is missing PartnerTag."
+                )
+
+            return getattr(self, f"_handle_{operation}")(data)
+        except PaapiError as e:
+            return e.status, e.to_dict()
+
+    def _verify_signature(self, method: str, path: str, headers: Dict[bytes, bytes], body: bytes) -> str:
+        authorization = headers.get(b"authorization", b"").decode("utf-8")
+        amz_date = headers.get(b"x-amz-date", b"").decode("utf-8")
+        m = AUTHORIZATION_PATTERN.fullmatch(authorization)
+        if m is None or not amz_date:
+            raise PaapiError(
+                401, "IncompleteSignatureException", "IncompleteSignature", "The request signature is incomplete."
+            )
+
+        signer = self._signers.get(m.group("access_key"))
+        if signer is None:
+            raise PaapiError(
+                401,
+                "UnrecognizedClientException",
+                "UnrecognizedClient",
+                "The Access Key ID or security token included in the request is invalid.",
+            )
+
+        signed_headers = {}
+        for name in m.group("signed_headers").split(";"):
+            value = headers.get(name.encode("utf-8"))
+            if value is None:
+                raise PaapiError(
+                    401, "IncompleteSignatureException", "IncompleteSignature", f"The header {name} is not sent."
+                )
+            signed_headers[name.encode("utf-8")] = value
+
+        host = headers.get(b"host", b"").decode("utf-8")
+        region = HOST_TO_REGIONS.get(host)
+        if region != m.group("region"):
+            raise PaapiError(
+                401, "InvalidSignatureException", "InvalidSignature", f"The region is invalid for the host {host}."
+            )
+
+        now = datetime.datetime.strptime(amz_date, "%Y%m%dT%H%M%SZ")
+        expected = signer.get_authorization_headers(region, method, f"https://{host}{path}", signed_headers, body, now)
+        if expected["Authorization"] != authorization:
+            raise PaapiError(
+                401,
+                "InvalidSignatureException",
+                "InvalidSignature",
+                "The request signature we calculated does not match the signature you provided.",
+            )
+        return signer.access_key
+
+    def _throttle(self, access_key: str):
+        if self._tps is None:
+            return
+
+        bucket = self._buckets.get(access_key)
+        if bucket is None:
+            bucket = self._buckets[access_key] = TokenBucket(self._tps, max(1.0, self._tps))
+        if bucket.available() < 1:
+            raise PaapiError(
+                429,
+                "TooManyRequestsException",
+                "TooManyRequests",
+                "The request was denied due to request throttling. Please verify the number of requests made per "
+                "second to the Amazon Product Advertising API.",
+            )
+        bucket.reserve()
+
+    def _get_item(self, asin: str, marketplace: str) -> dict:
+        key = (marketplace, asin)
+        item = self._items.get(key)
+        if item is None:
+            item = make_item(asin, marketplace)
+            item["Offers"]["Listings"] = [make_listing(i) for i in range(self._listing_count)]
+            item["Images"]["Variants"] = [
+                {"Large": make_image(500), "Medium": make_image(160), "Small": make_image(75)}
+                for _ in range(self._image_variant_count)
+            ]
+            if len(self._items) >= self._max_cached_items:
+                self._items.popitem(last=False)
+            self._items[key] = item
+        return item
+
+    def _get_items(self, data: dict, asins: List[str]) -> List[dict]:
+        marketplace = data.get("Marketplace", "www.amazon.com")
+        resources = data.get("Resources", [])
+        return [select_resources(self._get_item(asin, marketplace), resources, ITEM_BASE_KEYS) for asin in asins]
+
+    def _handle_GetItems(self, data: dict) -> Tuple[int, dict]:
+        item_ids = data.get("ItemIds") or []
+        if not 1 <= len(item_ids) <= 10:
+            raise PaapiError(
+                400, "InvalidParameterValueException", "InvalidParameterValue", "ItemIds must have 1 to 10 items."
+            )
+
+        valid_item_ids = [item_id for item_id in item_ids if not item_id.startswith("BINVALID")]
+        errors = [item_error(item_id) for item_id in item_ids if item_id.startswith("BINVALID")]
+        if not valid_item_ids:
+            return 400, {"__type": "com.amazon.paapi5#InvalidParameterValueException", "Errors": errors}
+
+        payload = {"ItemsResult": {"Items": self._get_items(data, valid_item_ids)}}
+        if errors:
+            payload["Errors"] = errors
+        return 200, payload
+
+    def _handle_SearchItems(self, data: dict) -> Tuple[int, dict]:
+        item_count = data.get("ItemCount", 10)
+        item_page = data.get("ItemPage", 1)
+        if not 1 <= item_page <= 10:
+            raise PaapiError(
+                400,
+                "InvalidParameterValueException",
+                "InvalidParameterValue",
+                f"The value [{item_page}] provided in the request for ItemPage is invalid. "
+                "The value must be between 1 and 10.",
+            )
+
+        start = (item_page - 1) * item_count
+        stop = min(start + item_count, self._search_result_count)
+        if start >= stop:
+            raise PaapiError(404, "ResourceNotFoundException", "NoResults", "No results found for your request.")
+
+        seed = data.get("Keywords") or data.get("BrowseNodeId") or ""
+        asins = [f"BS{zlib.crc32(seed.encode()) % 10 ** 4:04d}{i:04d}" for i in range(start, stop)]
+        return 200, {
+            "SearchResult": {
+                "Items": self._get_items(data, asins),
+                "SearchURL": f"https://{data.get('Marketplace', 'www.amazon.com')}/s?k={seed}",
+                "TotalResultCount": self._search_result_count,
+            }
+        }
+
+    def _handle_GetVariations(self, data: dict) -> Tuple[int, dict]:
+        asin = data.get("ASIN")
+        if not asin:
+            raise PaapiError(400, "MissingParameterException", "MissingParameter", "The request is missing ASIN.")
+
+        variation_count = data.get("VariationCount", 10)
+        variation_page = data.get("VariationPage", 1)
+        page_count = -(-self._variation_count // variation_count)
+        if variation_page > page_count:
+            raise PaapiError(404, "ResourceNotFoundException", "NoResults", "No results found for your request.")
+
+        start = (variation_page - 1) * variation_count
+        stop = min(start + variation_count, self._variation_count)
+        asins = [f"BV{asin[-4:]}{i:04d}" for i in range(start, stop)]
+        return 200, {
+            "VariationsResult": {
+                "Items": self._get_items(data, asins),
+                "VariationSummary": {
+                    "PageCount": page_count,
+                    "VariationCount": self._variation_count,
+                    "VariationDimensions": [
+                        {"DisplayName": "Color", "Locale": "en_US", "Name": "color_name", "Values": ["Black"]}
+                    ],
+                },
+            }
+        }
+
+    def _handle_GetBrowseNodes(self, data: dict) -> Tuple[int, dict]:
+        browse_node_ids = data.get("BrowseNodeIds") or []
+        resources = data.get("Resources", [])
+        browse_nodes = []
+        for browse_node_id in browse_node_ids:
+            if not browse_node_id.isdigit():
+                raise PaapiError(
+                    400,
+                    "InvalidParameterValueException",
+                    "InvalidParameterValue",
+                    f"The BrowseNodeId {browse_node_id} provided in the request is invalid.",
+                )
+            depth = len(browse_node_id) - 1
+            browse_node = make_browse_node(browse_node_id, depth)
+            if depth + 1 < self._browse_node_depth:
+                browse_node["Children"] = [
+                    {
+                        "ContextFreeName": f"Category {child_id}",
+                        "DisplayName": f"Category {child_id}",
+                        "Id": child_id,
+                    }
+                    for child_id in (f"{browse_node_id}{i}" for i in range(self._browse_node_children))
+                ]
+            browse_nodes.append(select_resources(browse_node, resources, BROWSE_NODE_BASE_KEYS, "BrowseNodes"))
+        return 200, {"BrowseNodesResult": {"BrowseNodes": browse_nodes}}
+
+
+class MockPaapiResource(Resource):
+    isLeaf = True
+
+    def __init__(self, paapi: MockPaapi, latency: float = 0.0, latency_jitter: float = 0.0, compression: bool = False):
+        super().__init__()
+        self._paapi = paapi
+        self._latency = latency
+        self._latency_jitter = latency_jitter
+        self._compression = compression
+
+    def _compress(self, request, body: bytes) -> bytes:
+        accept_encoding = [e.split(b";")[0].strip() for e in (request.getHeader(b"accept-encoding") or b"").split(b",")]
+        if b"br" in accept_encoding and brotli is not None:
+            request.setHeader(b"Content-Encoding", b"br")
+            return brotli.compress(body, quality=4)
+        if b"gzip" in accept_encoding:
+            request.setHeader(b"Content-Encoding", b"gzip")
+            return gzip.compress(body, compresslevel=6)
+        return body
+
+    def render_POST(self, request):
+        headers = {name.lower(): value for name, value in request.getAllHeaders().items()}
+        status, payload = self._paapi.handle("POST", request.path.decode("utf-8"), headers, request.content.read())
+        body = json.dumps(payload).encode("utf-8")
+
+        request.setResponseCode(status)
+        request.setHeader(b"Content-Type", b"application/json")
+        if self._compression:
+            body = self._compress(request, body)
+        delay = self._latency + random.uniform(0, self._latency_jitter)
+        if delay <= 0:
+            return body
+
+        def finish():
+            if not request.finished and not request._disconnected:
+                request.write(body)
+                request.finish()
+
+        reactor.callLater(delay, finish)
+        return NOT_DONE_YET
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 chooses a free port")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before responding")
+    parser.add_argument("--latency-jitter", type=float, default=0.0, help="random seconds added to --latency")
+    parser.add_argument("--tps", type=float, help="requests per second per access key before returning 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="ratio of InternalFailure (500) responses")
+    parser.add_argument("--listing-count", type=int, default=2, help="Offers.Listings per item")
+    parser.add_argument("--image-variant-count", type=int, default=5, help="Images.Variants per item")
+    parser.add_argument("--compression", action="store_true", help="compress responses as in Accept-Encoding")
+    parser.add_argument("--access-key", default="MOCKACCESSKEY")
+    parser.add_argument("--secret-key", default="MOCKSECRETKEY")
+    args = parser.parse_args(argv)
+
+    paapi = MockPaapi(
+        credentials={args.access_key: args.secret_key},
+        tps=args.tps,
+        error_rate=args.error_rate,
+        listing_count=args.listing_count,
+        image_variant_count=args.image_variant_count,
+    )
+    site = Site(
+        MockPaapiResource(paapi, latency=args.latency, latency_jitter=args.latency_jitter, compression=args.compression)
+    )
+    site.noisy = False
+    port = reactor.listenTCP(args.port, site, interface=args.host)
+    print(f"Listening on http://{args.host}:{port.getHost().port}", flush=True)  # read by bench_crawl.py
+    reactor.run()
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,6 +1,23 @@
 __version__ = "0.1.0"
 
+from .batch import PaapiBatchMiddleware
+from .dedup import PaapiDedupMiddleware
+from .localization import PaapiLocalizationMiddleware
 from .middleware import PaapiMiddleware
+from .minimizer import PaapiResourceMinimizerMiddleware, PaapiResourceMinimizerSpiderMiddleware
 from .request import PaapiRequest
+from .retry import PaapiRetryMiddleware
+from .throttle import PaapiThrottleMiddleware
 
-__all__ = ["__version__", "PaapiMiddleware", "PaapiRequest"]
+__all__ = [
+    "__version__",
+    "PaapiBatchMiddleware",
+    "PaapiDedupMiddleware",
+    "PaapiLocalizationMiddleware",
+    "PaapiMiddleware",
+    "PaapiRequest",
+    "PaapiResourceMinimizerMiddleware",
+    "PaapiResourceMinimizerSpiderMiddleware",
+    "PaapiRetryMiddleware",
+    "PaapiThrottleMiddleware",
+]
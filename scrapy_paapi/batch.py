@@ -0,0 +1,194 @@
+import json
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DontCloseSpider
+from scrapy.http import Response
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import Deferred
+
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.utils import download, get_reactor
+
+MAX_ITEM_IDS = 10
+
+# Meta keys that change how a request is downloaded. Only requests with the same values are batched together.
+DOWNLOAD_META_KEYS = (
+    "paapi_access_key",
+    "download_timeout",
+    "download_slot",
+    "proxy",
+    "handle_httpstatus_list",
+    "handle_httpstatus_all",
+    "dont_retry",
+    "max_retry_times",
+    "dont_cache",
+)
+
+
+def get_error_item_ids(error: dict, item_ids: List[str]) -> List[str]:
+    """
+    Returns the ItemIds mentioned in an entry of Errors, e.g.
+    "The ItemId B000000000 is not accessible through the Product Advertising API."
+    """
+
+    message = error.get("Message", "")
+    return [item_id for item_id in item_ids if item_id in message]
+
+
+def get_params_key(request: PaapiRequest, exclude: Tuple[str, ...] = ("ItemIds",)) -> str:
+    """
+    Returns a key identifying the endpoint and parameters other than ItemIds of a GetItems request, or other than
+    the exclude parameters.
+    """
+
+    params = dict(request.paapi_data)
+    for key in exclude:
+        params.pop(key, None)
+    return request.url + " " + json.dumps(params, sort_keys=True)
+
+
+def split_get_items_data(data: dict, item_ids: List[str]) -> dict:
+    """
+    Extracts the part of a GetItems response related to the item_ids.
+    """
+
+    split_data = {}
+    items = [item for item in data.get("ItemsResult", {}).get("Items", []) if item["ASIN"] in item_ids]
+    if items:
+        split_data["ItemsResult"] = {"Items": items}
+    errors = [error for error in data.get("Errors", []) if get_error_item_ids(error, item_ids)]
+    if errors:
+        split_data["Errors"] = errors
+    return split_data
+
+
+def get_batched_meta(request: PaapiRequest) -> dict:
+    """
+    Returns the meta of a batched request made from the request, i.e. its meta without the state that the
+    middlewares of this package keep per request, e.g. paapi_dedup_keys.
+    """
+
+    meta = {
+        key: value
+        for key, value in request.meta.items()
+        if not key.startswith("paapi_") or key in ("paapi_access_key", "paapi_operation")
+    }
+    meta["paapi_batched"] = True
+    return meta
+
+
+class _Batch:
+    def __init__(self):
+        self.pending: List[Tuple[PaapiRequest, Deferred]] = []
+        self.item_ids: Dict[str, None] = OrderedDict()  # ordered set
+        self.delayed_call = None
+
+
+class PaapiBatchMiddleware:
+    """
+    Packs GetItems requests that have fewer ItemIds than the limit into batched requests of up to 10 ItemIds.
+
+    Pending requests are grouped by endpoint and parameters other than ItemIds, i.e. marketplace, partner tag,
+    resources and so on, and by the meta in DOWNLOAD_META_KEYS. A group is flushed when it is full or
+    PAAPI_BATCH_LINGER seconds after its first request, or when the spider is idle. The batched request keeps the
+    meta of the first request, and its response is split into responses for each original request.
+
+    The split responses have paapi_batch_split set in their meta. When the batched request fails, e.g. with
+    TooManyRequests, every original request receives the same error response, which has already been retried as
+    a part of the batched request.
+
+    This middleware must be placed before PaapiMiddleware.
+    """
+
+    def __init__(self, crawler: Crawler, linger: float, max_item_ids: int):
+        self._crawler = crawler
+        self._stats = crawler.stats
+        self._linger = linger
+        self._max_item_ids = max_item_ids
+        self._batches: Dict[str, _Batch] = {}
+        self._spider = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        middleware = cls(
+            crawler=crawler,
+            linger=crawler.settings.getfloat("PAAPI_BATCH_LINGER", 0.1),
+            max_item_ids=crawler.settings.getint("PAAPI_BATCH_MAX_ITEM_IDS", MAX_ITEM_IDS),
+        )
+        crawler.signals.connect(middleware.spider_idle, signal=signals.spider_idle)
+        return middleware
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, PaapiRequest) or request.meta["paapi_operation"] != "GetItems":
+            return  # proceed to next middleware
+        if request.meta.get("paapi_batched") or request.meta.get("paapi_batch_disabled"):
+            return
+
+        data = request.paapi_data
+        item_ids = data["ItemIds"]
+        if len(item_ids) >= self._max_item_ids:
+            return
+
+        self._spider = spider
+        key = get_params_key(request) + " " + repr([request.meta.get(key) for key in DOWNLOAD_META_KEYS])
+
+        batch = self._batches.get(key)
+        if batch is not None and len(batch.item_ids.keys() | item_ids) > self._max_item_ids:
+            self._flush(key)
+            batch = None
+        if batch is None:
+            batch = self._batches[key] = _Batch()
+            batch.delayed_call = get_reactor().callLater(self._linger, self._flush, key)
+
+        d = Deferred()
+        batch.pending.append((request, d))
+        batch.item_ids.update((item_id, None) for item_id in item_ids)
+        if len(batch.item_ids) >= self._max_item_ids:
+            self._flush(key)
+
+        return await maybe_deferred_to_future(d)
+
+    def spider_idle(self, spider):
+        if not self._batches:
+            return
+        for key in list(self._batches):
+            self._flush(key)
+        raise DontCloseSpider  # until the batched requests are downloaded
+
+    def _flush(self, key: str):
+        batch = self._batches.pop(key)
+        if batch.delayed_call.active():
+            batch.delayed_call.cancel()
+
+        first_request = batch.pending[0][0]
+        data = dict(first_request.paapi_data)
+        data["ItemIds"] = list(batch.item_ids)
+        batched_request = first_request.replace(data=data, meta=get_batched_meta(first_request), dont_filter=True)
+
+        self._stats.inc_value("paapi/batch/request_count")
+        self._stats.inc_value("paapi/batch/item_id_count", len(batch.item_ids))
+        self._stats.inc_value("paapi/batch/original_request_count", len(batch.pending))
+
+        d = download(self._crawler, batched_request, self._spider)
+        d.addCallbacks(self._split_response, self._fail_pending, callbackArgs=(batch,), errbackArgs=(batch,))
+
+    def _split_response(self, response: Response, batch: _Batch):
+        if response.status >= 400:
+            # The whole batch failed, e.g. TooManyRequests. Every originator receives the same error.
+            for request, d in batch.pending:
+                request.meta["paapi_batch_split"] = True
+                d.callback(response.replace(request=request))
+            return
+
+        data = response.json()
+        for request, d in batch.pending:
+            request.meta["paapi_batch_split"] = True
+            body = json.dumps(split_get_items_data(data, request.paapi_data["ItemIds"])).encode("utf-8")
+            d.callback(response.replace(request=request, body=body))
+
+    def _fail_pending(self, failure, batch: _Batch):
+        for _, d in batch.pending:
+            d.errback(failure)
@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from scrapy_paapi.checkpoint import CheckpointLog
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetBrowseNodesResponse
+
+MAX_BROWSE_NODE_IDS = 10
+
+
+class BrowseNodeRecord:
+    __slots__ = ("id", "display_name", "context_free_name", "parent_id", "children_ids", "fetched_at")
+
+    def __init__(
+        self,
+        id: str,
+        display_name: Optional[str] = None,
+        context_free_name: Optional[str] = None,
+        parent_id: Optional[str] = None,
+        children_ids: Optional[Tuple[str, ...]] = None,
+        fetched_at: Optional[float] = None,
+    ):
+        self.id = id
+        self.display_name = display_name
+        self.context_free_name = context_free_name
+        self.parent_id = parent_id
+        self.children_ids = children_ids  # None if unknown
+        self.fetched_at = fetched_at  # None if only seen as an ancestor or a child
+
+
+class BrowseNodeTree:
+    """
+    Adjacency index of browse nodes, which can be persisted to a gzipped JSON Lines file.
+    """
+
+    def __init__(self):
+        self.nodes: Dict[str, BrowseNodeRecord] = {}
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __contains__(self, node_id: str):
+        return node_id in self.nodes
+
+    def get(self, node_id: str) -> Optional[BrowseNodeRecord]:
+        return self.nodes.get(node_id)
+
+    def _get_or_create(self, node_id: str) -> BrowseNodeRecord:
+        record = self.nodes.get(node_id)
+        if record is None:
+            record = self.nodes[node_id] = BrowseNodeRecord(node_id)
+        return record
+
+    def _update_names(self, record: BrowseNodeRecord, browse_node: dict):
+        record.display_name = browse_node.get("DisplayName", record.display_name)
+        record.context_free_name = browse_node.get("ContextFreeName", record.context_free_name)
+
+    def add(self, browse_node: dict, fetched_at: Optional[float] = None):
+        """
+        Adds a browse node of GetBrowseNodes with its ancestors and children. Pass fetched_at if the browse node
+        was fetched with the BrowseNodes.Children resource.
+        """
+
+        record = self._get_or_create(browse_node["Id"])
+        self._update_names(record, browse_node)
+
+        child = record
+        ancestor = browse_node.get("Ancestor")
+        while ancestor is not None:
+            child.parent_id = ancestor["Id"]
+            child = self._get_or_create(ancestor["Id"])
+            self._update_names(child, ancestor)
+            ancestor = ancestor.get("Ancestor")
+
+        children = browse_node.get("Children")
+        if children is not None:
+            record.children_ids = tuple(c["Id"] for c in children)
+            for c in children:
+                child_record = self._get_or_create(c["Id"])
+                self._update_names(child_record, c)
+                child_record.parent_id = record.id
+        elif fetched_at is not None:
+            record.children_ids = ()  # Children is omitted for leaf nodes
+
+        if fetched_at is not None:
+            record.fetched_at = fetched_at
+
+    def is_fresh(self, node_id: str, ttl: float, now: Optional[float] = None) -> bool:
+        record = self.nodes.get(node_id)
+        if record is None or record.fetched_at is None or record.children_ids is None:
+            return False
+        return (time.time() if now is None else now) - record.fetched_at < ttl
+
+    def save(self, path: str):
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for r in self.nodes.values():
+                row = [r.id, r.display_name, r.context_free_name, r.parent_id, r.children_ids, r.fetched_at]
+                f.write(json.dumps(row, ensure_ascii=False, separators=(",", ":")))
+                f.write("\n")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "BrowseNodeTree":
+        """
+        Loads a tree saved by save(). Returns an empty tree if the file does not exist.
+        """
+
+        tree = cls()
+        if not os.path.exists(path):
+            return tree
+
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                node_id, display_name, context_free_name, parent_id, children_ids, fetched_at = json.loads(line)
+                tree.nodes[node_id] = BrowseNodeRecord(
+                    node_id,
+                    display_name,
+                    context_free_name,
+                    parent_id,
+                    None if children_ids is None else tuple(children_ids),
+                    fetched_at,
+                )
+        return tree
+
+
+class BrowseNodeTreeCrawler:
+    """
+    Traverses browse node trees with GetBrowseNodes, fetching up to 10 nodes per request.
+
+    Each node is requested at most once per crawl. Nodes fetched within ttl seconds are not requested again;
+    their children are taken from the tree instead. Likewise, nodes fetched before a restart are skipped if a
+    CheckpointLog is given as checkpoint, e.g. spider.paapi_checkpoint. Use it from a spider like this:
+
+        def start_requests(self):
+            self.tree = BrowseNodeTree.load("tree.jsonl.gz")
+            self.tree_crawler = BrowseNodeTreeCrawler("www.amazon.com", "yourtag-20", self.tree, ttl=86400)
+            yield from self.tree_crawler.start(["465600"])
+
+        def closed(self, reason):
+            self.tree.save("tree.jsonl.gz")
+    """
+
+    def __init__(
+        self,
+        marketplace: str,
+        partner_tag: str,
+        tree: BrowseNodeTree,
+        ttl: float = 7 * 24 * 60 * 60,
+        languages_of_preference: List[str] = None,
+        callback: Optional[Callable[[GetBrowseNodesResponse], Iterable]] = None,
+        checkpoint: Optional[CheckpointLog] = None,
+    ):
+        self.marketplace = marketplace
+        self.partner_tag = partner_tag
+        self.tree = tree
+        self.ttl = ttl
+        self.languages_of_preference = languages_of_preference
+        self.callback = callback
+        self.checkpoint = checkpoint
+        self._seen: Set[str] = set()
+        self._frontier: Deque[str] = deque()
+        self._in_flight = 0
+
+    def start(self, root_ids: List[str]) -> Iterator[PaapiRequest]:
+        self._enqueue(root_ids)
+        yield from self._drain()
+
+    def parse(self, response: GetBrowseNodesResponse) -> Iterator:
+        self._in_flight -= 1
+        now = time.time()
+
+        if "BrowseNodesResult" in response.json():
+            for browse_node in response.browse_nodes:
+                self.tree.add(browse_node, fetched_at=now)
+                self._enqueue(c["Id"] for c in browse_node.get("Children", []))
+
+        if self.callback is not None:
+            yield from self.callback(response) or ()
+        yield from self._drain()
+
+    def on_error(self, failure) -> Iterator[PaapiRequest]:
+        self._in_flight -= 1
+        yield from self._drain()
+
+    def _enqueue(self, node_ids: Iterable[str]):
+        stack = list(node_ids)
+        while stack:
+            node_id = stack.pop()
+            if node_id in self._seen:
+                continue
+            self._seen.add(node_id)
+
+            children_ids = self._get_known_children_ids(node_id)
+            if children_ids is not None:
+                stack.extend(children_ids)
+            else:
+                self._frontier.append(node_id)
+
+    def _get_known_children_ids(self, node_id: str) -> Optional[Tuple[str, ...]]:
+        """
+        Returns the children IDs of a node that need not be fetched, or None.
+        """
+
+        if self.tree.is_fresh(node_id, self.ttl):
+            return self.tree.get(node_id).children_ids
+        if self.checkpoint is not None:
+            return self.checkpoint.get_browse_node_children(self.marketplace, node_id)
+        return None
+
+    def _drain(self) -> Iterator[PaapiRequest]:
+        # Emit partially filled requests only when nothing is in flight, since in-flight responses may add more nodes.
+        while len(self._frontier) >= MAX_BROWSE_NODE_IDS or (self._frontier and self._in_flight == 0):
+            count = min(MAX_BROWSE_NODE_IDS, len(self._frontier))
+            browse_node_ids = [self._frontier.popleft() for _ in range(count)]
+            self._in_flight += 1
+            yield PaapiRequest.get_browse_nodes(
+                self.marketplace,
+                self.partner_tag,
+                browse_node_ids=browse_node_ids,
+                languages_of_preference=self.languages_of_preference,
+                callback=self.parse,
+                errback=self.on_error,
+                dont_filter=True,
+            )
@@ -0,0 +1,132 @@
+"""
+Token buckets of PA-API quotas, used by PaapiThrottleMiddleware and CredentialPool.
+"""
+
+import os
+import struct
+import time
+from typing import Callable, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # e.g. Windows
+    fcntl = None
+
+
+class TokenBucket:
+    """
+    Token bucket that hands out reservations instead of rejecting requests.
+
+    reserve() always takes a token and returns how many seconds the caller has to wait until the token is
+    actually available, so that concurrent callers are spaced out evenly.
+    """
+
+    def __init__(self, rate: float, capacity: float, now: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        self._refill(time.monotonic() if now is None else now)
+        return self._tokens
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        self._refill(time.monotonic() if now is None else now)
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        return -self._tokens / self.rate
+
+    def adjust_rate(self, adjust: Callable[[float], float], now: Optional[float] = None) -> float:
+        """
+        Changes the rate to adjust(rate) after refilling the bucket at the old rate. Returns the new rate.
+        """
+
+        self._refill(time.monotonic() if now is None else now)
+        self.rate = adjust(self.rate)
+        return self.rate
+
+
+class SharedTokenBucket:
+    """
+    TokenBucket whose state is kept in a file, so that processes on the same host share the bucket.
+
+    The state (tokens, updated time and rate) is read and written under an exclusive lock of the file. The wall
+    clock is used instead of the monotonic clock, which is not comparable between processes on every platform.
+
+    Opening the bucket sets the rate to the given one, so that a rate changed in the settings, or lowered by
+    TooManyRequests in an earlier run, does not carry over. The tokens are kept.
+    """
+
+    _STATE = struct.Struct("<ddd")
+
+    def __init__(self, path: str, rate: float, capacity: float, now: Optional[float] = None):
+        if fcntl is None:
+            raise RuntimeError("SharedTokenBucket requires fcntl, which is not available on this platform")
+
+        self.capacity = capacity
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if len(os.pread(self._fd, self._STATE.size, 0)) < self._STATE.size:  # the first process
+                self._write(capacity, time.time() if now is None else now, rate)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        self.adjust_rate(lambda _: rate, now=now)
+
+    def close(self):
+        os.close(self._fd)
+
+    def _read(self) -> Tuple[float, float, float]:
+        return self._STATE.unpack(os.pread(self._fd, self._STATE.size, 0))
+
+    def _write(self, tokens: float, updated_at: float, rate: float):
+        os.pwrite(self._fd, self._STATE.pack(tokens, updated_at, rate), 0)
+
+    def _update(
+        self, now: Optional[float], taken: float = 0.0, adjust: Optional[Callable[[float], float]] = None
+    ) -> Tuple[float, float]:
+        """
+        Refills the bucket, takes tokens and optionally changes the rate to adjust(rate) atomically.
+        Returns (tokens, rate).
+        """
+
+        now = time.time() if now is None else now
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            tokens, updated_at, old_rate = self._read()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated_at) * old_rate) - taken
+            rate = old_rate if adjust is None else adjust(old_rate)
+            self._write(tokens, max(now, updated_at), rate)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return tokens, rate
+
+    @property
+    def rate(self) -> float:
+        return self._update(None)[1]
+
+    @rate.setter
+    def rate(self, rate: float):
+        self._update(None, adjust=lambda _: rate)
+
+    def adjust_rate(self, adjust: Callable[[float], float], now: Optional[float] = None) -> float:
+        """
+        Changes the rate to adjust(rate) after refilling the bucket at the old rate. Returns the new rate.
+        """
+
+        return self._update(now, adjust=adjust)[1]
+
+    def available(self, now: Optional[float] = None) -> float:
+        return self._update(now)[0]
+
+    def reserve(self, now: Optional[float] = None) -> float:
+        tokens, rate = self._update(now, taken=1.0)
+        if tokens >= 0:
+            return 0.0
+        return -tokens / rate
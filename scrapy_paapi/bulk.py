@@ -0,0 +1,156 @@
+import csv
+import gzip
+import hashlib
+import io
+import json
+import math
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from scrapy import Spider
+
+from scrapy_paapi.batch import MAX_ITEM_IDS
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.shard import Shard
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set. add() may regard a new key as a duplicate with the probability of error_rate,
+    but never regards a duplicate as new.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 1e-5):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def add(self, key: str) -> bool:
+        """
+        Adds the key and returns True if the key was not in the filter.
+        """
+
+        added = False
+        for p in self._positions(key):
+            mask = 1 << (p & 7)
+            if not self._bits[p >> 3] & mask:
+                self._bits[p >> 3] |= mask
+                added = True
+        return added
+
+
+def _open_text(path: str) -> io.TextIOBase:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def iter_item_ids(
+    path: str, default_marketplace: str, id_field: str = "asin", marketplace_field: str = "marketplace"
+) -> Iterator[Tuple[str, str]]:
+    """
+    Streams (marketplace, item_id) tuples from a file in one of the following formats, optionally gzipped:
+
+    - .txt: an ItemId per line
+    - .csv: a header row and columns of id_field and, optionally, marketplace_field
+    - .jsonl: a JSON object with keys id_field and, optionally, marketplace_field per line, or a JSON string
+
+    ItemIds are stripped of whitespace, and blank ones are skipped.
+    """
+
+    for marketplace, item_id in _iter_rows(path, default_marketplace, id_field, marketplace_field):
+        item_id = item_id.strip()
+        if item_id:
+            yield marketplace, item_id
+
+
+def _iter_rows(path: str, default_marketplace: str, id_field: str, marketplace_field: str) -> Iterator[Tuple[str, str]]:
+    name = path[:-3] if path.endswith(".gz") else path
+    with _open_text(path) as f:
+        if name.endswith(".csv"):
+            for row in csv.DictReader(f):
+                yield row.get(marketplace_field) or default_marketplace, row[id_field] or ""
+        elif name.endswith((".jsonl", ".ndjson")):
+            for line in f:
+                if not line.strip():
+                    continue
+                obj = json.loads(line)
+                if isinstance(obj, str):
+                    yield default_marketplace, obj
+                else:
+                    yield obj.get(marketplace_field) or default_marketplace, obj[id_field]
+        else:
+            for line in f:
+                yield default_marketplace, line
+
+
+def iter_get_items_requests(
+    rows: Iterable[Tuple[str, str]],
+    partner_tag: str,
+    seen: Optional[BloomFilter] = None,
+    **kwargs,
+) -> Iterator[PaapiRequest]:
+    """
+    Chunks (marketplace, item_id) tuples into GetItems requests of 10 ItemIds per marketplace.
+    Duplicated ItemIds are dropped if seen is given. kwargs are passed to PaapiRequest.get_items().
+    """
+
+    pending: Dict[str, List[str]] = {}
+    for marketplace, item_id in rows:
+        if seen is not None and not seen.add(f"{marketplace}/{item_id}"):
+            continue
+
+        item_ids = pending.setdefault(marketplace, [])
+        item_ids.append(item_id)
+        if len(item_ids) >= MAX_ITEM_IDS:
+            del pending[marketplace]
+            yield PaapiRequest.get_items(marketplace, partner_tag, item_ids, **kwargs)
+
+    for marketplace, item_ids in pending.items():
+        yield PaapiRequest.get_items(marketplace, partner_tag, item_ids, **kwargs)
+
+
+class PaapiBulkSpider(Spider):
+    """
+    Base spider that streams ItemIds from a file into GetItems requests with constant memory.
+
+    Subclasses implement parse() receiving GetItemsResponse. Attributes can be given as spider arguments:
+
+        scrapy crawl myspider -a item_ids_path=asins.csv.gz -a partner_tag=yourtag-20
+
+    When run by scrapy_paapi.shard, only the ItemIds of the shard of the worker are requested.
+    """
+
+    item_ids_path: str = None
+    partner_tag: str = None
+    default_marketplace: str = "www.amazon.com"
+    id_field: str = "asin"
+    marketplace_field: str = "marketplace"
+    dedup_capacity: int = 10_000_000  # expected number of unique ItemIds. 0 to disable deduplication.
+    dedup_error_rate: float = 1e-5
+
+    def start_requests(self):
+        rows = iter_item_ids(self.item_ids_path, self.default_marketplace, self.id_field, self.marketplace_field)
+        settings = getattr(self, "settings", None)  # None if not created by a crawler
+        shard = Shard.from_settings(settings) if settings is not None else Shard()
+        if shard.count > 1:
+            rows = (row for row in rows if shard.owns(row[1]))
+        checkpoint = getattr(self, "paapi_checkpoint", None)  # set by PaapiCheckpointMiddleware
+        if checkpoint is not None:
+            rows = checkpoint.iter_pending_item_ids(rows)
+        seen = BloomFilter(int(self.dedup_capacity), float(self.dedup_error_rate)) if int(self.dedup_capacity) else None
+        yield from iter_get_items_requests(rows, self.partner_tag, seen=seen, callback=self.parse)
+
+    async def start(self):
+        # Scrapy >= 2.13 calls start() instead of start_requests()
+        for request in self.start_requests():
+            yield request
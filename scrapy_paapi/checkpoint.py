@@ -0,0 +1,334 @@
+import gzip
+import json
+import logging
+import os
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from scrapy import Request, signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.project import data_path
+
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import BasePaapiResponse, GetBrowseNodesResponse, PaapiErrorResponse
+from scrapy_paapi.shard import Shard
+
+logger = logging.getLogger(__name__)
+
+# Parameters of page numbers of paginated operations
+PAGE_PARAMS = {
+    "GetVariations": "VariationPage",
+    "SearchItems": "ItemPage",
+}
+# Parameters that do not change the results of paginated operations
+_NON_CURSOR_PARAMS = {"PartnerTag", "PartnerType", "Resources"}
+_ITEM_IDS_PER_RECORD = 1000
+
+
+def get_cursor_key(data: dict) -> str:
+    """
+    Returns the key of the cursor of a paginated request, i.e. its parameters except the page number and the
+    resources, e.g. '{"Keywords":"kindle","Marketplace":"www.amazon.com","Operation":"SearchItems"}'.
+    """
+
+    page_param = PAGE_PARAMS[data["Operation"]]
+    params = {k: v for k, v in data.items() if k != page_param and k not in _NON_CURSOR_PARAMS}
+    return json.dumps(params, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class CheckpointLog:
+    """
+    Append-only log of the progress of a crawl, which survives crashes of the process:
+
+    - completed ItemIds of GetItems per marketplace
+    - fetched pages of SearchItems and GetVariations per cursor key (see get_cursor_key())
+    - fetched browse nodes and their children per marketplace, i.e. the frontier of the browse node tree
+
+    Each record is a line of compact JSON and is written as soon as it is added. When the log grows beyond
+    snapshot_bytes, the whole state is written to the index file (path + ".index.gz") and the log is truncated,
+    so that a restart reads the compact index and replays only the tail of the log. Records are idempotent,
+    so a crash between writing the index and truncating the log only costs a longer replay.
+    """
+
+    def __init__(self, path: str, snapshot_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.index_path = path + ".index.gz"
+        self.snapshot_bytes = snapshot_bytes
+        self.item_ids: Dict[str, Set[str]] = {}
+        self.cursors: Dict[str, List[int]] = {}  # key -> [bitmask of fetched pages, last page or 0 if unknown]
+        self.browse_nodes: Dict[str, Dict[str, Tuple[str, ...]]] = {}  # marketplace -> node ID -> children IDs
+
+        if os.path.exists(self.index_path):
+            with gzip.open(self.index_path, "rt", encoding="utf-8") as f:
+                self._replay(f)
+        if os.path.exists(path):
+            self._truncate_partial_record()
+            with open(path, "r", encoding="utf-8") as f:
+                self._replay(f)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        self._file.close()
+
+    def _truncate_partial_record(self):
+        """
+        Removes the last record if it was partially written when the process died.
+        """
+
+        with open(self.path, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            size = f.tell()
+            if size == 0:
+                return
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+            if tail.endswith(b"\n"):
+                return
+            newline = tail.rfind(b"\n")
+            f.truncate(size - len(tail) + newline + 1 if newline >= 0 else 0)
+            logger.warning("Truncated a partially written record of %(path)s", {"path": self.path})
+
+    def _replay(self, lines: Iterable[str]):
+        for line in lines:
+            record = json.loads(line)
+            kind = record[0]
+            if kind == "i":
+                self.item_ids.setdefault(record[1], set()).update(record[2])
+            elif kind == "p":
+                self._apply_page(record[1], record[2], record[3])
+            elif kind == "b":
+                self.browse_nodes.setdefault(record[1], {})[record[2]] = tuple(record[3])
+
+    def _apply_page(self, key: str, page: int, is_last: bool):
+        cursor = self.cursors.setdefault(key, [0, 0])
+        cursor[0] |= 1 << page
+        if is_last:
+            cursor[1] = page
+
+    def _write(self, record: list):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        self._file.write("\n")
+        self._file.flush()
+        if self._file.tell() >= self.snapshot_bytes:
+            self.snapshot()
+
+    def add_item_ids(self, marketplace: str, item_ids: List[str]):
+        self.item_ids.setdefault(marketplace, set()).update(item_ids)
+        self._write(["i", marketplace, item_ids])
+
+    def add_page(self, key: str, page: int, is_last: bool):
+        self._apply_page(key, page, is_last)
+        self._write(["p", key, page, is_last])
+
+    def add_browse_node(self, marketplace: str, node_id: str, children_ids: List[str]):
+        self.browse_nodes.setdefault(marketplace, {})[node_id] = tuple(children_ids)
+        self._write(["b", marketplace, node_id, children_ids])
+
+    def is_item_completed(self, marketplace: str, item_id: str) -> bool:
+        return item_id in self.item_ids.get(marketplace, ())
+
+    def iter_pending_item_ids(self, rows: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+        """
+        Filters out completed ItemIds from (marketplace, item_id) tuples, e.g. of scrapy_paapi.bulk.iter_item_ids().
+        """
+
+        for marketplace, item_id in rows:
+            if not self.is_item_completed(marketplace, item_id):
+                yield marketplace, item_id
+
+    def get_next_page(self, key: str) -> Optional[int]:
+        """
+        Returns the first page of the cursor that has not been fetched, or None if all the pages have been fetched.
+        """
+
+        fetched, last = self.cursors.get(key, (0, 0))
+        page = 1
+        while fetched & (1 << page):
+            page += 1
+        return None if last and page > last else page
+
+    def is_page_fetched(self, key: str, page: int) -> bool:
+        return bool(self.cursors.get(key, (0, 0))[0] & (1 << page))
+
+    def get_browse_node_children(self, marketplace: str, node_id: str) -> Optional[Tuple[str, ...]]:
+        """
+        Returns the children IDs of the browse node, or None if the node has not been fetched.
+        """
+
+        return self.browse_nodes.get(marketplace, {}).get(node_id)
+
+    def snapshot(self):
+        """
+        Writes the whole state to the index file atomically and truncates the log.
+        """
+
+        tmp_path = self.index_path + ".tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            for marketplace, item_ids in self.item_ids.items():
+                sorted_item_ids = sorted(item_ids)
+                for i in range(0, len(sorted_item_ids), _ITEM_IDS_PER_RECORD):
+                    self._write_index_record(f, ["i", marketplace, sorted_item_ids[i : i + _ITEM_IDS_PER_RECORD]])
+            for key, (fetched, last) in self.cursors.items():
+                for page in range(fetched.bit_length()):
+                    if fetched & (1 << page):
+                        self._write_index_record(f, ["p", key, page, page == last])
+            for marketplace, nodes in self.browse_nodes.items():
+                for node_id, children_ids in nodes.items():
+                    self._write_index_record(f, ["b", marketplace, node_id, children_ids])
+        os.replace(tmp_path, self.index_path)
+        self._file.truncate(0)
+        logger.debug("Wrote the index of %(path)s", {"path": self.path})
+
+    @staticmethod
+    def _write_index_record(f, record: list):
+        f.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+        f.write("\n")
+
+
+class PaapiCheckpointMiddleware:
+    """
+    Spider middleware that records the progress of the crawl in a CheckpointLog at PAAPI_CHECKPOINT_FILE and
+    resumes from it on restart.
+
+    Progress is recorded after the callback of a successful response has returned all of its results:
+
+    - GetItems: the ItemIds of the request are completed.
+    - SearchItems and GetVariations: the page is fetched, and it is the last page if follow_next_page() is None.
+    - GetBrowseNodes: the nodes are fetched with their children.
+
+    Requests yielded by the spider are rewritten not to spend the quota again. Completed ItemIds are removed from
+    GetItems requests. A request of the first page of a cursor is moved to the first page that has not been fetched,
+    and requests of fetched pages are dropped. GetBrowseNodes requests are left as is; BrowseNodeTreeCrawler takes
+    the checkpoint to skip fetched nodes. The log is available to the spider as spider.paapi_checkpoint.
+
+    Workers of scrapy_paapi.shard use their own logs suffixed by ".shard-<index>".
+    """
+
+    def __init__(self, crawler: Crawler, path: str, snapshot_bytes: int):
+        self._stats = crawler.stats
+        self.checkpoint = CheckpointLog(path, snapshot_bytes)
+        logger.info(
+            "Loaded the checkpoint %(path)s: %(item_id_count)d ItemIds, %(cursor_count)d cursors",
+            {
+                "path": path,
+                "item_id_count": sum(len(item_ids) for item_ids in self.checkpoint.item_ids.values()),
+                "cursor_count": len(self.checkpoint.cursors),
+            },
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        path = crawler.settings.get("PAAPI_CHECKPOINT_FILE")
+        if not path:
+            raise NotConfigured("PAAPI_CHECKPOINT_FILE is required")
+
+        path = data_path(path)
+        shard = Shard.from_settings(crawler.settings)
+        if shard.count > 1:
+            path = f"{path}.shard-{shard.index}"  # keeps most of its keys when the number of shards changes
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        middleware = cls(
+            crawler=crawler,
+            path=path,
+            snapshot_bytes=crawler.settings.getint("PAAPI_CHECKPOINT_SNAPSHOT_BYTES", 64 * 1024 * 1024),
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
+        return middleware
+
+    def spider_opened(self, spider):
+        spider.paapi_checkpoint = self.checkpoint
+
+    def spider_closed(self, spider):
+        self.checkpoint.snapshot()
+        self.checkpoint.close()
+
+    def process_start_requests(self, start_requests, spider):
+        for request in start_requests:
+            request = self._rewrite_request(request)
+            if request is not None:
+                yield request
+
+    async def process_start(self, start):
+        # Scrapy >= 2.13 calls process_start() instead of process_start_requests()
+        async for request in start:
+            request = self._rewrite_request(request)
+            if request is not None:
+                yield request
+
+    def process_spider_output(self, response, result, spider):
+        for r in result:
+            r = self._rewrite_request(r)
+            if r is not None:
+                yield r
+        self._record(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for r in result:
+            r = self._rewrite_request(r)
+            if r is not None:
+                yield r
+        self._record(response)
+
+    def _rewrite_request(self, request):
+        if not isinstance(request, PaapiRequest):
+            return request  # an item or a non-PA-API request
+
+        operation = request.meta["paapi_operation"]
+        data = request.paapi_data
+        if operation == "GetItems":
+            marketplace = data["Marketplace"]
+            item_ids = [i for i in data["ItemIds"] if not self.checkpoint.is_item_completed(marketplace, i)]
+            if len(item_ids) == len(data["ItemIds"]):
+                return request
+            self._stats.inc_value("paapi/checkpoint/skipped_item_id_count", len(data["ItemIds"]) - len(item_ids))
+            if not item_ids:
+                return self._skip(request)
+            return request.replace(data=dict(data, ItemIds=item_ids))
+
+        if operation in PAGE_PARAMS:
+            page_param = PAGE_PARAMS[operation]
+            key = get_cursor_key(data)
+            page = data.get(page_param, 1)
+            if page == 1:
+                next_page = self.checkpoint.get_next_page(key)
+                if next_page is None:
+                    return self._skip(request)
+                if next_page != 1:
+                    self._stats.inc_value("paapi/checkpoint/resumed_cursor_count")
+                    return request.replace(data=dict(data, **{page_param: next_page}))
+            elif self.checkpoint.is_page_fetched(key, page):
+                return self._skip(request)
+
+        return request
+
+    def _skip(self, request: Request):
+        self._stats.inc_value("paapi/checkpoint/skipped_request_count")
+        logger.debug("Skipped %(request)s completed before the restart", {"request": request})
+        return None
+
+    def _record(self, response):
+        if not isinstance(response, BasePaapiResponse) or isinstance(response, PaapiErrorResponse):
+            return
+        if response.status != 200:
+            return
+
+        operation = response.request.meta["paapi_operation"]
+        data = response.request.paapi_data
+        if operation == "GetItems":
+            # Item-level errors in a successful response, e.g. ItemNotAccessible, will not change on retries.
+            self.checkpoint.add_item_ids(data["Marketplace"], data["ItemIds"])
+        elif operation in PAGE_PARAMS:
+            page = data.get(PAGE_PARAMS[operation], 1)
+            is_last = response.result_key not in response.json() or response.follow_next_page() is None
+            self.checkpoint.add_page(get_cursor_key(data), page, is_last)
+        elif isinstance(response, GetBrowseNodesResponse):
+            browse_nodes = response.browse_nodes if "BrowseNodesResult" in response.json() else []
+            fetched_ids = set()
+            for browse_node in browse_nodes:
+                fetched_ids.add(browse_node["Id"])
+                children_ids = [c["Id"] for c in browse_node.get("Children", [])]
+                self.checkpoint.add_browse_node(data["Marketplace"], browse_node["Id"], children_ids)
+            for node_id in data["BrowseNodeIds"]:
+                if node_id not in fetched_ids:
+                    self.checkpoint.add_browse_node(data["Marketplace"], node_id, [])  # e.g. an invalid node ID
@@ -0,0 +1,146 @@
+import json
+import os
+import time
+import weakref
+from typing import Callable, Collection, Dict, List, Optional, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+
+from scrapy_paapi.signer import Signer
+from scrapy_paapi.bucket import TokenBucket
+
+# Error types that mean the credential cannot be used for a while.
+# See: https://webservices.amazon.com/paapi5/documentation/troubleshooting/error-messages.html
+EJECTING_ERROR_TYPES = (
+    "AccessDenied",
+    "IncompleteSignature",
+    "InvalidAssociate",
+    "InvalidSignature",
+    "TooManyRequests",
+    "UnrecognizedClient",
+)
+
+
+# Pools shared by the middlewares of each crawler
+_pools: "weakref.WeakKeyDictionary[Crawler, CredentialPool]" = weakref.WeakKeyDictionary()
+
+
+class Credential:
+    def __init__(
+        self, access_key: str, secret_key: str, partner_tag: Optional[str] = None, tps: Optional[float] = None
+    ):
+        self.index = 0  # position in the pool, used in stats instead of the access key
+        self.access_key = access_key
+        self.partner_tag = partner_tag  # None to keep PartnerTag of requests
+        self.tps = tps  # None to use PAAPI_THROTTLE_TPS
+        self.signer = Signer(access_key, secret_key)
+        self.bucket = TokenBucket(rate=tps or 1.0, capacity=max(tps or 1.0, 1.0))
+        self.ejected_until = 0.0
+
+
+class CredentialPool:
+    """
+    Pool of credentials that distributes requests to the credential with the most remaining quota.
+    """
+
+    def __init__(self, credentials: List[Credential], eject_seconds: float = 60):
+        for index, credential in enumerate(credentials):
+            credential.index = index
+        self._credentials: Dict[str, Credential] = {c.access_key: c for c in credentials}
+        self._eject_seconds = eject_seconds
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler) -> "CredentialPool":
+        """
+        Returns the pool of the crawler, which is shared by PaapiMiddleware and PaapiThrottleMiddleware.
+        """
+
+        pool = _pools.get(crawler)
+        if pool is not None:
+            return pool
+
+        settings = crawler.settings
+        credentials = settings.get("AMAZON_CREDENTIALS")
+        if isinstance(credentials, str):
+            credentials = json.loads(credentials)  # e.g. -s AMAZON_CREDENTIALS='[...]'
+        if not credentials:
+            credentials = [
+                {
+                    "access_key": settings.get("AMAZON_ACCESS_KEY", os.environ.get("AMAZON_ACCESS_KEY")),
+                    "secret_key": settings.get("AMAZON_SECRET_KEY", os.environ.get("AMAZON_SECRET_KEY")),
+                }
+            ]
+        pool = _pools[crawler] = cls(
+            [Credential(**c) for c in credentials],
+            eject_seconds=settings.getfloat("PAAPI_CREDENTIAL_EJECT_SECONDS", 60),
+        )
+        return pool
+
+    def __len__(self):
+        return len(self._credentials)
+
+    def get(self, access_key: str) -> Optional[Credential]:
+        return self._credentials.get(access_key)
+
+    def has_alternative(self, exclude: Collection[str]) -> bool:
+        now = time.monotonic()
+        return any(c.ejected_until <= now for key, c in self._credentials.items() if key not in exclude)
+
+    def choose(
+        self, exclude: Collection[str] = (), get_available: Optional[Callable[[Credential], float]] = None
+    ) -> Credential:
+        """
+        Chooses a credential other than the excluded ones. Ejected credentials are only chosen when all the
+        other credentials are ejected or excluded.
+
+        get_available returns the remaining quota of a credential, e.g. of the buckets of PaapiThrottleMiddleware,
+        which then reserves the quota itself. Otherwise, the quota is taken from the bucket of the credential.
+        """
+
+        now = time.monotonic()
+        candidates = [c for key, c in self._credentials.items() if key not in exclude] or list(
+            self._credentials.values()
+        )
+        available = [c for c in candidates if c.ejected_until <= now]
+        if available:
+            credential = max(available, key=get_available or (lambda c: c.bucket.available(now)))
+        else:
+            credential = min(candidates, key=lambda c: c.ejected_until)
+
+        if get_available is None:
+            credential.bucket.reserve(now)
+        return credential
+
+    def assign(
+        self, request: Request, get_available: Optional[Callable[[Credential], float]] = None
+    ) -> Tuple[Credential, Optional[Request]]:
+        """
+        Assigns a credential to a PaapiRequest and sets paapi_access_key in its meta. The credential already in
+        the meta, chosen before the request was rewritten or pinned by the spider, is kept unless it has failed.
+
+        When PartnerTag has to be replaced with the partner tag of the credential, returns a new request to be
+        scheduled instead, otherwise None.
+        """
+
+        failed_access_keys = request.meta.get("paapi_failed_access_keys", ())
+        access_key = request.meta.get("paapi_access_key")
+        credential = None
+        if access_key is not None and access_key not in failed_access_keys:
+            credential = self.get(access_key)
+        if credential is None:
+            credential = self.choose(exclude=failed_access_keys, get_available=get_available)
+
+        if credential.partner_tag is not None and credential.partner_tag != request.paapi_data["PartnerTag"]:
+            # The partner tag must be associated with the access key.
+            new_request = request.replace(
+                data=dict(request.paapi_data, PartnerTag=credential.partner_tag), dont_filter=True
+            )
+            new_request.meta["paapi_access_key"] = credential.access_key
+            return credential, new_request
+
+        request.meta["paapi_access_key"] = credential.access_key
+        return credential, None
+
+    def eject(self, credential: Credential):
+        credential.ejected_until = time.monotonic() + self._eject_seconds
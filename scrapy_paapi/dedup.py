@@ -0,0 +1,149 @@
+import json
+from typing import Dict, List, Optional
+
+from scrapy.crawler import Crawler
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import Response
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import Deferred
+
+from scrapy_paapi.batch import get_params_key, split_get_items_data
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.utils import KeyPrefixes, TimeBoundedSet, download, gather
+
+
+class PaapiDedupMiddleware:
+    """
+    Deduplicates ItemIds of GetItems requests across requests.
+
+    An ItemId being fetched by another request is not fetched again; the request waits for that request and receives
+    the part of its response for the ItemId. An ItemId fetched successfully within PAAPI_DEDUP_TTL seconds is dropped
+    from the request, and a request whose ItemIds are all dropped is ignored.
+
+    ItemIds are distinguished by the endpoint and the other parameters, so requests with different resources or
+    marketplaces never share responses.
+
+    This middleware must be placed before PaapiBatchMiddleware.
+    """
+
+    def __init__(self, crawler: Crawler, ttl: float, max_recent: int):
+        self._crawler = crawler
+        self._stats = crawler.stats
+        self._recent = TimeBoundedSet(ttl, max_recent) if ttl > 0 else None
+        self._prefixes = KeyPrefixes()  # params key -> short prefix of keys
+        self._waiters: Dict[str, List[Deferred]] = {}  # key of an in-flight ItemId -> deferreds waiting for it
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(
+            crawler=crawler,
+            ttl=crawler.settings.getfloat("PAAPI_DEDUP_TTL", 600),
+            max_recent=crawler.settings.getint("PAAPI_DEDUP_MAX_RECENT", 1_000_000),
+        )
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, PaapiRequest) or request.meta["paapi_operation"] != "GetItems":
+            return  # proceed to next middleware
+        if (
+            request.meta.get("paapi_batched")
+            or request.meta.get("paapi_dedup_disabled")
+            or "paapi_dedup_keys" in request.meta  # already registered, e.g. retried
+        ):
+            return
+
+        prefix = self._prefixes.get(get_params_key(request))
+        item_ids = request.paapi_data["ItemIds"]
+        new_item_ids, in_flight_item_ids, recent_item_ids = [], [], []
+        for item_id in item_ids:
+            key = prefix + item_id
+            if key in self._waiters:
+                in_flight_item_ids.append(item_id)
+            elif self._recent is not None and key in self._recent:
+                recent_item_ids.append(item_id)
+            elif item_id not in new_item_ids:
+                new_item_ids.append(item_id)
+
+        if not in_flight_item_ids and not recent_item_ids:
+            self._register(request, prefix, new_item_ids)
+            return
+
+        if recent_item_ids:
+            self._stats.inc_value("paapi/dedup/dropped_item_id_count", len(recent_item_ids))
+        if not new_item_ids and not in_flight_item_ids:
+            self._stats.inc_value("paapi/dedup/ignored_request_count")
+            raise IgnoreRequest(f"All ItemIds have been fetched recently: {recent_item_ids}")
+
+        parts = []  # (deferred, item_ids)
+        if new_item_ids:
+            new_request = request.replace(data=dict(request.paapi_data, ItemIds=new_item_ids), dont_filter=True)
+            self._register(new_request, prefix, new_item_ids)
+            parts.append((download(self._crawler, new_request, spider), new_item_ids))
+        for item_id in in_flight_item_ids:
+            d = Deferred()
+            self._waiters[prefix + item_id].append(d)
+            parts.append((d, [item_id]))
+        self._stats.inc_value("paapi/dedup/merged_item_id_count", len(in_flight_item_ids))
+
+        d = gather([part_d for part_d, _ in parts])
+        d.addCallback(self._merge_responses, request, [part_item_ids for _, part_item_ids in parts])
+        return await maybe_deferred_to_future(d)
+
+    def process_response(self, request, response, spider):
+        keys = request.meta.get("paapi_dedup_keys")
+        if keys:
+            if response.status < 400 and self._recent is not None:
+                for key in keys:
+                    self._recent.add(key)
+            self._resolve(keys, response)
+        return response
+
+    def process_exception(self, request, exception, spider):
+        keys = request.meta.get("paapi_dedup_keys")
+        if keys:
+            self._resolve(keys, None, exception)
+
+    def _register(self, request: PaapiRequest, prefix: str, item_ids: List[str]):
+        keys = [prefix + item_id for item_id in item_ids]
+        for key in keys:
+            self._waiters[key] = []
+        request.meta["paapi_dedup_keys"] = keys
+
+    def _resolve(self, keys: List[str], response: Optional[Response], exception: Optional[Exception] = None):
+        for key in keys:
+            for d in self._waiters.pop(key, ()):
+                if exception is None:
+                    d.callback(response)
+                else:
+                    d.errback(exception)
+
+    def _merge_responses(
+        self, responses: List[Response], request: PaapiRequest, item_ids_of_parts: List[List[str]]
+    ) -> Response:
+        """
+        Builds a response for the request from the responses fetched for parts of its ItemIds.
+        """
+
+        succeeded = [
+            (response, item_ids) for response, item_ids in zip(responses, item_ids_of_parts) if response.status < 400
+        ]
+        if not succeeded:
+            return responses[0].replace(request=request)
+
+        order = {item_id: i for i, item_id in enumerate(request.paapi_data["ItemIds"])}
+        items, errors = [], []
+        for response, item_ids in succeeded:
+            data = split_get_items_data(response.json(), item_ids)
+            items.extend(data.get("ItemsResult", {}).get("Items", []))
+            errors.extend(data.get("Errors", []))
+        for response in responses:
+            if response.status >= 400:
+                errors.extend(response.json().get("Errors", []))
+
+        items.sort(key=lambda item: order.get(item["ASIN"], len(order)))
+        merged_data = {}
+        if items:
+            merged_data["ItemsResult"] = {"Items": items}
+        if errors:
+            merged_data["Errors"] = errors
+
+        return succeeded[0][0].replace(request=request, body=json.dumps(merged_data).encode("utf-8"))
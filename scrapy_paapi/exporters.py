@@ -0,0 +1,345 @@
+"""
+Feed exporters writing PA-API items to columnar files.
+
+pyarrow is required:
+
+    FEED_EXPORTERS = {
+        "parquet": "scrapy_paapi.exporters.PaapiParquetItemExporter",
+        "arrow": "scrapy_paapi.exporters.PaapiArrowItemExporter",
+    }
+"""
+
+from collections import namedtuple
+from typing import Any, Dict, List, Optional
+
+from itemadapter import ItemAdapter
+from scrapy.exporters import BaseItemExporter
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# name: column name
+# resource: the resource in scrapy_paapi.constant the column is derived from, or None for columns always present
+# type: name of a pyarrow type factory, or "list_of_string"
+# root: "item", "listing" (the buy box winner, or the first listing) or "summary" (the first offer summary)
+# path: keys from the root. "*" maps the rest of the path over a list.
+# dictionary: whether the values are repeated a lot, e.g. brands and merchants, and dictionary-encoded
+Column = namedtuple("Column", ["name", "resource", "type", "root", "path", "dictionary"])
+
+COLUMNS = [
+    Column("asin", None, "string", "item", ("ASIN",), False),
+    Column("detail_page_url", None, "string", "item", ("DetailPageURL",), False),
+    Column("parent_asin", "ParentASIN", "string", "item", ("ParentASIN",), False),
+    Column("title", "ItemInfo.Title", "string", "item", ("ItemInfo", "Title", "DisplayValue"), False),
+    Column("brand", "ItemInfo.ByLineInfo", "string", "item", ("ItemInfo", "ByLineInfo", "Brand", "DisplayValue"), True),
+    Column(
+        "manufacturer",
+        "ItemInfo.ByLineInfo",
+        "string",
+        "item",
+        ("ItemInfo", "ByLineInfo", "Manufacturer", "DisplayValue"),
+        True,
+    ),
+    Column(
+        "binding",
+        "ItemInfo.Classifications",
+        "string",
+        "item",
+        ("ItemInfo", "Classifications", "Binding", "DisplayValue"),
+        True,
+    ),
+    Column(
+        "product_group",
+        "ItemInfo.Classifications",
+        "string",
+        "item",
+        ("ItemInfo", "Classifications", "ProductGroup", "DisplayValue"),
+        True,
+    ),
+    Column(
+        "eans",
+        "ItemInfo.ExternalIds",
+        "list_of_string",
+        "item",
+        ("ItemInfo", "ExternalIds", "EANs", "DisplayValues"),
+        False,
+    ),
+    Column(
+        "upcs",
+        "ItemInfo.ExternalIds",
+        "list_of_string",
+        "item",
+        ("ItemInfo", "ExternalIds", "UPCs", "DisplayValues"),
+        False,
+    ),
+    Column("features", "ItemInfo.Features", "list_of_string", "item", ("ItemInfo", "Features", "DisplayValues"), False),
+    Column(
+        "model",
+        "ItemInfo.ManufactureInfo",
+        "string",
+        "item",
+        ("ItemInfo", "ManufactureInfo", "Model", "DisplayValue"),
+        False,
+    ),
+    Column(
+        "part_number",
+        "ItemInfo.ManufactureInfo",
+        "string",
+        "item",
+        ("ItemInfo", "ManufactureInfo", "ItemPartNumber", "DisplayValue"),
+        False,
+    ),
+    Column(
+        "color", "ItemInfo.ProductInfo", "string", "item", ("ItemInfo", "ProductInfo", "Color", "DisplayValue"), True
+    ),
+    Column(
+        "is_adult_product",
+        "ItemInfo.ProductInfo",
+        "bool_",
+        "item",
+        ("ItemInfo", "ProductInfo", "IsAdultProduct", "DisplayValue"),
+        False,
+    ),
+    Column(
+        "unit_count",
+        "ItemInfo.ProductInfo",
+        "int64",
+        "item",
+        ("ItemInfo", "ProductInfo", "UnitCount", "DisplayValue"),
+        False,
+    ),
+    Column(
+        "trade_in_price",
+        "ItemInfo.TradeInInfo",
+        "float64",
+        "item",
+        ("ItemInfo", "TradeInInfo", "Price", "Amount"),
+        False,
+    ),
+    Column("image_small_url", "Images.Primary.Small", "string", "item", ("Images", "Primary", "Small", "URL"), False),
+    Column(
+        "image_medium_url", "Images.Primary.Medium", "string", "item", ("Images", "Primary", "Medium", "URL"), False
+    ),
+    Column("image_large_url", "Images.Primary.Large", "string", "item", ("Images", "Primary", "Large", "URL"), False),
+    Column(
+        "variant_image_large_urls",
+        "Images.Variants.Large",
+        "list_of_string",
+        "item",
+        ("Images", "Variants", "*", "Large", "URL"),
+        False,
+    ),
+    Column(
+        "browse_node_ids",
+        "BrowseNodeInfo.BrowseNodes",
+        "list_of_string",
+        "item",
+        ("BrowseNodeInfo", "BrowseNodes", "*", "Id"),
+        False,
+    ),
+    Column(
+        "browse_node_names",
+        "BrowseNodeInfo.BrowseNodes",
+        "list_of_string",
+        "item",
+        ("BrowseNodeInfo", "BrowseNodes", "*", "DisplayName"),
+        False,
+    ),
+    Column(
+        "sales_rank",
+        "BrowseNodeInfo.WebsiteSalesRank",
+        "int64",
+        "item",
+        ("BrowseNodeInfo", "WebsiteSalesRank", "SalesRank"),
+        False,
+    ),
+    Column(
+        "sales_rank_category",
+        "BrowseNodeInfo.WebsiteSalesRank",
+        "string",
+        "item",
+        ("BrowseNodeInfo", "WebsiteSalesRank", "DisplayName"),
+        True,
+    ),
+    Column("price", "Offers.Listings.Price", "float64", "listing", ("Price", "Amount"), False),
+    Column("currency", "Offers.Listings.Price", "string", "listing", ("Price", "Currency"), True),
+    Column("saving_basis", "Offers.Listings.SavingBasis", "float64", "listing", ("SavingBasis", "Amount"), False),
+    Column("merchant_id", "Offers.Listings.MerchantInfo", "string", "listing", ("MerchantInfo", "Id"), True),
+    Column("merchant_name", "Offers.Listings.MerchantInfo", "string", "listing", ("MerchantInfo", "Name"), True),
+    Column(
+        "availability_type", "Offers.Listings.Availability.Type", "string", "listing", ("Availability", "Type"), True
+    ),
+    Column(
+        "availability_message",
+        "Offers.Listings.Availability.Message",
+        "string",
+        "listing",
+        ("Availability", "Message"),
+        True,
+    ),
+    Column("condition", "Offers.Listings.Condition", "string", "listing", ("Condition", "Value"), True),
+    Column(
+        "sub_condition",
+        "Offers.Listings.Condition.SubCondition",
+        "string",
+        "listing",
+        ("Condition", "SubCondition", "Value"),
+        True,
+    ),
+    Column(
+        "is_amazon_fulfilled",
+        "Offers.Listings.DeliveryInfo.IsAmazonFulfilled",
+        "bool_",
+        "listing",
+        ("DeliveryInfo", "IsAmazonFulfilled"),
+        False,
+    ),
+    Column(
+        "is_prime_eligible",
+        "Offers.Listings.DeliveryInfo.IsPrimeEligible",
+        "bool_",
+        "listing",
+        ("DeliveryInfo", "IsPrimeEligible"),
+        False,
+    ),
+    Column("is_buy_box_winner", "Offers.Listings.IsBuyBoxWinner", "bool_", "listing", ("IsBuyBoxWinner",), False),
+    Column(
+        "loyalty_points", "Offers.Listings.LoyaltyPoints.Points", "int64", "listing", ("LoyaltyPoints", "Points"), False
+    ),
+    Column("lowest_price", "Offers.Summaries.LowestPrice", "float64", "summary", ("LowestPrice", "Amount"), False),
+    Column("highest_price", "Offers.Summaries.HighestPrice", "float64", "summary", ("HighestPrice", "Amount"), False),
+    Column("offer_count", "Offers.Summaries.OfferCount", "int64", "summary", ("OfferCount",), False),
+]
+
+
+def _get(data: Any, path: tuple) -> Any:
+    for i, key in enumerate(path):
+        if key == "*":
+            if not isinstance(data, list):
+                return None
+            return [_get(element, path[i + 1 :]) for element in data] or None
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def _get_listing(item: dict) -> Optional[dict]:
+    listings = _get(item, ("Offers", "Listings")) or []
+    for listing in listings:
+        if listing.get("IsBuyBoxWinner"):
+            return listing
+    return listings[0] if listings else None
+
+
+def _get_summary(item: dict) -> Optional[dict]:
+    summaries = _get(item, ("Offers", "Summaries")) or []
+    return summaries[0] if summaries else None
+
+
+def get_columns(resources: Optional[List[str]] = None) -> List[Column]:
+    """
+    Returns the columns derived from the resources, or all the columns if resources is None.
+    The columns are always in the same order, so files exported with the same resources have the same schema.
+    """
+
+    if resources is None:
+        return list(COLUMNS)
+    resources = set(resources)
+    return [column for column in COLUMNS if column.resource is None or column.resource in resources]
+
+
+def get_schema(columns: List[Column], dictionary_type: bool) -> "pyarrow.Schema":
+    fields = []
+    for column in columns:
+        if column.type == "list_of_string":
+            arrow_type = pyarrow.list_(pyarrow.string())
+        else:
+            arrow_type = getattr(pyarrow, column.type)()
+        if dictionary_type and column.dictionary:
+            arrow_type = pyarrow.dictionary(pyarrow.int32(), arrow_type)
+        fields.append(pyarrow.field(column.name, arrow_type))
+    return pyarrow.schema(fields)
+
+
+class _PaapiColumnarItemExporter(BaseItemExporter):
+    """
+    Flattens PA-API items, e.g. items of GetItemsResponse, into a row of COLUMNS and writes them in batches of
+    row_group_size rows, so that memory usage is bounded regardless of the number of items.
+
+    Subclasses set _writer to a pyarrow writer of the schema, e.g. pyarrow.parquet.ParquetWriter.
+    """
+
+    dictionary_type = False
+
+    def __init__(self, file, row_group_size: int = 10000, resources: Optional[List[str]] = None, **kwargs):
+        if pyarrow is None:
+            raise ImportError(f"pyarrow is required to use {self.__class__.__name__}")
+
+        super().__init__(dont_fail=True, **kwargs)
+        self.file = file
+        self.row_group_size = row_group_size
+        self.columns = get_columns(resources)
+        self.schema = get_schema(self.columns, self.dictionary_type)
+        self._values: Dict[str, list] = {column.name: [] for column in self.columns}
+        self._row_count = 0
+        self._writer = None
+
+    def export_item(self, item):
+        if not isinstance(item, dict):
+            item = ItemAdapter(item).asdict()
+        roots = {"item": item, "listing": _get_listing(item), "summary": _get_summary(item)}
+        for column in self.columns:
+            self._values[column.name].append(_get(roots[column.root], column.path))
+        self._row_count += 1
+        if self._row_count >= self.row_group_size:
+            self._flush()
+
+    def finish_exporting(self):
+        if self._row_count:
+            self._flush()
+        self._writer.close()
+
+    def _flush(self):
+        arrays = [
+            pyarrow.array(self._values[column.name], type=field.type)
+            for column, field in zip(self.columns, self.schema)
+        ]
+        self._writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema))
+        for values in self._values.values():
+            values.clear()
+        self._row_count = 0
+
+
+class PaapiParquetItemExporter(_PaapiColumnarItemExporter):
+    """
+    Writes items to a Parquet file with a row group per row_group_size items. Columns of repeated values,
+    e.g. brand and merchant_name, are dictionary-encoded.
+    """
+
+    def __init__(self, file, compression: str = "zstd", **kwargs):
+        super().__init__(file, **kwargs)
+        self._writer = pyarrow.parquet.ParquetWriter(
+            file,
+            self.schema,
+            compression=compression,
+            use_dictionary=[column.name for column in self.columns if column.dictionary],
+        )
+
+
+class PaapiArrowItemExporter(_PaapiColumnarItemExporter):
+    """
+    Writes items to an Arrow IPC stream with a record batch per row_group_size items. Columns of repeated values,
+    e.g. brand and merchant_name, have dictionary types.
+    """
+
+    dictionary_type = True
+
+    def __init__(self, file, **kwargs):
+        super().__init__(file, **kwargs)
+        # Each batch has its own dictionaries, which the stream format allows unlike the file format.
+        self._writer = pyarrow.ipc.new_stream(file, self.schema)
@@ -0,0 +1,153 @@
+"""
+Download handler and compression tuned for PA-API endpoints.
+
+All PA-API requests go to a handful of webservices.amazon.* hosts, so PaapiDownloadHandler keeps a connection pool
+for them sized by PAAPI_DOWNLOAD_POOL_SIZE instead of CONCURRENT_REQUESTS_PER_DOMAIN, and optionally multiplexes
+them over HTTP/2. The other requests are downloaded as by Scrapy's default handler.
+"""
+
+import copy
+import gzip
+import inspect
+import logging
+import zlib
+from typing import List, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from scrapy.core.downloader.handlers.http11 import HTTP11DownloadHandler
+from scrapy.crawler import Crawler
+from scrapy.http import Request, Response
+from scrapy.settings import Settings
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.defer import DeferredList, maybeDeferred
+
+from scrapy_paapi.request import PaapiRequest
+
+logger = logging.getLogger(__name__)
+
+# Sent by PaapiMiddleware. The JSON of PA-API responses is highly compressible.
+ACCEPT_ENCODING = b"gzip, deflate, br" if brotli is not None else b"gzip, deflate"
+
+# Scrapy >= 2.14 awaits download_request() without the spider argument
+_ASYNC_HANDLERS = inspect.iscoroutinefunction(HTTP11DownloadHandler.download_request)
+
+
+def decode_body(body: bytes, content_encoding: List[bytes]) -> Optional[bytes]:
+    """
+    Decodes body encoded with the Content-Encoding header values, e.g. [b"gzip"].
+    Returns None if one of the encodings is not supported.
+    """
+
+    encodings = [e.strip().lower() for value in content_encoding for e in value.split(b",")]
+    for encoding in reversed(encodings):  # listed in the order they were applied
+        if encoding in (b"gzip", b"x-gzip"):
+            body = gzip.decompress(body)
+        elif encoding == b"deflate":
+            try:
+                body = zlib.decompress(body)
+            except zlib.error:
+                body = zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate sent by some servers
+        elif encoding == b"br" and brotli is not None:
+            body = brotli.decompress(body)
+        elif encoding != b"identity":
+            return None
+    return body
+
+
+class PaapiDownloadHandler:
+    """
+    HTTP(S) download handler with a separate persistent connection pool for PaapiRequests:
+
+        DOWNLOAD_HANDLERS = {
+            "http": "scrapy_paapi.handler.PaapiDownloadHandler",
+            "https": "scrapy_paapi.handler.PaapiDownloadHandler",
+        }
+
+    The pool keeps up to pool_size idle connections per host, so that the connections of concurrent requests are
+    reused instead of being closed and set up with a new TLS handshake. Idle connections are closed after
+    keepalive_seconds, before the endpoint closes them, because a POST sent on a connection closed by the server
+    is not retried automatically. With http2, PaapiRequests over HTTPS are multiplexed over one HTTP/2
+    connection per host if h2 is installed.
+
+    The size of the response body on the wire, before decompression, is recorded in the paapi_wire_bytes meta key
+    for the stats of PaapiMiddleware.
+    """
+
+    lazy = False
+
+    def __init__(self, crawler: Crawler, pool_size: int = 16, keepalive_seconds: float = 50, http2: bool = False):
+        self._default_handler = HTTP11DownloadHandler.from_crawler(crawler)
+
+        # The pool of HTTP11DownloadHandler keeps CONCURRENT_REQUESTS_PER_DOMAIN connections per host
+        paapi_crawler = copy.copy(crawler)
+        paapi_crawler.settings = Settings(crawler.settings.copy_to_dict())
+        paapi_crawler.settings.set("CONCURRENT_REQUESTS_PER_DOMAIN", pool_size)
+        self._paapi_handler = HTTP11DownloadHandler.from_crawler(paapi_crawler)
+
+        pool = getattr(self._paapi_handler, "_pool", None)  # the timeout is not configurable through the settings
+        if pool is not None and hasattr(pool, "cachedConnectionTimeout"):
+            pool.cachedConnectionTimeout = keepalive_seconds
+        else:
+            logger.warning(
+                "PAAPI_DOWNLOAD_KEEPALIVE_SECONDS is ignored because the connection pool of %(handler)s is not found",
+                {"handler": type(self._paapi_handler).__name__},
+            )
+
+        self._h2_handler = None
+        if http2:
+            try:
+                from scrapy.core.downloader.handlers.http2 import H2DownloadHandler
+            except ImportError:
+                logger.warning("PAAPI_DOWNLOAD_HTTP2 is ignored because h2 is not installed (requires Scrapy >= 2.5)")
+            else:
+                self._h2_handler = H2DownloadHandler.from_crawler(crawler)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        settings = crawler.settings
+        return cls(
+            crawler,
+            pool_size=settings.getint("PAAPI_DOWNLOAD_POOL_SIZE", settings.getint("CONCURRENT_REQUESTS")),
+            keepalive_seconds=settings.getfloat("PAAPI_DOWNLOAD_KEEPALIVE_SECONDS", 50),
+            http2=settings.getbool("PAAPI_DOWNLOAD_HTTP2", False),
+        )
+
+    @property
+    def _handlers(self):
+        return [h for h in (self._default_handler, self._paapi_handler, self._h2_handler) if h is not None]
+
+    def _get_handler(self, request: Request):
+        if not isinstance(request, PaapiRequest):
+            return self._default_handler
+        if self._h2_handler is not None and urlparse_cached(request).scheme == "https":
+            return self._h2_handler
+        return self._paapi_handler
+
+    @staticmethod
+    def _record_wire_bytes(request: Request, response: Response) -> Response:
+        if isinstance(request, PaapiRequest):
+            request.meta["paapi_wire_bytes"] = len(response.body)
+        return response
+
+    if _ASYNC_HANDLERS:
+
+        async def download_request(self, request: Request) -> Response:
+            response = await self._get_handler(request).download_request(request)
+            return self._record_wire_bytes(request, response)
+
+        async def close(self) -> None:
+            for handler in self._handlers:
+                await handler.close()
+
+    else:
+
+        def download_request(self, request, spider):
+            d = self._get_handler(request).download_request(request, spider)
+            return d.addCallback(lambda response: self._record_wire_bytes(request, response))
+
+        def close(self):
+            return DeferredList([maybeDeferred(handler.close) for handler in self._handlers])
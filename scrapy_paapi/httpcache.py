@@ -0,0 +1,130 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from time import time
+from typing import Optional
+
+from scrapy import Spider
+from scrapy.http import Headers, Request, Response
+from scrapy.responsetypes import responsetypes
+from scrapy.settings import BaseSettings
+from scrapy.utils.project import data_path
+from w3lib.http import headers_dict_to_raw, headers_raw_to_dict
+
+from scrapy_paapi.request import PaapiRequest
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTLS = {
+    "GetBrowseNodes": 7 * 24 * 60 * 60,
+    "GetItems": 60 * 60,
+    "GetVariations": 60 * 60,
+    "SearchItems": 60 * 60,
+}
+
+# Lists in request parameters whose order does not affect the result.
+UNORDERED_PARAMETERS = ("BrowseNodeIds", "ItemIds", "Resources")
+
+
+def canonicalize_data(data: dict) -> str:
+    canonical_data = dict(data)
+    for key in UNORDERED_PARAMETERS:
+        if key in canonical_data:
+            canonical_data[key] = sorted(canonical_data[key])
+    return json.dumps(canonical_data, sort_keys=True, separators=(",", ":"))
+
+
+def get_fingerprint(request: Request) -> str:
+    """
+    Returns a fingerprint ignoring headers, e.g. Authorization and X-Amz-Date, except Accept-Language of
+    PaapiRequests, which may be given instead of LanguagesOfPreference.
+    """
+
+    if isinstance(request, PaapiRequest):
+        body = canonicalize_data(request.paapi_data).encode("utf-8")
+        body += b"\n" + (request.headers.get("Accept-Language") or b"")
+    else:
+        body = request.body
+
+    h = hashlib.sha1()
+    h.update(request.method.encode("utf-8") + b" " + request.url.encode("utf-8") + b"\n")
+    h.update(body)
+    return h.hexdigest()
+
+
+class PaapiCacheStorage:
+    """
+    HTTP cache storage for PaapiRequests backed by SQLite.
+
+    Signed requests carry headers that change on every call, so the fingerprint is computed from the URL and the
+    canonicalized JSON body. Responses expire after a TTL per operation given by PAAPI_HTTPCACHE_TTLS.
+    Other requests expire after HTTPCACHE_EXPIRATION_SECS.
+    """
+
+    def __init__(self, settings: BaseSettings):
+        self.cachedir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.expiration_secs = settings.getint("HTTPCACHE_EXPIRATION_SECS")
+        self.ttls = dict(DEFAULT_TTLS, **settings.getdict("PAAPI_HTTPCACHE_TTLS"))
+        self.db: Optional[sqlite3.Connection] = None
+
+    def open_spider(self, spider: Spider):
+        dbpath = os.path.join(self.cachedir, f"{spider.name}.sqlite3")
+        self.db = sqlite3.connect(dbpath)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers BLOB NOT NULL,"
+            " body BLOB NOT NULL,"
+            " timestamp REAL NOT NULL"
+            ")"
+        )
+        logger.debug("Using PA-API cache storage in %(cachepath)s", {"cachepath": dbpath}, extra={"spider": spider})
+
+    def close_spider(self, spider: Spider):
+        self.db.commit()
+        self.db.close()
+
+    def _get_ttl(self, request: Request) -> int:
+        if isinstance(request, PaapiRequest):
+            return self.ttls.get(request.meta["paapi_operation"], self.expiration_secs)
+        return self.expiration_secs
+
+    def retrieve_response(self, spider: Spider, request: Request) -> Optional[Response]:
+        row = self.db.execute(
+            "SELECT url, status, headers, body, timestamp FROM responses WHERE fingerprint = ?",
+            (get_fingerprint(request),),
+        ).fetchone()
+        if row is None:
+            return None  # not cached
+
+        url, status, raw_headers, compressed_body, timestamp = row
+        if 0 < self._get_ttl(request) < time() - timestamp:
+            return None  # expired
+
+        request.meta["cache_timestamp"] = timestamp
+        headers = Headers(headers_raw_to_dict(raw_headers))
+        body = zlib.decompress(compressed_body)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider: Spider, request: Request, response: Response):
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (fingerprint, url, status, headers, body, timestamp)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                get_fingerprint(request),
+                response.url,
+                response.status,
+                headers_dict_to_raw(response.headers),
+                zlib.compress(response.body),
+                time(),
+            ),
+        )
+        self.db.commit()
@@ -0,0 +1,301 @@
+import json
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.http import Response
+from scrapy.utils.defer import maybe_deferred_to_future
+from twisted.internet.defer import Deferred
+
+from scrapy_paapi.batch import get_params_key, split_get_items_data
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+from scrapy_paapi.utils import KeyPrefixes, TimeBoundedCache, download, gather
+
+# Resources whose values depend on LanguagesOfPreference. The others, e.g. Images, Offers and
+# BrowseNodeInfo.WebsiteSalesRank, are the same in all the languages of a marketplace.
+LOCALIZED_RESOURCES = (
+    "BrowseNodeInfo.BrowseNodes",
+    "ItemInfo.ByLineInfo",
+    "ItemInfo.Classifications",
+    "ItemInfo.ContentInfo",
+    "ItemInfo.ContentRating",
+    "ItemInfo.Features",
+    "ItemInfo.ManufactureInfo",
+    "ItemInfo.ProductInfo",
+    "ItemInfo.TechnicalInfo",
+    "ItemInfo.Title",
+    "ItemInfo.TradeInInfo",
+)
+# Item fields that are localized regardless of the resources
+LOCALIZED_FIELDS = ("DetailPageURL",)
+
+
+def split_item(item: dict, localized_paths: FrozenSet[Tuple[str, ...]]) -> Tuple[dict, dict]:
+    """
+    Splits an item into the language-independent part and the localized part. Both parts have the ASIN.
+    """
+
+    common, localized = {"ASIN": item["ASIN"]}, {"ASIN": item["ASIN"]}
+    for key, value in item.items():
+        if (key,) in localized_paths:
+            localized[key] = value
+        elif isinstance(value, dict) and any(path[0] == key for path in localized_paths):
+            for sub_key, sub_value in value.items():
+                part = localized if (key, sub_key) in localized_paths else common
+                part.setdefault(key, {})[sub_key] = sub_value
+        else:
+            common[key] = value
+    return common, localized
+
+
+def merge_item(common: dict, localized: dict) -> dict:
+    item = dict(common)
+    for key, value in localized.items():
+        if isinstance(value, dict) and isinstance(item.get(key), dict):
+            item[key] = dict(item[key], **value)
+        else:
+            item[key] = value
+    return item
+
+
+class _Parts:
+    """
+    Parts of a response being built from the cache and partial responses.
+    """
+
+    def __init__(self):
+        self.commons: Dict[str, dict] = {}
+        self.localizeds: Dict[str, dict] = {}
+        self.deferreds: List[Deferred] = []
+        self.errors: List[dict] = []
+
+
+class PaapiLocalizationMiddleware:
+    """
+    Reduces calls and bytes of GetItems requests for the same ASINs in multiple languages of a marketplace,
+    e.g. ar_AE and en_AE of www.amazon.ae.
+
+    Each item is split into the language-independent part, e.g. Images and Offers, cached per (marketplace, ASIN),
+    and the localized part of PAAPI_LOCALIZATION_RESOURCES, e.g. ItemInfo.Title and BrowseNodeInfo.BrowseNodes,
+    cached per (marketplace, ASIN, language). An ASIN not in the cache is fetched with all the resources. Once its
+    language-independent part is cached or being fetched, only the localized resources are fetched for the other
+    languages. Responses are built by merging both parts, so the callbacks receive the same items as without
+    this middleware.
+
+    Only requests with LanguagesOfPreference are handled, e.g. PaapiRequest.get_items(..., languages_of_preference=
+    ["ar_AE"]). Parts expire after PAAPI_LOCALIZATION_TTL seconds.
+
+    This middleware must be placed before PaapiDedupMiddleware and PaapiBatchMiddleware.
+    """
+
+    def __init__(self, crawler: Crawler, localized_resources: List[str], ttl: float, max_size: int):
+        self._crawler = crawler
+        self._stats = crawler.stats
+        self._localized_resources = frozenset(localized_resources)
+        self._cache = TimeBoundedCache(ttl, max_size)
+        self._prefixes = KeyPrefixes()  # params key -> short prefix of cache keys
+        # cache key of a language-independent part being fetched -> (resources, deferreds waiting for the response)
+        self._in_flight: Dict[str, Tuple[FrozenSet[str], List[Deferred]]] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(
+            crawler=crawler,
+            localized_resources=crawler.settings.getlist("PAAPI_LOCALIZATION_RESOURCES", list(LOCALIZED_RESOURCES)),
+            ttl=crawler.settings.getfloat("PAAPI_LOCALIZATION_TTL", 600),
+            max_size=crawler.settings.getint("PAAPI_LOCALIZATION_MAX_SIZE", 1_000_000),
+        )
+
+    def _is_localized(self, resource: str) -> bool:
+        return any(resource == r or resource.startswith(r + ".") for r in self._localized_resources)
+
+    def _get_prefix(self, request: PaapiRequest) -> str:
+        """
+        Returns a short prefix identifying the endpoint and parameters other than ItemIds, Resources and
+        LanguagesOfPreference, e.g. the partner tag and Condition.
+        """
+
+        return self._prefixes.get(get_params_key(request, exclude=("ItemIds", "Resources", "LanguagesOfPreference")))
+
+    def _get_part(self, key: str, resources: FrozenSet[str]) -> Optional[dict]:
+        """
+        Returns the cached part of an item if it covers the resources.
+        """
+
+        entry = self._cache.get(key)
+        if entry is None or not resources <= entry[0]:
+            return None
+        return entry[1]
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, PaapiRequest) or request.meta["paapi_operation"] != "GetItems":
+            return  # proceed to next middleware
+        data = request.paapi_data
+        if request.meta.get("paapi_localization_part") or not data.get("LanguagesOfPreference"):
+            return
+
+        resources = data["Resources"]
+        localized_resources = frozenset(r for r in resources if self._is_localized(r))
+        common_resources = frozenset(resources) - localized_resources
+        if not localized_resources or not common_resources:
+            return  # nothing to share between languages
+
+        prefix = self._get_prefix(request)
+        language = data["LanguagesOfPreference"][0]
+        parts = _Parts()
+        full_item_ids, localized_item_ids, waiting_item_ids = [], [], []
+        for item_id in dict.fromkeys(data["ItemIds"]):
+            common_key = prefix + item_id
+            common = self._get_part(common_key, common_resources)
+            localized = self._get_part(f"{common_key} {language}", localized_resources)
+            if common is not None:
+                parts.commons[item_id] = common
+            elif common_key in self._in_flight and common_resources <= self._in_flight[common_key][0]:
+                waiting_item_ids.append(item_id)
+            else:
+                full_item_ids.append(item_id)
+                continue  # the localized part is fetched together
+            if localized is not None:
+                parts.localizeds[item_id] = localized
+            else:
+                localized_item_ids.append(item_id)
+
+        self._stats.inc_value("paapi/localization/common_hit_count", len(parts.commons))
+        self._stats.inc_value("paapi/localization/localized_hit_count", len(parts.localizeds))
+        if not full_item_ids and not localized_item_ids and not waiting_item_ids:
+            return self._build_response(request, parts)
+
+        localized_paths = frozenset(
+            [tuple(r.split(".")[:2]) for r in localized_resources] + [(field,) for field in LOCALIZED_FIELDS]
+        )
+        if full_item_ids:
+            self._stats.inc_value("paapi/localization/full_item_id_count", len(full_item_ids))
+            for item_id in full_item_ids:
+                self._in_flight[prefix + item_id] = (common_resources, [])
+            d = self._fetch(request, spider, full_item_ids, resources)
+            d.addBoth(
+                self._on_full_response,
+                prefix,
+                language,
+                full_item_ids,
+                common_resources,
+                localized_resources,
+                localized_paths,
+            )
+            d.addCallback(self._collect, parts, full_item_ids, localized_paths, common=True, localized=True)
+            parts.deferreds.append(d)
+        if localized_item_ids:
+            self._stats.inc_value("paapi/localization/localized_item_id_count", len(localized_item_ids))
+            d = self._fetch(request, spider, localized_item_ids, sorted(localized_resources))
+            d.addCallback(self._on_localized_response, prefix, language, localized_resources, localized_paths)
+            d.addCallback(self._collect, parts, localized_item_ids, localized_paths, common=False, localized=True)
+            parts.deferreds.append(d)
+        for item_id in waiting_item_ids:
+            d = Deferred()
+            self._in_flight[prefix + item_id][1].append(d)
+            d.addCallback(self._collect, parts, [item_id], localized_paths, common=True, localized=False)
+            parts.deferreds.append(d)
+
+        d = gather(parts.deferreds)
+        d.addCallback(lambda responses: self._build_response(request, parts, responses))
+        return await maybe_deferred_to_future(d)
+
+    def _fetch(self, request: PaapiRequest, spider, item_ids: List[str], resources: List[str]) -> Deferred:
+        part_request = request.replace(
+            data=dict(request.paapi_data, ItemIds=item_ids, Resources=list(resources)),
+            meta=dict(request.meta, paapi_localization_part=True),
+            dont_filter=True,
+        )
+        return download(self._crawler, part_request, spider)
+
+    def _on_full_response(
+        self,
+        result,
+        prefix: str,
+        language: str,
+        item_ids: List[str],
+        common_resources: FrozenSet[str],
+        localized_resources: FrozenSet[str],
+        localized_paths: FrozenSet[Tuple[str, ...]],
+    ):
+        """
+        Caches both parts of the items and passes the response, or the failure, to the waiting requests.
+        """
+
+        if isinstance(result, Response) and result.status < 400:
+            for item in result.json().get("ItemsResult", {}).get("Items", []):
+                common, localized = split_item(item, localized_paths)
+                self._cache.put(prefix + item["ASIN"], (common_resources, common))
+                self._cache.put(f"{prefix}{item['ASIN']} {language}", (localized_resources, localized))
+
+        for item_id in item_ids:
+            _, waiters = self._in_flight.pop(prefix + item_id, (None, ()))
+            for d in waiters:
+                if isinstance(result, Response):
+                    d.callback(result)
+                else:
+                    d.errback(result)
+        return result
+
+    def _on_localized_response(
+        self,
+        response: Response,
+        prefix: str,
+        language: str,
+        localized_resources: FrozenSet[str],
+        localized_paths: FrozenSet[Tuple[str, ...]],
+    ) -> Response:
+        if response.status < 400:
+            for item in response.json().get("ItemsResult", {}).get("Items", []):
+                _, localized = split_item(item, localized_paths)
+                self._cache.put(f"{prefix}{item['ASIN']} {language}", (localized_resources, localized))
+        return response
+
+    def _collect(
+        self,
+        response: Response,
+        parts: _Parts,
+        item_ids: List[str],
+        localized_paths: FrozenSet[Tuple[str, ...]],
+        common: bool,
+        localized: bool,
+    ) -> Response:
+        if response.status >= 400:
+            return response
+
+        data = split_get_items_data(response.json(), item_ids)
+        for item in data.get("ItemsResult", {}).get("Items", []):
+            common_part, localized_part = split_item(item, localized_paths)
+            if common:
+                parts.commons[item["ASIN"]] = common_part
+            if localized:
+                parts.localizeds[item["ASIN"]] = localized_part
+        parts.errors.extend(data.get("Errors", []))
+        return response
+
+    def _build_response(self, request: PaapiRequest, parts: _Parts, responses: Optional[List[Response]] = None):
+        """
+        Builds a response for the request from the parts, or returns the first error response of the parts.
+        """
+
+        for response in responses or ():
+            if response.status >= 400:
+                return response.replace(request=request)
+
+        items = []
+        for item_id in dict.fromkeys(request.paapi_data["ItemIds"]):
+            common = parts.commons.get(item_id)
+            if common is not None:
+                items.append(merge_item(common, parts.localizeds.get(item_id, {})))
+
+        # An error of an ItemId can be in the responses of both parts.
+        errors = list({json.dumps(error, sort_keys=True): error for error in parts.errors}.values())
+        merged_data: Dict[str, Any] = {}
+        if items:
+            merged_data["ItemsResult"] = {"Items": items}
+        if errors:
+            merged_data["Errors"] = errors
+        body = json.dumps(merged_data).encode("utf-8")
+        if responses:
+            return responses[0].replace(request=request, body=body)
+        return GetItemsResponse(request.url, status=200, body=body, request=request)
@@ -1,51 +1,129 @@
-import os
-from urllib.parse import urlparse
+import logging
+import time
+from typing import List, Optional
 
 from scrapy.crawler import Crawler
+from scrapy.utils.httpobj import urlparse_cached
 
 from scrapy_paapi.constant import HOST_TO_REGIONS
-from scrapy_paapi.signer import get_authorization_headers
+from scrapy_paapi.credentials import EJECTING_ERROR_TYPES, Credential, CredentialPool
+from scrapy_paapi.handler import ACCEPT_ENCODING, decode_body
 from scrapy_paapi.request import PaapiRequest
-from scrapy_paapi.response import PaapiErrorResponse, GetBrowseNodesResponse, GetItemsResponse, SearchItemsResponse
+from scrapy_paapi.response import (
+    BasePaapiResponse,
+    PaapiErrorResponse,
+    GetBrowseNodesResponse,
+    GetItemsResponse,
+    GetVariationsResponse,
+    SearchItemsResponse,
+)
+from scrapy_paapi.stats import PaapiStats
+
+logger = logging.getLogger(__name__)
 
 
 class PaapiMiddleware:
-    def __init__(self, access_key: str, secret_key: str):
-        self._access_key = access_key
-        self._secret_key = secret_key
+    def __init__(
+        self,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        credentials: Optional[List[dict]] = None,
+        eject_seconds: float = 60,
+        stats=None,
+        stats_enabled: bool = True,
+        compression_enabled: bool = True,
+        pool: Optional[CredentialPool] = None,
+    ):
+        """
+        credentials is a list of dicts with keys access_key, secret_key, and optionally partner_tag and tps.
+        If it is given, access_key and secret_key are ignored. If pool is given, all of them are ignored.
+        When stats_enabled is true, timings, sizes and errors of PA-API calls are recorded to stats.
+        When compression_enabled is true, compressed responses are requested, otherwise uncompressed ones.
+        """
+
+        if pool is None:
+            if not credentials:
+                credentials = [{"access_key": access_key, "secret_key": secret_key}]
+            pool = CredentialPool([Credential(**c) for c in credentials], eject_seconds=eject_seconds)
+        self._pool = pool
+        self._stats = stats
+        self._paapi_stats = PaapiStats(stats) if stats is not None and stats_enabled else None
+        self._accept_encoding = ACCEPT_ENCODING if compression_enabled else b"identity"
 
     @classmethod
     def from_crawler(cls, crawler: Crawler):
-        AMAZON_ACCESS_KEY = crawler.settings.get("AMAZON_ACCESS_KEY", os.environ.get("AMAZON_ACCESS_KEY"))
-        AMAZON_SECRET_KEY = crawler.settings.get("AMAZON_SECRET_KEY", os.environ.get("AMAZON_SECRET_KEY"))
-
-        return cls(access_key=AMAZON_ACCESS_KEY, secret_key=AMAZON_SECRET_KEY)
+        return cls(
+            pool=CredentialPool.from_crawler(crawler),  # shared with PaapiThrottleMiddleware
+            stats=crawler.stats,
+            stats_enabled=crawler.settings.getbool("PAAPI_STATS_ENABLED", True),
+            compression_enabled=crawler.settings.getbool("PAAPI_COMPRESSION_ENABLED", True),
+        )
 
     def process_request(self, request, spider):
         if not isinstance(request, PaapiRequest):
             return  # proceed to next middleware
 
-        o = urlparse(request.url)
-        host = o.netloc
+        # Usually assigned by PaapiThrottleMiddleware already
+        credential, new_request = self._pool.assign(request)
+        if new_request is not None:
+            return new_request
+
+        if self._stats is not None and len(self._pool) > 1:
+            self._stats.inc_value(f"paapi/credentials/{credential.index}/request_count")
+
+        host = request.headers.get("host")
+        if host is None:
+            host = urlparse_cached(request).netloc
+            request.headers["host"] = host
+        else:
+            host = host.decode("utf-8")
         region = HOST_TO_REGIONS[host]
-        request.headers.setdefault("host", host)
+        request.headers.setdefault("Accept-Encoding", self._accept_encoding)
+        request.meta.pop("paapi_wire_bytes", None)  # of the previous try of a retried request
 
-        auth_headers = get_authorization_headers(
-            self._access_key,
-            self._secret_key,
+        start = time.perf_counter()
+        auth_headers = credential.signer.get_authorization_headers(
             region,
-            "ProductAdvertisingAPI",
             request.method,
             request.url,
             request.headers,
             request.body,
         )
         request.headers.update(auth_headers)  # Add auth headers
+        if self._paapi_stats is not None:
+            self._paapi_stats.record_signing(time.perf_counter() - start)
 
     def process_response(self, request, response, spider):
         if not isinstance(request, PaapiRequest):
             return response  # non-paapi response
 
+        start = time.perf_counter()
+        content_encoding = response.headers.getlist("Content-Encoding")
+        if content_encoding:  # not decompressed by HttpCompressionMiddleware, e.g. COMPRESSION_ENABLED = False
+            response = self._decompress_response(request, response, content_encoding)
+        response = self._convert_response(request, response)
+        if (
+            self._paapi_stats is not None
+            and isinstance(response, BasePaapiResponse)
+            and "paapi_access_key" in request.meta  # not the responses split by PaapiBatchMiddleware
+        ):
+            self._paapi_stats.record_response(request, response, time.perf_counter() - start)
+
+        if response.status >= 400:
+            return self._handle_credential_error(request, response, spider)
+        return response
+
+    def _decompress_response(self, request, response, content_encoding):
+        body = decode_body(response.body, content_encoding)
+        if body is None:
+            return response  # unsupported encoding, fails to be parsed as JSON
+
+        request.meta["paapi_wire_bytes"] = len(response.body)
+        response = response.replace(body=body)
+        del response.headers["Content-Encoding"]
+        return response
+
+    def _convert_response(self, request, response):
         if response.status >= 400:
             return response.replace(cls=PaapiErrorResponse)
 
@@ -55,7 +133,41 @@ class PaapiMiddleware:
             return response.replace(cls=GetBrowseNodesResponse)
         elif operation == "GetItems":
             return response.replace(cls=GetItemsResponse)
+        elif operation == "GetVariations":
+            return response.replace(cls=GetVariationsResponse)
         elif operation == "SearchItems":
             return response.replace(cls=SearchItemsResponse)
 
         return response
+
+    def _handle_credential_error(self, request, response, spider):
+        credential = self._pool.get(request.meta.get("paapi_access_key"))
+        if credential is None:
+            return response  # e.g. response of a request held by PaapiBatchMiddleware
+
+        try:
+            error_type = response.error_type
+        except (ValueError, KeyError):
+            error_type = ""
+        if response.status != 429 and not any(t in error_type for t in EJECTING_ERROR_TYPES):
+            return response
+
+        logger.debug(
+            "Ejecting access key %(access_key)s: %(response)s",
+            {"access_key": credential.access_key, "response": response},
+            extra={"spider": spider},
+        )
+        self._pool.eject(credential)
+        if self._stats is not None:
+            self._stats.inc_value(f"paapi/credentials/{credential.index}/ejected_count")
+
+        failed_access_keys = request.meta.get("paapi_failed_access_keys", []) + [credential.access_key]
+        request.meta["paapi_failed_access_keys"] = failed_access_keys
+        if response.status == 429:
+            # PaapiThrottleMiddleware slows down the credential, and the retried request gets another one.
+            return response
+        if not self._pool.has_alternative(exclude=failed_access_keys):
+            return response
+
+        # Retry immediately with another credential
+        return request.replace(dont_filter=True)
@@ -0,0 +1,240 @@
+import logging
+from collections.abc import Mapping, Sequence
+from typing import Dict, Optional, Set, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.utils.misc import load_object
+
+from scrapy_paapi.request import PaapiRequest
+
+logger = logging.getLogger(__name__)
+
+# Resources that are returned outside of items, e.g. SearchResult.SearchRefinements. They are never narrowed.
+NON_ITEM_RESOURCE_ROOTS = ("SearchRefinements", "VariationSummary")
+
+Path = Tuple[str, ...]
+
+
+class ResourceRecorder:
+    """
+    Records paths of response data that are read through recording proxies.
+
+    Reading a value records its path. Iterating over a mapping, e.g. dict(item) or item.items(), records that the
+    whole subtree is used.
+    """
+
+    def __init__(self):
+        self.paths: Set[Path] = set()
+        self.whole_paths: Set[Path] = set()
+        self.requested_resources: Set[str] = set()
+        self.response_count = 0  # responses whose callbacks have returned
+
+    @property
+    def has_reads(self) -> bool:
+        return bool(self.paths or self.whole_paths)
+
+    def record(self, path: Path, whole: bool = False):
+        if whole:
+            self.whole_paths.add(path)
+        else:
+            self.paths.add(path)
+
+    def wrap(self, value, path: Path):
+        if isinstance(value, dict):
+            return _RecordingMapping(value, path, self)
+        if isinstance(value, list):
+            return _RecordingSequence(value, path, self)
+        return value
+
+    def is_used(self, resource: str) -> bool:
+        parts = tuple(resource.split("."))
+        if parts[0] in NON_ITEM_RESOURCE_ROOTS:
+            return True
+
+        n = len(parts)
+        for path in self.paths:
+            if path[:n] == parts:
+                return True
+        for path in self.whole_paths:
+            if path[:n] == parts or parts[: len(path)] == path:
+                return True
+        return False
+
+
+class _RecordingMapping(Mapping):
+    __slots__ = ("_data", "_path", "_recorder")
+
+    def __init__(self, data: dict, path: Path, recorder: ResourceRecorder):
+        self._data = data
+        self._path = path
+        self._recorder = recorder
+
+    def __getitem__(self, key):
+        path = self._path + (key,)
+        self._recorder.record(path)
+        return self._recorder.wrap(self._data[key], path)
+
+    def __iter__(self):
+        self._recorder.record(self._path, whole=True)
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+
+class _RecordingSequence(Sequence):
+    __slots__ = ("_data", "_path", "_recorder")
+
+    def __init__(self, data: list, path: Path, recorder: ResourceRecorder):
+        self._data = data
+        self._path = path
+        self._recorder = recorder
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._recorder.wrap(value, self._path) for value in self._data[index]]
+        return self._recorder.wrap(self._data[index], self._path)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __repr__(self):
+        return repr(self._data)
+
+
+class _CallbackState:
+    def __init__(self, key: Tuple[str, str]):
+        self.key = key
+        self.recorder = ResourceRecorder()
+        self.full_response_count = 0
+        self.full_bytes = 0
+        self.used_resources: Optional[Set[str]] = None
+
+    @property
+    def average_full_bytes(self) -> float:
+        if not self.full_response_count:
+            return 0  # e.g. a narrowed request restored from JOBDIR after a restart
+        return self.full_bytes / self.full_response_count
+
+
+class PaapiResourceMinimizerMiddleware:
+    """
+    Narrows Resources of PaapiRequests to the resources that the callback actually reads.
+
+    During a warm-up window of PAAPI_MINIMIZER_WARMUP responses per (callback, operation), items and browse nodes
+    of responses are returned as read-only recording proxies. A response counts toward the window only after its
+    callback has returned, which PaapiResourceMinimizerSpiderMiddleware tracks, so it must be enabled as well.
+    After the window, subsequent requests for the same callback only request the resources that were read.
+    typed_items reads the fields mapped by the models through the proxies, so callbacks using it are narrowed to
+    the resources of those fields.
+
+    Data read with response.json() is not recorded. A callback without any recorded read is never narrowed.
+
+    This middleware must be placed before PaapiBatchMiddleware and PaapiMiddleware.
+    """
+
+    def __init__(self, crawler: Crawler, warmup: int):
+        self._stats = crawler.stats
+        self._warmup = warmup
+        self._states: Dict[Tuple[str, str], _CallbackState] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        spider_middlewares = crawler.settings.getwithbase("SPIDER_MIDDLEWARES")
+        if not any(
+            load_object(path) is PaapiResourceMinimizerSpiderMiddleware
+            for path, order in spider_middlewares.items()
+            if order is not None
+        ):
+            logger.warning("Resources are never narrowed because PaapiResourceMinimizerSpiderMiddleware is not enabled")
+        return cls(crawler=crawler, warmup=crawler.settings.getint("PAAPI_MINIMIZER_WARMUP", 10))
+
+    def _get_state(self, request: PaapiRequest) -> _CallbackState:
+        callback_name = getattr(request.callback, "__name__", "parse")
+        key = (callback_name, request.meta["paapi_operation"])
+        state = self._states.get(key)
+        if state is None:
+            state = self._states[key] = _CallbackState(key)
+        return state
+
+    def process_request(self, request, spider):
+        if not isinstance(request, PaapiRequest) or request.meta.get("paapi_batched"):
+            return  # proceed to next middleware
+        if "paapi_minimized" in request.meta or "paapi_resource_recorder" in request.meta:
+            return  # already processed
+
+        state = self._get_state(request)
+        resources = request.paapi_data.get("Resources", [])
+
+        if state.used_resources is None:
+            recorder = state.recorder
+            if recorder.response_count < self._warmup or not recorder.has_reads:
+                recorder.requested_resources.update(resources)
+                request.meta["paapi_resource_recorder"] = recorder
+                return
+
+            state.used_resources = {r for r in recorder.requested_resources if recorder.is_used(r)}
+            logger.info(
+                "Narrowed resources of %(key)s to %(resources)s",
+                {"key": "/".join(state.key), "resources": sorted(state.used_resources)},
+                extra={"spider": spider},
+            )
+
+        narrowed_resources = [
+            r for r in resources if r in state.used_resources or r not in state.recorder.requested_resources
+        ]
+        if narrowed_resources == resources:
+            request.meta["paapi_minimized"] = False
+            return
+
+        data = dict(request.paapi_data)
+        if narrowed_resources:
+            data["Resources"] = narrowed_resources
+        else:
+            del data["Resources"]
+        narrowed_request = request.replace(data=data, dont_filter=True)
+        narrowed_request.meta["paapi_minimized"] = True
+        self._stats.inc_value("paapi/minimizer/narrowed_request_count")
+        return narrowed_request
+
+    def process_response(self, request, response, spider):
+        if not isinstance(request, PaapiRequest) or response.status >= 400:
+            return response
+
+        if "paapi_resource_recorder" in request.meta:
+            state = self._get_state(request)
+            state.full_response_count += 1
+            state.full_bytes += len(response.body)
+        elif request.meta.get("paapi_minimized"):
+            state = self._get_state(request)
+            self._stats.inc_value("paapi/minimizer/narrowed_response_count")
+            self._stats.inc_value(
+                "paapi/minimizer/bytes_saved", max(0, int(state.average_full_bytes - len(response.body)))
+            )
+
+        return response
+
+
+class PaapiResourceMinimizerSpiderMiddleware:
+    """
+    Counts a warm-up response of PaapiResourceMinimizerMiddleware after its callback has returned, so that the
+    resources are not narrowed before the callback has read them.
+    """
+
+    def process_spider_output(self, response, result, spider):
+        yield from result
+        self._count(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        async for r in result:
+            yield r
+        self._count(response)
+
+    @staticmethod
+    def _count(response):
+        recorder = response.meta.get("paapi_resource_recorder") if response.request is not None else None
+        if recorder is not None:
+            recorder.response_count += 1
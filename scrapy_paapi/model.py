@@ -0,0 +1,277 @@
+"""
+Compact typed models of PA-API results.
+
+Each model only materializes the branches that are present in the response, i.e. the requested resources.
+Attributes of branches that were not requested are None.
+"""
+from sys import intern
+from typing import Optional, Tuple
+
+
+def _intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else intern(value)
+
+
+def _display_value(data: dict, *keys: str):
+    for key in keys:
+        data = data.get(key)
+        if data is None:
+            return None
+    return data.get("DisplayValue")
+
+
+class _Model:
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(self) is not type(other):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __hash__(self):
+        return hash((type(self),) + tuple(getattr(self, name) for name in self.__slots__))
+
+    def __repr__(self):
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class Price(_Model):
+    __slots__ = ("amount", "currency", "display_amount")
+
+    def __init__(self, amount: float, currency: str, display_amount: str):
+        self.amount = amount
+        self.currency = currency
+        self.display_amount = display_amount
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["Price"]:
+        if data is None:
+            return None
+        return cls(data.get("Amount"), _intern(data.get("Currency")), data.get("DisplayAmount"))
+
+
+class Image(_Model):
+    """
+    Resources: Images.Primary.*, Images.Variants.*
+    """
+
+    __slots__ = ("url", "height", "width")
+
+    def __init__(self, url: str, height: int, width: int):
+        self.url = url
+        self.height = height
+        self.width = width
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["Image"]:
+        if data is None:
+            return None
+        return cls(data["URL"], data.get("Height"), data.get("Width"))
+
+
+class ImageSet(_Model):
+    __slots__ = ("small", "medium", "large")
+
+    def __init__(self, small: Optional[Image], medium: Optional[Image], large: Optional[Image]):
+        self.small = small
+        self.medium = medium
+        self.large = large
+
+    @classmethod
+    def from_dict(cls, data: Optional[dict]) -> Optional["ImageSet"]:
+        if data is None:
+            return None
+        return cls(
+            Image.from_dict(data.get("Small")), Image.from_dict(data.get("Medium")), Image.from_dict(data.get("Large"))
+        )
+
+
+class Listing(_Model):
+    """
+    Resources: Offers.Listings.*
+    """
+
+    __slots__ = (
+        "id",
+        "price",
+        "saving_basis",
+        "condition",
+        "sub_condition",
+        "availability_type",
+        "availability_message",
+        "merchant_id",
+        "merchant_name",
+        "is_buy_box_winner",
+        "is_amazon_fulfilled",
+        "is_free_shipping_eligible",
+        "is_prime_eligible",
+        "loyalty_points",
+    )
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Listing":
+        condition = data.get("Condition", {})
+        availability = data.get("Availability", {})
+        merchant_info = data.get("MerchantInfo", {})
+        delivery_info = data.get("DeliveryInfo", {})
+        return cls(
+            id=data.get("Id"),
+            price=Price.from_dict(data.get("Price")),
+            saving_basis=Price.from_dict(data.get("SavingBasis")),
+            condition=_intern(condition.get("Value")),
+            sub_condition=_intern(condition.get("SubCondition", {}).get("Value")),
+            availability_type=_intern(availability.get("Type")),
+            availability_message=_intern(availability.get("Message")),
+            merchant_id=_intern(merchant_info.get("Id")),
+            merchant_name=_intern(merchant_info.get("Name")),
+            is_buy_box_winner=data.get("IsBuyBoxWinner"),
+            is_amazon_fulfilled=delivery_info.get("IsAmazonFulfilled"),
+            is_free_shipping_eligible=delivery_info.get("IsFreeShippingEligible"),
+            is_prime_eligible=delivery_info.get("IsPrimeEligible"),
+            loyalty_points=data.get("LoyaltyPoints", {}).get("Points"),
+        )
+
+
+class OfferSummary(_Model):
+    """
+    Resources: Offers.Summaries.*
+    """
+
+    __slots__ = ("condition", "highest_price", "lowest_price", "offer_count")
+
+    def __init__(self, condition: str, highest_price: Optional[Price], lowest_price: Optional[Price], offer_count: int):
+        self.condition = condition
+        self.highest_price = highest_price
+        self.lowest_price = lowest_price
+        self.offer_count = offer_count
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "OfferSummary":
+        return cls(
+            condition=_intern(data.get("Condition", {}).get("Value")),
+            highest_price=Price.from_dict(data.get("HighestPrice")),
+            lowest_price=Price.from_dict(data.get("LowestPrice")),
+            offer_count=data.get("OfferCount"),
+        )
+
+
+class BrowseNode(_Model):
+    """
+    Resources: BrowseNodeInfo.BrowseNodes.*, BrowseNodes.*
+    """
+
+    __slots__ = ("id", "display_name", "context_free_name", "is_root", "sales_rank", "ancestor", "children")
+
+    def __init__(
+        self,
+        id: str,
+        display_name: Optional[str] = None,
+        context_free_name: Optional[str] = None,
+        is_root: Optional[bool] = None,
+        sales_rank: Optional[int] = None,
+        ancestor: Optional["BrowseNode"] = None,
+        children: Optional[Tuple["BrowseNode", ...]] = None,
+    ):
+        self.id = id
+        self.display_name = display_name
+        self.context_free_name = context_free_name
+        self.is_root = is_root
+        self.sales_rank = sales_rank
+        self.ancestor = ancestor
+        self.children = children
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BrowseNode":
+        ancestor = data.get("Ancestor")
+        children = data.get("Children")
+        return cls(
+            id=_intern(data["Id"]),
+            display_name=_intern(data.get("DisplayName")),
+            context_free_name=_intern(data.get("ContextFreeName")),
+            is_root=data.get("IsRoot"),
+            sales_rank=data.get("SalesRank"),
+            ancestor=None if ancestor is None else cls.from_dict(ancestor),
+            children=None if children is None else tuple(cls.from_dict(child) for child in children),
+        )
+
+
+class Item(_Model):
+    """
+    An item of GetItems, GetVariations and SearchItems.
+    """
+
+    __slots__ = (
+        "asin",
+        "detail_page_url",
+        "parent_asin",
+        "title",
+        "features",
+        "brand",
+        "manufacturer",
+        "primary_image",
+        "variant_images",
+        "listings",
+        "offer_summaries",
+        "browse_nodes",
+        "website_sales_rank",
+    )
+
+    def __init__(self, **kwargs):
+        for name in self.__slots__:
+            setattr(self, name, kwargs.get(name))
+
+    @property
+    def buy_box_listing(self) -> Optional[Listing]:
+        for listing in self.listings or ():
+            if listing.is_buy_box_winner:
+                return listing
+        return None
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Item":
+        kwargs = {
+            "asin": data["ASIN"],
+            "detail_page_url": data.get("DetailPageURL"),
+            "parent_asin": data.get("ParentASIN"),
+        }
+
+        item_info = data.get("ItemInfo")
+        if item_info is not None:
+            kwargs["title"] = _display_value(item_info, "Title")
+            features = item_info.get("Features")
+            if features is not None:
+                kwargs["features"] = tuple(features["DisplayValues"])
+            kwargs["brand"] = _intern(_display_value(item_info, "ByLineInfo", "Brand"))
+            kwargs["manufacturer"] = _intern(_display_value(item_info, "ByLineInfo", "Manufacturer"))
+
+        images = data.get("Images")
+        if images is not None:
+            kwargs["primary_image"] = ImageSet.from_dict(images.get("Primary"))
+            variants = images.get("Variants")
+            if variants is not None:
+                kwargs["variant_images"] = tuple(ImageSet.from_dict(variant) for variant in variants)
+
+        offers = data.get("Offers")
+        if offers is not None:
+            listings = offers.get("Listings")
+            if listings is not None:
+                kwargs["listings"] = tuple(Listing.from_dict(listing) for listing in listings)
+            summaries = offers.get("Summaries")
+            if summaries is not None:
+                kwargs["offer_summaries"] = tuple(OfferSummary.from_dict(summary) for summary in summaries)
+
+        browse_node_info = data.get("BrowseNodeInfo")
+        if browse_node_info is not None:
+            browse_nodes = browse_node_info.get("BrowseNodes")
+            if browse_nodes is not None:
+                kwargs["browse_nodes"] = tuple(BrowseNode.from_dict(node) for node in browse_nodes)
+            website_sales_rank = browse_node_info.get("WebsiteSalesRank")
+            if website_sales_rank is not None:
+                kwargs["website_sales_rank"] = website_sales_rank.get("SalesRank")
+
+        return cls(**kwargs)
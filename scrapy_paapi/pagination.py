@@ -0,0 +1,56 @@
+from typing import Iterator, List
+
+from scrapy.crawler import Crawler
+from scrapy.spidermiddlewares.httperror import HttpError
+from twisted.internet.defer import Deferred, DeferredList
+
+from scrapy_paapi.response import BasePaapiResponse, PaapiErrorResponse
+from scrapy_paapi.utils import download
+
+
+def fetch_all_pages(crawler: Crawler, response: BasePaapiResponse) -> Deferred:
+    """
+    Downloads all the remaining pages of the response concurrently.
+
+    Returns a Deferred that fires with a list of the response and the following pages in page order. Pages past the
+    last page, which may be requested speculatively, are discarded. If a page fails, e.g. with TooManyRequests, the
+    Deferred fails with HttpError of the error response.
+
+    Nothing is cancelled: all the pages are downloaded before the Deferred fires, so speculative pages past the last
+    page still use the quota. Use it from a coroutine callback:
+
+        responses = await maybe_deferred_to_future(fetch_all_pages(self.crawler, response))
+        for item in iter_items_of_pages(responses):
+            ...
+    """
+
+    requests = response.follow_all_pages()
+    d = DeferredList(
+        [download(crawler, request, crawler.spider) for request in requests],
+        fireOnOneErrback=True,
+        consumeErrors=True,
+    )
+    d.addCallbacks(_truncate_pages, _unwrap_first_error, callbackArgs=(response,))
+    return d
+
+
+def _truncate_pages(results: list, response: BasePaapiResponse) -> List[BasePaapiResponse]:
+    pages = [response]
+    for _, page in results:
+        if pages[-1].follow_next_page() is None:
+            break  # past the last page
+        if page.status >= 400:
+            if isinstance(page, PaapiErrorResponse) and any(error["Code"] == "NoResults" for error in page.errors):
+                break  # past the last page, requested speculatively without TotalResultCount
+            raise HttpError(page, f"Failed to download page {len(pages) + 1}: {page}")
+        pages.append(page)
+    return pages
+
+
+def _unwrap_first_error(failure):
+    return failure.value.subFailure
+
+
+def iter_items_of_pages(responses: List[BasePaapiResponse]) -> Iterator[dict]:
+    for response in responses:
+        yield from response.iter_items()
@@ -0,0 +1,228 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import zlib
+from time import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from itemadapter import ItemAdapter
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.exceptions import DropItem
+from scrapy.utils.project import data_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BRANCHES = ("Offers", "ItemInfo")
+
+
+def flatten(value: Any, path: str, fields: Dict[str, Any]):
+    """
+    Adds the leaves of value to fields keyed by their paths, e.g. Offers.Listings[0].Price.Amount.
+    """
+
+    if isinstance(value, dict):
+        for key, child in value.items():
+            flatten(child, f"{path}.{key}", fields)
+    elif isinstance(value, list):
+        for i, child in enumerate(value):
+            flatten(child, f"{path}[{i}]", fields)
+    else:
+        fields[path] = value
+
+
+def get_digest(fields: Dict[str, Any]) -> bytes:
+    return hashlib.blake2b(
+        json.dumps(fields, sort_keys=True, separators=(",", ":")).encode("utf-8"), digest_size=8
+    ).digest()
+
+
+def diff_fields(old_fields: Dict[str, Any], new_fields: Dict[str, Any]) -> Dict[str, list]:
+    """
+    Returns {path: [old value, new value]} of the changed fields. A missing value is None.
+    """
+
+    return {
+        path: [old_fields.get(path), new_fields.get(path)]
+        for path in sorted(old_fields.keys() | new_fields.keys())
+        if old_fields.get(path, ...) != new_fields.get(path, ...)
+    }
+
+
+class ItemChangeStore:
+    """
+    SQLite store of the last seen state of items keyed by (marketplace, ASIN).
+
+    Each row holds an 8-byte digest of the watched fields, to tell unchanged items quickly, and the compressed fields
+    themselves, to compute diffs of changed items. Counts of checks and changes give the change rate of each item.
+    """
+
+    def __init__(self, path: str):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS items ("
+            " marketplace TEXT NOT NULL,"
+            " asin TEXT NOT NULL,"
+            " digest BLOB NOT NULL,"
+            " fields BLOB NOT NULL,"
+            " checked_at REAL NOT NULL,"
+            " changed_at REAL NOT NULL,"
+            " check_count INTEGER NOT NULL,"
+            " change_count INTEGER NOT NULL,"
+            " PRIMARY KEY (marketplace, asin)"
+            ") WITHOUT ROWID"
+        )
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def get_digest(self, marketplace: str, asin: str) -> Optional[bytes]:
+        row = self.db.execute(
+            "SELECT digest FROM items WHERE marketplace = ? AND asin = ?", (marketplace, asin)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def get_fields(self, marketplace: str, asin: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            "SELECT fields FROM items WHERE marketplace = ? AND asin = ?", (marketplace, asin)
+        ).fetchone()
+        return json.loads(zlib.decompress(row[0])) if row is not None else None
+
+    def mark_checked(self, marketplace: str, asin: str, now: Optional[float] = None):
+        self.db.execute(
+            "UPDATE items SET checked_at = ?, check_count = check_count + 1 WHERE marketplace = ? AND asin = ?",
+            (time() if now is None else now, marketplace, asin),
+        )
+
+    def mark_changed(
+        self, marketplace: str, asin: str, digest: bytes, fields: Dict[str, Any], now: Optional[float] = None
+    ):
+        now = time() if now is None else now
+        compressed_fields = zlib.compress(json.dumps(fields, separators=(",", ":")).encode("utf-8"))
+        self.db.execute(
+            "INSERT INTO items"
+            " (marketplace, asin, digest, fields, checked_at, changed_at, check_count, change_count)"
+            " VALUES (?, ?, ?, ?, ?, ?, 1, 0)"
+            " ON CONFLICT (marketplace, asin) DO UPDATE SET"
+            " digest = excluded.digest, fields = excluded.fields, checked_at = excluded.checked_at,"
+            " changed_at = excluded.changed_at, check_count = check_count + 1, change_count = change_count + 1",
+            (marketplace, asin, digest, compressed_fields, now, now),
+        )
+
+    def iter_stale_first(
+        self, marketplace: Optional[str] = None, limit: int = -1, now: Optional[float] = None
+    ) -> Iterator[Tuple[str, str]]:
+        """
+        Yields (marketplace, ASIN) ordered by the expected number of changes since the last check, i.e. the change
+        rate per check (smoothed for items checked only a few times) multiplied by the seconds since the last check.
+        Items that change often and have not been checked for a long time come first.
+        """
+
+        where, params = "", []
+        if marketplace is not None:
+            where, params = "WHERE marketplace = ?", [marketplace]
+        cursor = self.db.execute(
+            f"SELECT marketplace, asin FROM items {where}"
+            " ORDER BY (change_count + 1.0) / (check_count + 2.0) * (? - checked_at) DESC LIMIT ?",
+            params + [time() if now is None else now, limit],
+        )
+        yield from cursor
+
+
+class PaapiChangeDetectionPipeline:
+    """
+    Emits only items whose watched branches (PAAPI_CHANGES_BRANCHES, Offers and ItemInfo by default) changed since
+    the last crawl, with the field-level diff in PAAPI_CHANGES_DIFF_FIELD. Unchanged items are dropped.
+
+    Items must be PA-API items, e.g. response.items of GetItemsResponse. The marketplace is taken from the
+    "marketplace" field if any, or from DetailPageURL.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        path: str,
+        branches: List[str],
+        diff_field: str,
+        emit_new: bool,
+        commit_interval: int = 1000,
+    ):
+        self._stats = crawler.stats
+        self._path = path
+        self._branches = branches
+        self._diff_field = diff_field
+        self._emit_new = emit_new
+        self._commit_interval = commit_interval
+        self._uncommitted_count = 0
+        self.store: Optional[ItemChangeStore] = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(
+            crawler=crawler,
+            path=data_path(crawler.settings.get("PAAPI_CHANGES_DB", "paapi-changes.sqlite3")),
+            branches=crawler.settings.getlist("PAAPI_CHANGES_BRANCHES", list(DEFAULT_BRANCHES)),
+            diff_field=crawler.settings.get("PAAPI_CHANGES_DIFF_FIELD", "changes"),
+            emit_new=crawler.settings.getbool("PAAPI_CHANGES_EMIT_NEW", True),
+        )
+
+    def open_spider(self, spider: Spider):
+        os.makedirs(os.path.dirname(self._path) or ".", exist_ok=True)
+        self.store = ItemChangeStore(self._path)
+        logger.debug("Using item change store in %(path)s", {"path": self._path}, extra={"spider": spider})
+
+    def close_spider(self, spider: Spider):
+        self.store.close()
+
+    def process_item(self, item, spider):
+        adapter = ItemAdapter(item)
+        asin = adapter.get("ASIN")
+        if asin is None:
+            return item  # not a PA-API item
+
+        marketplace = adapter.get("marketplace") or urlparse(adapter.get("DetailPageURL", "")).netloc
+        fields = {}
+        for branch in self._branches:
+            if branch in adapter:
+                flatten(adapter[branch], branch, fields)
+        digest = get_digest(fields)
+
+        old_digest = self.store.get_digest(marketplace, asin)
+        if old_digest == digest:
+            self.store.mark_checked(marketplace, asin)
+            self._maybe_commit()
+            self._stats.inc_value("paapi/changes/unchanged_count")
+            e = DropItem(f"Item {asin} in {marketplace} is unchanged")
+            e.log_level = "DEBUG"  # respected by Scrapy >= 2.13, not to flood the log with warnings
+            raise e
+
+        if old_digest is None:
+            diff = None
+            self._stats.inc_value("paapi/changes/new_count")
+        else:
+            diff = diff_fields(self.store.get_fields(marketplace, asin), fields)
+            self._stats.inc_value("paapi/changes/changed_count")
+        self.store.mark_changed(marketplace, asin, digest, fields)
+        self._maybe_commit()
+
+        if diff is None and not self._emit_new:
+            e = DropItem(f"Item {asin} in {marketplace} is seen for the first time")
+            e.log_level = "DEBUG"
+            raise e
+        if isinstance(item, dict):
+            item = dict(item)  # may be shared, e.g. an item of the cached response.json()
+            adapter = ItemAdapter(item)
+        adapter[self._diff_field] = diff
+        return item
+
+    def _maybe_commit(self):
+        self._uncommitted_count += 1
+        if self._uncommitted_count >= self._commit_interval:
+            self.store.db.commit()
+            self._uncommitted_count = 0
@@ -0,0 +1,198 @@
+"""
+Exports Scrapy stats in the Prometheus text exposition format.
+"""
+
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from scrapy import signals
+from scrapy.crawler import Crawler
+from scrapy.exceptions import NotConfigured
+from twisted.internet import task
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+
+from scrapy_paapi.utils import get_reactor
+
+# Stats prefixes recorded by scrapy_paapi.stats.PaapiStats and the names of the labels following them.
+HISTOGRAMS: Dict[str, Tuple[str, ...]] = {
+    "paapi/sign_seconds": (),
+    "paapi/convert_seconds": (),
+    "paapi/parse_seconds": ("operation",),
+    "paapi/latency_seconds": ("operation", "host"),
+}
+COUNTERS: Dict[str, Tuple[str, ...]] = {
+    "paapi/response_count": ("operation", "status"),
+    "paapi/response_bytes": ("operation",),
+    "paapi/wire_bytes": ("operation",),
+    "paapi/wire_bytes_saved": ("operation",),
+    "paapi/item_count": ("operation",),
+    "paapi/error_count": ("code",),
+    "paapi/invalid_json_count": ("operation",),
+}
+
+_INVALID_NAME_CHARS = re.compile(r"[^a-zA-Z0-9_]")
+
+
+def _metric_name(key: str) -> str:
+    name = _INVALID_NAME_CHARS.sub("_", key)
+    return name if name.startswith("paapi_") else f"scrapy_{name}"
+
+
+def _format_labels(labels: List[Tuple[str, str]]) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _parse_key(key: str) -> Optional[Tuple[str, str, List[Tuple[str, str]]]]:
+    """
+    Returns (type, metric name, labels) of a PaapiStats key, or None for other keys.
+    """
+
+    for prefix, label_names in HISTOGRAMS.items():
+        if not key.startswith(prefix + "/"):
+            continue
+        parts = key[len(prefix) + 1 :].split("/")
+        if len(parts) != len(label_names) + 1:
+            continue
+        labels = list(zip(label_names, parts))
+        name = _metric_name(prefix)
+        suffix = parts[-1]
+        if suffix.startswith("le_"):
+            return "histogram", f"{name}_bucket", labels + [("le", "+Inf" if suffix == "le_inf" else suffix[3:])]
+        return "histogram", f"{name}_{suffix}", labels
+
+    for prefix, label_names in COUNTERS.items():
+        if not key.startswith(prefix + "/"):
+            continue
+        parts = key[len(prefix) + 1 :].split("/")
+        if len(parts) != len(label_names):
+            continue
+        return "counter", f"{_metric_name(prefix)}_total", list(zip(label_names, parts))
+
+    return None
+
+
+def _sort_key(key: str) -> tuple:
+    """
+    Sorts histogram buckets numerically by le, e.g. le_2.5 before le_10.0, and before _sum and _count.
+    """
+
+    prefix, _, suffix = key.rpartition("/")
+    if suffix.startswith("le_"):
+        return prefix, 0, float(suffix[3:]), ""  # float("inf") for le_inf
+    return prefix, 1, 0.0, suffix
+
+
+def render_metrics(stats: dict) -> str:
+    """
+    Renders numeric stats. PaapiStats keys are exported as histograms and counters with labels, and the other
+    keys as gauges named after the key, e.g. downloader/request_count -> scrapy_downloader_request_count.
+    """
+
+    families: Dict[str, str] = {}  # family name -> type
+    samples = defaultdict(list)
+    for key, value in sorted(stats.items(), key=lambda kv: _sort_key(kv[0])):
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue  # e.g. start_time
+
+        parsed = _parse_key(key)
+        if parsed is None:
+            metric_type, name, labels = "gauge", _metric_name(key), []
+            family = name
+        else:
+            metric_type, name, labels = parsed
+            family = re.sub(r"_(bucket|sum|count|total)$", "", name)
+        families.setdefault(family, metric_type)
+        samples[family].append(f"{name}{_format_labels(labels)} {value}")
+
+    lines = []
+    for family, metric_type in families.items():
+        lines.append(f"# TYPE {family} {metric_type}")
+        lines.extend(samples[family])
+    return "\n".join(lines) + "\n"
+
+
+class _MetricsResource(Resource):
+    isLeaf = True
+
+    def __init__(self, exporter: "PaapiPrometheusExporter"):
+        super().__init__()
+        self._exporter = exporter
+
+    def render_GET(self, request):
+        request.setHeader(b"Content-Type", b"text/plain; version=0.0.4; charset=utf-8")
+        return self._exporter.render().encode("utf-8")
+
+
+class PaapiPrometheusExporter:
+    """
+    Extension that exposes stats to Prometheus by periodically writing them to PAAPI_PROMETHEUS_FILE
+    (e.g. for the textfile collector of node_exporter) and/or serving them at PAAPI_PROMETHEUS_PORT.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        path: Optional[str] = None,
+        port: Optional[int] = None,
+        host: str = "127.0.0.1",
+        interval: float = 15,
+    ):
+        if not path and not port:
+            raise NotConfigured("PAAPI_PROMETHEUS_FILE or PAAPI_PROMETHEUS_PORT is required")
+
+        self._stats = crawler.stats
+        self._path = path
+        self._port = port
+        self._host = host
+        self._interval = interval
+        self._loop: Optional[task.LoopingCall] = None
+        self._listening_port = None
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        exporter = cls(
+            crawler=crawler,
+            path=crawler.settings.get("PAAPI_PROMETHEUS_FILE"),
+            port=crawler.settings.getint("PAAPI_PROMETHEUS_PORT") or None,
+            host=crawler.settings.get("PAAPI_PROMETHEUS_HOST", "127.0.0.1"),
+            interval=crawler.settings.getfloat("PAAPI_PROMETHEUS_INTERVAL", 15),
+        )
+        crawler.signals.connect(exporter.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(exporter.spider_closed, signal=signals.spider_closed)
+        return exporter
+
+    def render(self) -> str:
+        return render_metrics(self._stats.get_stats())
+
+    def write(self):
+        """
+        Writes the metrics atomically so that a reader never sees a partially written file.
+        """
+
+        tmp_path = f"{self._path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, self._path)
+
+    def spider_opened(self, spider):
+        if self._path:
+            self._loop = task.LoopingCall(self.write)
+            self._loop.start(self._interval, now=True)
+        if self._port:
+            self._listening_port = get_reactor().listenTCP(
+                self._port, Site(_MetricsResource(self)), interface=self._host
+            )
+
+    def spider_closed(self, spider):
+        if self._loop is not None and self._loop.running:
+            self._loop.stop()
+        if self._path:
+            self.write()  # final values
+        if self._listening_port is not None:
+            return self._listening_port.stopListening()
@@ -1,5 +1,5 @@
 import json
-from typing import List, Optional
+from typing import List, Optional, Union
 
 from scrapy.http import JsonRequest
 from scrapy_paapi.constant import (
@@ -7,33 +7,84 @@ from scrapy_paapi.constant import (
     OPERATION_TO_PATHS,
     GET_BROWSE_NODES_RESOURCES,
     GET_ITEMS_RESOURCES,
+    GET_VARIATIONS_RESOURCES,
     SEARCH_ITEMS_RESOURCES,
 )
+from scrapy_paapi.utils import json_loads
+
+
+def get_accept_language(languages_of_preference: Optional[List[str]]) -> str:
+    """
+    Returns the Accept-Language header for LanguagesOfPreference, e.g. "ar-AE" for ["ar_AE"], or "en-US".
+    """
+
+    if languages_of_preference:
+        return languages_of_preference[0].replace("_", "-")
+    return "en-US"
+
+
+def _lower(key: Union[str, bytes]) -> str:
+    return (key.decode("latin-1") if isinstance(key, bytes) else key).lower()
 
 
 class PaapiRequest(JsonRequest):
     def __init__(self, *args, **kwargs):
+        meta = kwargs.setdefault("meta", {})
         body_passed = kwargs.get("body", None) is not None
-        self._parsed_data = json.loads(kwargs["body"]) if body_passed else kwargs.get("data", None)
+        if body_passed:
+            # When the operation is already known, e.g. replace() and PaapiRequestTemplate, parsing the body is
+            # deferred until paapi_data is accessed.
+            self._parsed_data = None if "paapi_operation" in meta else json_loads(kwargs["body"])
+        else:
+            self._parsed_data = kwargs.get("data", None)
 
-        operation = self._parsed_data["Operation"]
+        operation = meta.get("paapi_operation") or self._parsed_data["Operation"]
         kwargs.setdefault("method", "POST")
-        kwargs.setdefault("meta", {})["paapi_operation"] = operation
-        kwargs.setdefault("headers", {}).update(
+        meta["paapi_operation"] = operation
+        headers = kwargs.setdefault("headers", {})
+        headers.update(
             {
-                "Accept-Language": "en-US",
                 "Content-Encoding": "amz-1.0",
                 "X-Amz-Target": f"com.amazon.paapi5.v1.ProductAdvertisingAPIv1.{operation}",
             }
         )
+        # Accept-Language given by the caller takes precedence. Otherwise it follows LanguagesOfPreference.
+        self._explicit_accept_language = any(_lower(key) == "accept-language" for key in headers)
+        if not self._explicit_accept_language:
+            if self._parsed_data is None:
+                self._parsed_data = json_loads(kwargs["body"])
+            headers["Accept-Language"] = get_accept_language(self._parsed_data.get("LanguagesOfPreference"))
 
         super().__init__(*args, **kwargs)
 
-    def __str__(self):
+    def replace(self, *args, **kwargs):
+        """
+        Accept-Language not given by the caller is derived again from LanguagesOfPreference if data or body is
+        replaced.
+        """
+
+        if "headers" in kwargs:
+            return super().replace(*args, **kwargs)
+
+        headers = self.headers.copy()
+        if not self._explicit_accept_language and ("data" in kwargs or "body" in kwargs):
+            del headers["Accept-Language"]
+        request = super().replace(*args, headers=headers, **kwargs)
+        request._explicit_accept_language = self._explicit_accept_language
+        return request
+
+    @property
+    def paapi_data(self) -> dict:
+        """
+        Parsed request parameters. Do not modify the returned dict.
+        """
+
         if self._parsed_data is None:
-            self._parsed_data = json.loads(self.body)
+            self._parsed_data = json_loads(self.body)
+        return self._parsed_data
 
-        non_trivial_data = dict(self._parsed_data)
+    def __str__(self):
+        non_trivial_data = dict(self.paapi_data)
         non_trivial_data.pop("Marketplace", None)
         non_trivial_data.pop("Operation", None)
         non_trivial_data.pop("PartnerTag", None)
@@ -95,6 +146,7 @@ class PaapiRequest(JsonRequest):
         partner_tag: str,
         item_ids: List[str],
         resources: List[str] = None,
+        languages_of_preference: List[str] = None,
         **kwargs,
     ):
         """
@@ -103,6 +155,8 @@ class PaapiRequest(JsonRequest):
 
         resources = resources or GET_ITEMS_RESOURCES
         data = {"ItemIds": item_ids, "Resources": resources}
+        if languages_of_preference is not None:
+            data["LanguagesOfPreference"] = languages_of_preference
 
         return cls.of(
             marketplace=marketplace,
@@ -112,6 +166,39 @@ class PaapiRequest(JsonRequest):
             **kwargs,
         )
 
+    @classmethod
+    def get_variations(
+        cls,
+        marketplace: str,
+        partner_tag: str,
+        asin: str,
+        variation_page: Optional[int] = None,
+        variation_count: Optional[int] = None,
+        languages_of_preference: List[str] = None,
+        resources: List[str] = None,
+        **kwargs,
+    ):
+        """
+        See: https://webservices.amazon.com/paapi5/documentation/get-variations.html
+        """
+
+        resources = resources or GET_VARIATIONS_RESOURCES
+        data = {"ASIN": asin, "Resources": resources}
+        if variation_page is not None:
+            data["VariationPage"] = variation_page
+        if variation_count is not None:
+            data["VariationCount"] = variation_count
+        if languages_of_preference is not None:
+            data["LanguagesOfPreference"] = languages_of_preference
+
+        return cls.of(
+            marketplace=marketplace,
+            partner_tag=partner_tag,
+            operation="GetVariations",
+            data=data,
+            **kwargs,
+        )
+
     @classmethod
     def search_items(
         cls,
@@ -146,3 +233,86 @@ class PaapiRequest(JsonRequest):
             data=data,
             **kwargs,
         )
+
+
+OPERATION_TO_DEFAULT_RESOURCES = {
+    "GetBrowseNodes": GET_BROWSE_NODES_RESOURCES,
+    "GetItems": GET_ITEMS_RESOURCES,
+    "GetVariations": GET_VARIATIONS_RESOURCES,
+    "SearchItems": SEARCH_ITEMS_RESOURCES,
+}
+
+
+class PaapiRequestTemplate:
+    """
+    Template of PaapiRequests sharing marketplace, partner tag, operation and other invariant parameters.
+
+    The URL, the headers and the JSON of the invariant parameters are built once. Each request is stamped out by
+    splicing only the variable parameters into the body:
+
+        template = PaapiRequestTemplate("www.amazon.com", "yourtag-20", "GetItems")
+        for item_ids in chunks:
+            yield template.request({"ItemIds": item_ids}, callback=self.parse_items)
+    """
+
+    def __init__(
+        self,
+        marketplace: str,
+        partner_tag: str,
+        operation: str,
+        resources: List[str] = None,
+        request_cls=PaapiRequest,
+        **params,
+    ):
+        host = MARKETPLACE_TO_HOSTS[marketplace]
+        self.url = "https://" + host + OPERATION_TO_PATHS[operation]
+        self.operation = operation
+        self.request_cls = request_cls
+
+        data = dict(params)
+        data["Resources"] = resources or OPERATION_TO_DEFAULT_RESOURCES[operation]
+        data["PartnerTag"] = partner_tag
+        data["PartnerType"] = "Associates"
+        data["Marketplace"] = marketplace
+        data["Operation"] = operation
+        self._body_tail = json.dumps(data)[1:].encode("utf-8")  # '"Resources": [...], ..., "Operation": "..."}'
+        self._invariant_keys = frozenset(data)
+
+        self._headers = {
+            "Host": host,
+            "Accept-Language": get_accept_language(params.get("LanguagesOfPreference")),
+            "Content-Encoding": "amz-1.0",
+            "X-Amz-Target": f"com.amazon.paapi5.v1.ProductAdvertisingAPIv1.{operation}",
+        }
+
+    def request(self, data: dict, **kwargs) -> PaapiRequest:
+        """
+        Returns a request with the variable parameters in data. kwargs are passed to the request class.
+        Accept-Language follows LanguagesOfPreference in data unless it is given in headers.
+        """
+
+        if not self._invariant_keys.isdisjoint(data):
+            raise ValueError(
+                f"Parameters of the template cannot be overridden: {sorted(self._invariant_keys & set(data))}"
+            )
+        if data:
+            body = b"{" + json.dumps(data)[1:-1].encode("utf-8") + b", " + self._body_tail
+        else:
+            body = b"{" + self._body_tail
+
+        meta = kwargs.pop("meta", None)
+        meta = dict(meta, paapi_operation=self.operation) if meta else {"paapi_operation": self.operation}
+        merged_headers = dict(self._headers)
+        headers = kwargs.pop("headers", None)
+        header_keys = {_lower(key) for key in headers} if headers else set()
+        explicit_accept_language = "accept-language" in header_keys
+        if not explicit_accept_language and "LanguagesOfPreference" in data:
+            merged_headers["Accept-Language"] = get_accept_language(data["LanguagesOfPreference"])
+        if headers:
+            for key in [key for key in merged_headers if key.lower() in header_keys]:
+                del merged_headers[key]
+            merged_headers.update(headers)
+
+        request = self.request_cls(url=self.url, body=body, headers=merged_headers, meta=meta, **kwargs)
+        request._explicit_accept_language = explicit_accept_language  # the header of the template is derived
+        return request
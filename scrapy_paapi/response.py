@@ -1,11 +1,69 @@
-import json
-from typing import List, Optional
+import math
+from typing import Any, Iterator, List, Optional
 
 from scrapy.http import Request, TextResponse
 
+from scrapy_paapi.model import BrowseNode, Item
+from scrapy_paapi.utils import json_loads
+
+MAX_ITEM_PAGE = 10
+
+_UNPARSED = object()
+
+# Meta set by the middlewares of this package and by RetryMiddleware for each request, which is not carried over
+# to the requests of the next pages
+PER_REQUEST_META_KEYS = (
+    "paapi_batched",
+    "paapi_batch_split",
+    "paapi_dedup_keys",
+    "paapi_dont_retry",
+    "paapi_failed_access_keys",
+    "paapi_localization_part",
+    "paapi_minimized",
+    "paapi_resource_recorder",
+    "paapi_retry_delay",
+    "paapi_retry_times",
+    "paapi_stripped_errors",
+    "paapi_throttled",
+    "paapi_wire_bytes",
+    "retry_times",
+)
+
 
 class BasePaapiResponse(TextResponse):
-    pass
+    _paapi_json: Any = _UNPARSED
+
+    def json(self) -> Any:
+        """
+        Same as TextResponse.json(), which caches the parsed body, but parses it with orjson if it is installed.
+        """
+
+        if self._paapi_json is _UNPARSED:
+            self._paapi_json = json_loads(self.body)
+        return self._paapi_json
+
+    def _record(self, value, *path: str):
+        """
+        Wraps the value with a recording proxy while PaapiResourceMinimizerMiddleware is warming up.
+        """
+
+        recorder = self.request.meta.get("paapi_resource_recorder") if self.request is not None else None
+        if recorder is None:
+            return value
+        return recorder.wrap(value, path)
+
+    def _follow_page(self, data: dict) -> Request:
+        """
+        Returns a request of another page with the data. The meta of the request is kept except for the state of
+        the request, e.g. paapi_retry_times, dont_retry set by PaapiRetryMiddleware and a failed paapi_access_key.
+        """
+
+        meta = {key: value for key, value in self.request.meta.items() if key not in PER_REQUEST_META_KEYS}
+        if self.request.meta.get("paapi_dont_retry"):
+            meta.pop("dont_retry", None)
+        if meta.get("paapi_access_key") in self.request.meta.get("paapi_failed_access_keys", ()):
+            del meta["paapi_access_key"]
+        return self.request.replace(data=data, meta=meta)
 
 
 class PaapiErrorResponse(BasePaapiResponse):
@@ -27,30 +85,117 @@ class PaapiErrorResponse(BasePaapiResponse):
 class GetBrowseNodesResponse(BasePaapiResponse):
     @property
     def browse_nodes(self) -> List[dict]:
-        return self.json()["BrowseNodesResult"]["BrowseNodes"]
+        return self._record(self.json()["BrowseNodesResult"]["BrowseNodes"], "BrowseNodes")
+
+    @property
+    def typed_browse_nodes(self) -> List[BrowseNode]:
+        return [BrowseNode.from_dict(browse_node) for browse_node in self.browse_nodes]
+
 
+class BaseItemsResponse(BasePaapiResponse):
+    result_key = ""  # key of the result object containing Items
 
-class GetItemsResponse(BasePaapiResponse):
     @property
     def items(self) -> List[dict]:
-        return self.json()["ItemsResult"]["Items"]
+        return self._record(self.json()[self.result_key]["Items"])
+
+    def iter_items(self) -> Iterator[dict]:
+        """
+        Yields items. Unlike items, this yields nothing when no item is returned. The whole body is parsed before
+        the first item is yielded.
+        """
+
+        yield from self._record(self.json().get(self.result_key, {}).get("Items", []))
+
+    @property
+    def typed_items(self) -> List[Item]:
+        return list(self.iter_typed_items())
+
+    def iter_typed_items(self) -> Iterator[Item]:
+        """
+        Yields items as Item models, which are materialized one by one.
+        """
+
+        for item in self.iter_items():
+            yield Item.from_dict(item)
+
+
+class GetItemsResponse(BaseItemsResponse):
+    result_key = "ItemsResult"
+
+    @property
+    def errors(self) -> List[dict]:
+        """
+        Errors of the ItemIds that could not be retrieved, e.g. ItemNotAccessible.
+        """
+
+        return self.json().get("Errors", [])
 
     def follow_next_page(self) -> Optional[Request]:
         return None
 
 
-class SearchItemsResponse(BasePaapiResponse):
+class GetVariationsResponse(BaseItemsResponse):
+    result_key = "VariationsResult"
+
     @property
-    def items(self) -> List[dict]:
-        return self.json()["SearchResult"]["Items"]
+    def variation_summary(self) -> dict:
+        return self.json()[self.result_key]["VariationSummary"]
 
     def follow_next_page(self) -> Optional[Request]:
-        data = json.loads(self.request.body)
+        data = dict(self.request.paapi_data)
+        original_variation_page = data.get("VariationPage", 1)
+
+        if original_variation_page >= self.variation_summary.get("PageCount", 1):
+            return None  # no more next page
+
+        data["VariationPage"] = original_variation_page + 1
+        return self._follow_page(data)
+
+    def follow_all_pages(self) -> List[Request]:
+        """
+        Returns requests of all the remaining pages at once, so that they can be crawled concurrently.
+        """
+
+        data = self.request.paapi_data
+        variation_page = data.get("VariationPage", 1)
+        page_count = self.variation_summary.get("PageCount", 1)
+
+        return [self._follow_page(dict(data, VariationPage=page)) for page in range(variation_page + 1, page_count + 1)]
+
+
+class SearchItemsResponse(BaseItemsResponse):
+    result_key = "SearchResult"
+
+    def follow_next_page(self) -> Optional[Request]:
+        data = dict(self.request.paapi_data)
         original_item_page = data.get("ItemPage", 1)
         original_item_count = data.get("ItemCount", 10)
 
-        if original_item_page >= 10 or len(self.items) < original_item_count:
+        if original_item_page >= MAX_ITEM_PAGE or len(self.items) < original_item_count:
             return None  # no more next page
 
         data["ItemPage"] = original_item_page + 1
-        return self.request.replace(data=data)
+        return self._follow_page(data)
+
+    def follow_all_pages(self) -> List[Request]:
+        """
+        Returns requests of all the remaining pages at once, so that they can be crawled concurrently.
+
+        The last page is computed from TotalResultCount. When it is not returned, requests up to the 10th page
+        are returned speculatively.
+        """
+
+        if self.follow_next_page() is None:
+            return []
+
+        data = self.request.paapi_data
+        item_page = data.get("ItemPage", 1)
+        item_count = data.get("ItemCount", 10)
+        total_result_count = self.json()["SearchResult"].get("TotalResultCount")
+        if total_result_count is None:
+            last_page = MAX_ITEM_PAGE
+        else:
+            last_page = min(MAX_ITEM_PAGE, math.ceil(total_result_count / item_count))
+
+        return [self._follow_page(dict(data, ItemPage=page)) for page in range(item_page + 1, last_page + 1)]
@@ -0,0 +1,158 @@
+import json
+import logging
+import random
+from typing import List
+
+from scrapy.crawler import Crawler
+from scrapy.utils.misc import load_object
+
+from scrapy_paapi.batch import get_error_item_ids
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import PaapiErrorResponse
+from scrapy_paapi.throttle import PaapiThrottleMiddleware
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_HTTP_CODES = (429, 500, 502, 503, 504)
+
+# See: https://webservices.amazon.com/paapi5/documentation/troubleshooting/error-messages.html
+RETRYABLE_ERROR_CODES = ("InternalFailure", "RequestExpired", "ServiceUnavailable", "TooManyRequests")
+
+
+def get_error_code(response: PaapiErrorResponse) -> str:
+    try:
+        errors = response.errors
+        if errors:
+            return errors[0]["Code"]
+        return response.error_type.rpartition("#")[2]
+    except (ValueError, KeyError, TypeError):
+        return str(response.status)  # e.g. HTML error page
+
+
+class PaapiRetryMiddleware:
+    """
+    Retries PaapiRequests that failed with retryable errors, e.g. throttling and 5xx, with jittered exponential
+    backoff. Permanent errors, e.g. InvalidParameterValue, are not retried. When a GetItems request fails because of
+    some of its ItemIds, it is retried immediately without them and their errors are added to the final response.
+
+    A retry request is returned immediately with its backoff in the paapi_retry_delay meta key, and
+    PaapiThrottleMiddleware delays it, so no downloader slot is held during the backoff. Placed after this
+    middleware, PaapiThrottleMiddleware also sees TooManyRequests responses before they are retried.
+
+    Like Scrapy's RetryMiddleware, requests with dont_retry in their meta are not retried, and max_retry_times in
+    the meta overrides PAAPI_RETRY_TIMES. Responses split by PaapiBatchMiddleware are not retried, because the
+    batched request has been retried already.
+
+    Retried requests are signed again with a fresh timestamp by PaapiMiddleware. This middleware must be placed
+    after Scrapy's RetryMiddleware and before PaapiThrottleMiddleware and PaapiMiddleware.
+    """
+
+    def __init__(self, crawler: Crawler, max_retry_times: int, backoff_base: float, backoff_max: float):
+        self._stats = crawler.stats
+        self._max_retry_times = max_retry_times
+        self._backoff_base = backoff_base
+        self._backoff_max = backoff_max
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        downloader_middlewares = crawler.settings.getwithbase("DOWNLOADER_MIDDLEWARES")
+        if not any(
+            load_object(path) is PaapiThrottleMiddleware
+            for path, order in downloader_middlewares.items()
+            if order is not None
+        ):
+            logger.warning("Retries are not delayed because PaapiThrottleMiddleware is not enabled")
+        return cls(
+            crawler=crawler,
+            max_retry_times=crawler.settings.getint("PAAPI_RETRY_TIMES", 3),
+            backoff_base=crawler.settings.getfloat("PAAPI_RETRY_BACKOFF_BASE", 1.0),
+            backoff_max=crawler.settings.getfloat("PAAPI_RETRY_BACKOFF_MAX", 60.0),
+        )
+
+    def process_response(self, request, response, spider):
+        if not isinstance(request, PaapiRequest):
+            return response  # non-paapi response
+
+        if not isinstance(response, PaapiErrorResponse):
+            return self._add_stripped_errors(request, response)
+        if request.meta.get("paapi_batch_split"):
+            return response  # retried as a part of the batched request
+        if request.meta.get("dont_retry") and not request.meta.get("paapi_dont_retry"):
+            return response  # retrying is disabled by the user
+
+        if not request.meta.get("dont_retry"):
+            # This middleware takes care of the error instead of RetryMiddleware
+            request.meta["dont_retry"] = True
+            request.meta["paapi_dont_retry"] = True
+        error_code = get_error_code(response)
+
+        if response.status in RETRYABLE_HTTP_CODES or error_code in RETRYABLE_ERROR_CODES:
+            return self._retry_later(request, response, error_code, spider)
+
+        if request.meta["paapi_operation"] == "GetItems":
+            retry_request = self._strip_failed_item_ids(request, response)
+            if retry_request is not None:
+                return retry_request
+
+        self._stats.inc_value(f"paapi/retry/permanent_error_count/{error_code}")
+        return response
+
+    def _retry_later(self, request, response, error_code: str, spider):
+        retry_times = request.meta.get("paapi_retry_times", 0) + 1
+        if retry_times > request.meta.get("max_retry_times", self._max_retry_times):
+            logger.error(
+                "Gave up retrying %(request)s (failed %(retry_times)d times): %(response)s",
+                {"request": request, "retry_times": retry_times, "response": response},
+                extra={"spider": spider},
+            )
+            self._stats.inc_value("paapi/retry/max_reached")
+            return response
+
+        delay = random.uniform(0, min(self._backoff_max, self._backoff_base * 2**retry_times))
+        logger.debug(
+            "Retrying %(request)s in %(delay).2fs (failed %(retry_times)d times): %(response)s",
+            {"request": request, "delay": delay, "retry_times": retry_times, "response": response},
+            extra={"spider": spider},
+        )
+        self._stats.inc_value("paapi/retry/count")
+        self._stats.inc_value(f"paapi/retry/reason_count/{error_code}")
+
+        retry_request = self._copy_request(request)
+        retry_request.meta["paapi_retry_times"] = retry_times
+        retry_request.meta["paapi_retry_delay"] = delay  # enforced by PaapiThrottleMiddleware
+        return retry_request
+
+    def _strip_failed_item_ids(self, request, response):
+        item_ids = request.paapi_data["ItemIds"]
+        try:
+            errors = response.errors
+        except (ValueError, KeyError):
+            return None
+
+        failed_errors = [error for error in errors if get_error_item_ids(error, item_ids)]
+        failed_item_ids = {item_id for error in failed_errors for item_id in get_error_item_ids(error, item_ids)}
+        remaining_item_ids = [item_id for item_id in item_ids if item_id not in failed_item_ids]
+        if not failed_item_ids or not remaining_item_ids:
+            return None
+
+        self._stats.inc_value("paapi/retry/stripped_item_id_count", len(failed_item_ids))
+        retry_request = self._copy_request(request, data=dict(request.paapi_data, ItemIds=remaining_item_ids))
+        retry_request.meta["paapi_stripped_errors"] = request.meta.get("paapi_stripped_errors", []) + failed_errors
+        return retry_request
+
+    def _copy_request(self, request, **kwargs):
+        retry_request = request.replace(dont_filter=True, **kwargs)
+        if retry_request.meta.pop("paapi_dont_retry", False):
+            retry_request.meta.pop("dont_retry", None)
+        retry_request.headers.pop("Authorization", None)
+        retry_request.headers.pop("X-Amz-Date", None)
+        return retry_request
+
+    def _add_stripped_errors(self, request, response):
+        stripped_errors: List[dict] = request.meta.get("paapi_stripped_errors")
+        if not stripped_errors:
+            return response
+
+        data = dict(response.json())
+        data["Errors"] = data.get("Errors", []) + stripped_errors
+        return response.replace(body=json.dumps(data).encode("utf-8"))
@@ -0,0 +1,151 @@
+import hashlib
+from typing import Dict, Optional
+
+from scrapy import Request
+from scrapy.crawler import Crawler
+from scrapy.pqueues import ScrapyPriorityQueue
+
+from scrapy_paapi.batch import MAX_ITEM_IDS
+from scrapy_paapi.request import PaapiRequest
+
+OTHER_QUEUE = "other"  # queue of non-PA-API requests
+
+
+def get_queue_name(request: Request) -> str:
+    """
+    Returns the name of the queue of the request, e.g. "GetItems/www.amazon.com".
+    """
+
+    if not isinstance(request, PaapiRequest):
+        return OTHER_QUEUE
+    return f"{request.meta['paapi_operation']}/{request.paapi_data.get('Marketplace', '')}"
+
+
+def is_full_batch(request: Request) -> bool:
+    return (
+        isinstance(request, PaapiRequest)
+        and request.meta["paapi_operation"] == "GetItems"
+        and len(request.paapi_data.get("ItemIds", ())) >= MAX_ITEM_IDS
+    )
+
+
+def _path_safe(text: str) -> str:
+    return "".join(c if c.isalnum() or c in "-._" else "_" for c in text) + "-" + hashlib.md5(text.encode()).hexdigest()
+
+
+class _FullBatchFirstPriorityQueue(ScrapyPriorityQueue):
+    full_batch_boost = 0
+
+    def priority(self, request: Request) -> int:
+        priority = super().priority(request)
+        if self.full_batch_boost and is_full_batch(request):
+            priority -= self.full_batch_boost  # lower numbers are higher priorities
+        return priority
+
+
+class PaapiFairPriorityQueue:
+    """
+    Scheduler priority queue that shares the API quota between operations and marketplaces.
+
+    Requests are kept in a queue per (operation, marketplace), e.g. "GetItems/www.amazon.com", and non-PA-API
+    requests in the "other" queue. Each request is counted as one unit of the quota, and the next request is popped
+    from the non-empty queue that has used the least quota relative to its weight in PAAPI_SCHEDULER_WEIGHTS,
+    so that a queue with many requests cannot starve the others. Within a queue, requests are ordered by priority,
+    and GetItems requests with 10 ItemIds are boosted by PAAPI_SCHEDULER_FULL_BATCH_BOOST.
+
+    Queue depths are recorded in the paapi/scheduler/queue_depth/<queue> stats.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        downstream_queue_cls,
+        key: str,
+        startprios: Optional[Dict[str, list]] = None,
+        **kwargs,
+    ):
+        if startprios and not isinstance(startprios, dict):
+            raise ValueError(
+                "PaapiFairPriorityQueue accepts startprios as a dict. "
+                "Only a crawl started with the same priority queue class can be resumed."
+            )
+
+        self.crawler = crawler
+        self.downstream_queue_cls = downstream_queue_cls
+        self.key = key
+        self._kwargs = kwargs  # e.g. start_queue_cls of Scrapy >= 2.13
+        self._stats = crawler.stats
+        self._weights: Dict[str, float] = crawler.settings.getdict("PAAPI_SCHEDULER_WEIGHTS")
+        for name, weight in self._weights.items():
+            if float(weight) <= 0:
+                raise ValueError(f"PAAPI_SCHEDULER_WEIGHTS must be positive, got {weight!r} for {name!r}")
+        self._full_batch_boost = crawler.settings.getint("PAAPI_SCHEDULER_FULL_BATCH_BOOST", 10)
+        self.pqueues: Dict[str, ScrapyPriorityQueue] = {}
+        self._virtual_times: Dict[str, float] = {}  # queue -> quota used divided by the weight
+        self._virtual_clock = 0.0
+
+        for name, prios in (startprios or {}).items():
+            self.pqueues[name] = self._pqfactory(name, prios)
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler, downstream_queue_cls, key: str, startprios=None, **kwargs):
+        return cls(crawler, downstream_queue_cls, key, startprios, **kwargs)
+
+    def _pqfactory(self, name: str, startprios=()) -> ScrapyPriorityQueue:
+        pqueue = _FullBatchFirstPriorityQueue.from_crawler(
+            self.crawler, self.downstream_queue_cls, self.key + "/" + _path_safe(name), startprios, **self._kwargs
+        )
+        pqueue.full_batch_boost = self._full_batch_boost
+        return pqueue
+
+    def _get_weight(self, name: str) -> float:
+        """
+        Looks up the weight by the queue name, e.g. "GetItems/www.amazon.com", and then by the operation.
+        """
+
+        weight = self._weights.get(name)
+        if weight is None:
+            weight = self._weights.get(name.split("/", 1)[0], 1.0)
+        return float(weight)
+
+    def push(self, request: Request):
+        name = get_queue_name(request)
+        pqueue = self.pqueues.get(name)
+        if pqueue is None:
+            pqueue = self.pqueues[name] = self._pqfactory(name)
+        if not pqueue:
+            # A queue that was idle does not get credit for the time it was idle.
+            self._virtual_times[name] = max(self._virtual_times.get(name, 0.0), self._virtual_clock)
+        pqueue.push(request)
+        self._stats.set_value(f"paapi/scheduler/queue_depth/{name}", len(pqueue))
+
+    def _choose_queue(self) -> Optional[str]:
+        candidates = [name for name, pqueue in self.pqueues.items() if pqueue]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda name: self._virtual_times.get(name, 0.0))
+
+    def pop(self) -> Optional[Request]:
+        name = self._choose_queue()
+        if name is None:
+            return None
+
+        pqueue = self.pqueues[name]
+        request = pqueue.pop()
+        self._virtual_clock = self._virtual_times.get(name, 0.0)
+        self._virtual_times[name] = self._virtual_clock + 1 / self._get_weight(name)
+        self._stats.set_value(f"paapi/scheduler/queue_depth/{name}", len(pqueue))
+        self._stats.inc_value(f"paapi/scheduler/popped_count/{name}")
+        return request
+
+    def peek(self) -> Optional[Request]:
+        name = self._choose_queue()
+        return self.pqueues[name].peek() if name is not None else None
+
+    def close(self) -> Dict[str, list]:
+        active = {name: pqueue.close() for name, pqueue in self.pqueues.items()}
+        self.pqueues.clear()
+        return {name: prios for name, prios in active.items() if prios}
+
+    def __len__(self) -> int:
+        return sum(len(pqueue) for pqueue in self.pqueues.values())
@@ -0,0 +1,227 @@
+"""
+Runs a spider in multiple worker processes on one host, each crawling a shard of the workload, so that signing,
+encoding and parsing scale with CPU cores.
+
+Usage: python -m scrapy_paapi.shard --workers 4 --output items.jsonl myspider -a item_ids_path=asins.csv.gz
+
+Each worker runs `scrapy crawl` with PAAPI_SHARD_INDEX and PAAPI_SHARD_COUNT, with which spiders pick their keys by
+Shard.owns(), and with PAAPI_THROTTLE_SHARED_DIR, with which PaapiThrottleMiddleware shares the quota between the
+workers. After all the workers finish, their stats and outputs are merged.
+"""
+
+import argparse
+import bisect
+import datetime
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from pprint import pformat
+from typing import Any, Dict, List, Optional
+
+from scrapy.crawler import Crawler
+from scrapy.settings import BaseSettings
+from scrapy.statscollectors import MemoryStatsCollector
+
+from scrapy_paapi.batch import MAX_ITEM_IDS
+
+# Outputs of these formats are concatenated. Outputs of the other formats, e.g. Parquet, are kept per worker.
+LINE_FORMATS = (".jsonl", ".jl", ".ndjson", ".csv")
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ConsistentHashRing:
+    """
+    Maps keys to shards with consistent hashing. The points of a shard on the ring depend only on its index,
+    so when a shard is added, keys move only to the new shard and a worker keeps most of its keys, e.g. in its
+    checkpoint log, across restarts with a different number of workers.
+    """
+
+    def __init__(self, shard_count: int, replicas: int = 160):
+        points = sorted(
+            (_hash(f"{shard}-{replica}"), shard) for shard in range(shard_count) for replica in range(replicas)
+        )
+        self._hashes = [h for h, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def get_shard(self, key: str) -> int:
+        i = bisect.bisect(self._hashes, _hash(key))
+        return self._shards[i if i < len(self._shards) else 0]
+
+
+class Shard:
+    """
+    Shard of the workload of this process given by PAAPI_SHARD_INDEX and PAAPI_SHARD_COUNT. Spiders skip keys,
+    e.g. ItemIds or keywords, that the shard does not own:
+
+        shard = Shard.from_settings(self.settings)
+        for keywords in keywords_list:
+            if shard.owns(keywords):
+                yield PaapiRequest.search_items("www.amazon.com", "yourtag-20", keywords=keywords)
+    """
+
+    def __init__(self, index: int = 0, count: int = 1):
+        if not 0 <= index < count:
+            raise ValueError(f"Shard index must be in [0, {count}): {index}")
+
+        self.index = index
+        self.count = count
+        self._ring = ConsistentHashRing(count) if count > 1 else None
+
+    @classmethod
+    def from_settings(cls, settings: BaseSettings) -> "Shard":
+        return cls(settings.getint("PAAPI_SHARD_INDEX", 0), settings.getint("PAAPI_SHARD_COUNT", 1))
+
+    def owns(self, key: str) -> bool:
+        return self._ring is None or self._ring.get_shard(key) == self.index
+
+
+class ShardStatsCollector(MemoryStatsCollector):
+    """
+    Stats collector that writes the stats to PAAPI_SHARD_STATS_FILE as JSON when the spider is closed,
+    so that the launcher can merge the stats of the workers.
+    """
+
+    def __init__(self, crawler: Crawler):
+        super().__init__(crawler)
+        self._path = crawler.settings.get("PAAPI_SHARD_STATS_FILE")
+
+    def close_spider(self, *args, **kwargs):
+        super().close_spider(*args, **kwargs)
+        if self._path:
+            with open(self._path, "w", encoding="utf-8") as f:
+                json.dump(self.get_stats(), f, default=_json_default, sort_keys=True)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def merge_stats(stats_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Merges the stats of the workers. Numbers are summed, except */max, */min and elapsed time. Of the
+    timestamps in ISO format, the earliest start_time and the latest finish_time are taken. Differing strings,
+    e.g. finish_reason, are joined with commas.
+    """
+
+    merged: Dict[str, Any] = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            if key not in merged:
+                merged[key] = value
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                name = key.rsplit("/", 1)[-1]
+                if name == "max" or key == "elapsed_time_seconds":
+                    merged[key] = max(merged[key], value)
+                elif name == "min":
+                    merged[key] = min(merged[key], value)
+                else:
+                    merged[key] += value
+            elif key == "start_time":
+                merged[key] = min(merged[key], value)
+            elif key == "finish_time":
+                merged[key] = max(merged[key], value)
+            elif value not in str(merged[key]).split(","):
+                merged[key] = f"{merged[key]},{value}"
+
+    # Ratios cannot be summed
+    if merged.get("paapi/get_items/call_count"):
+        merged["paapi/get_items/fill_ratio"] = merged["paapi/get_items/item_id_count"] / (
+            merged["paapi/get_items/call_count"] * MAX_ITEM_IDS
+        )
+    return merged
+
+
+def merge_outputs(paths: List[str], output: str) -> List[str]:
+    """
+    Concatenates the outputs of the workers into output if it is in one of LINE_FORMATS, skipping the header rows
+    of the CSV outputs except the first one. Otherwise, moves them to <output stem>-<worker index><ext>. paths are
+    the outputs of the workers in the order of their indexes, and missing ones are skipped.
+    Returns the paths of the merged outputs.
+    """
+
+    indexed_paths = [(i, path) for i, path in enumerate(paths) if os.path.exists(path)]  # by worker index
+    root, ext = os.path.splitext(output)
+    if ext not in LINE_FORMATS:
+        merged_paths = []
+        for i, path in indexed_paths:
+            merged_path = f"{root}-{i}{ext}"
+            shutil.move(path, merged_path)
+            merged_paths.append(merged_path)
+        return merged_paths
+
+    with open(output, "wb") as out:
+        for n, (_, path) in enumerate(indexed_paths):
+            with open(path, "rb") as f:
+                if ext == ".csv" and n > 0:
+                    f.readline()  # header
+                shutil.copyfileobj(f, out)
+    return [output]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--workers", "-n", type=int, default=os.cpu_count() or 1, help="number of worker processes")
+    parser.add_argument("--output", "-o", help="merged output, e.g. items.jsonl")
+    parser.add_argument("--stats", help="path to write the merged stats as JSON")
+    parser.add_argument(
+        "--quota-dir", help="directory of the shared quota. Keep it across runs to respect the daily quota."
+    )
+    parser.add_argument("--work-dir", help="directory of the outputs of the workers. A temporary one by default.")
+    parser.add_argument("spider")
+    parser.add_argument("crawl_args", nargs=argparse.REMAINDER, help="arguments of scrapy crawl, e.g. -a and -s")
+    args = parser.parse_args(argv)
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="paapi-shard-")
+    os.makedirs(work_dir, exist_ok=True)
+    quota_dir = args.quota_dir or os.path.join(work_dir, "quota")
+    ext = os.path.splitext(args.output)[1] if args.output else ""
+
+    processes = []
+    for i in range(args.workers):
+        command = [sys.executable, "-m", "scrapy", "crawl", args.spider] + args.crawl_args
+        command += ["-s", f"PAAPI_SHARD_INDEX={i}", "-s", f"PAAPI_SHARD_COUNT={args.workers}"]
+        command += ["-s", f"PAAPI_THROTTLE_SHARED_DIR={quota_dir}"]
+        command += ["-s", "STATS_CLASS=scrapy_paapi.shard.ShardStatsCollector"]
+        command += ["-s", f"PAAPI_SHARD_STATS_FILE={os.path.join(work_dir, f'stats-{i}.json')}"]
+        if args.output:
+            command += ["-o", os.path.join(work_dir, f"output-{i}{ext}")]
+        processes.append(subprocess.Popen(command))
+
+    try:
+        return_codes = [process.wait() for process in processes]
+    except KeyboardInterrupt:
+        # The workers got SIGINT as well, and are closing gracefully.
+        return_codes = [process.wait() for process in processes]
+
+    stats_list = []
+    for i in range(args.workers):
+        path = os.path.join(work_dir, f"stats-{i}.json")
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                stats_list.append(json.load(f))
+    stats = merge_stats(stats_list)
+    print(f"Merged stats of {len(stats_list)} workers:\n{pformat(stats)}")
+    if args.stats:
+        with open(args.stats, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2, sort_keys=True)
+
+    if args.output:
+        paths = [os.path.join(work_dir, f"output-{i}{ext}") for i in range(args.workers)]
+        print(f"Merged outputs: {', '.join(merge_outputs(paths, args.output))}")
+
+    if not args.work_dir:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return max(return_codes, default=0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
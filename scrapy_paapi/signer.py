@@ -13,8 +13,13 @@
 import datetime
 import hashlib
 import hmac
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional, Tuple
 from urllib.parse import urlparse
 
+ALGORITHM = "AWS4-HMAC-SHA256"
+
 
 # Key derivation functions. See:
 # http://docs.aws.amazon.com/general/latest/gr/signature-v4-examples.html#signature-v4-examples-python
@@ -30,110 +35,147 @@ def getSignatureKey(key, date_stamp, regionName, serviceName):
     return kSigning
 
 
-def get_authorization_headers(
-    access_key: str, secret_key: str, region: str, service: str, method: str, url: str, headers: dict, body: bytes
-) -> dict:
+class Signer:
+    """
+    Signs requests with AWS Signature Version 4 using a pair of credentials.
+
+    Deriving a signing key takes four HMAC-SHA256 rounds, but the key only changes once a day per region.
+    Derived keys are kept in a bounded cache keyed on (date, region), which is cleared when the date changes.
+    A single instance can be shared by any number of requests.
+    """
+
+    def __init__(
+        self, access_key: str, secret_key: str, service: str = "ProductAdvertisingAPI", max_cached_keys: int = 16
+    ):
+        self.access_key = access_key
+        self.service = service
+        self._secret_key = secret_key
+        self._max_cached_keys = max_cached_keys
+        self._date_stamp = None
+        self._scopes = OrderedDict()  # (date_stamp, region) -> (credential_scope, signing_key)
+
+    def get_signing_key(self, date_stamp: str, region: str) -> Tuple[str, bytes]:
+        """
+        Returns a tuple of the credential scope and the signing key.
+        """
+
+        cache_key = (date_stamp, region)
+        try:
+            return self._scopes[cache_key]
+        except KeyError:
+            pass
+
+        if date_stamp != self._date_stamp:
+            self._scopes.clear()  # keys of the previous date are never used again
+            self._date_stamp = date_stamp
+
+        credential_scope = date_stamp + "/" + region + "/" + self.service + "/" + "aws4_request"
+        signing_key = getSignatureKey(self._secret_key, date_stamp, region, self.service)
+
+        if self._max_cached_keys > 0:
+            if len(self._scopes) >= self._max_cached_keys:
+                self._scopes.popitem(last=False)
+            self._scopes[cache_key] = (credential_scope, signing_key)
+
+        return credential_scope, signing_key
+
+    def get_authorization_headers(
+        self,
+        region: str,
+        method: str,
+        url: str,
+        headers: dict,
+        body: bytes,
+        now: Optional[datetime.datetime] = None,
+    ) -> dict:
+        # Create a date for headers and the credential string
+        t = now or datetime.datetime.utcnow()
+        amz_date = t.strftime("%Y%m%dT%H%M%SZ")
+        date_stamp = amz_date[:8]  # Date w/o time, used in credential scope
+
+        # ************* TASK 1: CREATE A CANONICAL REQUEST *************
+        # http://docs.aws.amazon.com/general/latest/gr/sigv4-create-canonical-request.html
+
+        # Step 1 is to define the verb (GET, POST, etc.)--already done.
+
+        # Step 2: Create canonical URI--the part of the URI from domain to query
+        # string (use '/' if no path)
+        canonical_uri = get_canonical_uri(url)
+
+        # Step 3: Create the canonical query string. In this example, request
+        # parameters are passed in the body of the request and the query string
+        # is blank.
+        canonical_querystring = ""
+
+        # Step 4: Create the canonical headers. Header names must be trimmed
+        # and lowercase, and sorted in code point order from low to high.
+        # Note that there is a trailing \n.
+        text_headers = {}
+        for key in headers.keys():
+            text_key = key.lower().decode("utf-8")
+            if text_key not in ("authorization", "x-amz-date"):
+                text_headers[text_key] = headers[key].decode("utf-8")
+        sorted_keys = sorted(text_headers)
+        canonical_headers = "".join(f"{key}:{text_headers[key]}\n" for key in sorted_keys)
+
+        # Step 5: Create the list of signed headers. This lists the headers
+        # in the canonical_headers list, delimited with ";" and in alpha order.
+        # Note: The request can include any headers; canonical_headers and
+        # signed_headers include those that you want to be included in the
+        # hash of the request. "Host" and "x-amz-date" are always required.
+        # For DynamoDB, content-type and x-amz-target are also required.
+        signed_headers = ";".join(sorted_keys)
+
+        # Step 6: Create payload hash. In this example, the payload (body of
+        # the request) contains the request parameters.
+        payload_hash = hashlib.sha256(body).hexdigest()
+
+        # Step 7: Combine elements to create canonical request
+        canonical_request = "\n".join(
+            (method, canonical_uri, canonical_querystring, canonical_headers, signed_headers, payload_hash)
+        )
+
+        # ************* TASK 2: CREATE THE STRING TO SIGN*************
+        # Match the algorithm to the hashing algorithm you use, either SHA-1 or
+        # SHA-256 (recommended)
+        credential_scope, signing_key = self.get_signing_key(date_stamp, region)
+        string_to_sign = "\n".join(
+            (ALGORITHM, amz_date, credential_scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest())
+        )
+
+        # ************* TASK 3: CALCULATE THE SIGNATURE *************
+        # The signing key is derived by get_signing_key() above.
+
+        # Sign the string_to_sign using the signing_key
+        signature = hmac.new(signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
 
-    # Create a date for headers and the credential string
-    t = datetime.datetime.utcnow()
-    amz_date = t.strftime("%Y%m%dT%H%M%SZ")
-    date_stamp = t.strftime("%Y%m%d")  # Date w/o time, used in credential scope
+        # ************* TASK 4: ADD SIGNING INFORMATION TO THE REQUEST *************
+        # Put the signature information in a header named Authorization.
+        authorization_header = (
+            f"{ALGORITHM} Credential={self.access_key}/{credential_scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+
+        return {
+            "X-Amz-Date": amz_date,
+            "Authorization": authorization_header,
+        }
 
-    # ************* TASK 1: CREATE A CANONICAL REQUEST *************
-    # http://docs.aws.amazon.com/general/latest/gr/sigv4-create-canonical-request.html
 
-    # Step 1 is to define the verb (GET, POST, etc.)--already done.
+@lru_cache(maxsize=64)
+def get_canonical_uri(url: str) -> str:
     o = urlparse(url)
     assert o.query == ""
+    return o.path or "/"
 
-    # Step 2: Create canonical URI--the part of the URI from domain to query
-    # string (use '/' if no path)
-    canonical_uri = o.path or "/"
-
-    # Step 3: Create the canonical query string. In this example, request
-    # parameters are passed in the body of the request and the query string
-    # is blank.
-    canonical_querystring = ""
-
-    # Step 4: Create the canonical headers. Header names must be trimmed
-    # and lowercase, and sorted in code point order from low to high.
-    # Note that there is a trailing \n.
-    sorted_keys = sorted(
-        filter(
-            lambda key: key not in ("authorization", "x-amz-date"),
-            map(lambda key: key.lower().decode("utf-8"), headers.keys()),
-        )
-    )
-    sorted_text_headers = {key: headers[key].decode("utf-8") for key in sorted_keys}
-    canonical_headers = "".join((f"{key}:{value}\n" for key, value in sorted_text_headers.items()))
-
-    # Step 5: Create the list of signed headers. This lists the headers
-    # in the canonical_headers list, delimited with ";" and in alpha order.
-    # Note: The request can include any headers; canonical_headers and
-    # signed_headers include those that you want to be included in the
-    # hash of the request. "Host" and "x-amz-date" are always required.
-    # For DynamoDB, content-type and x-amz-target are also required.
-    signed_headers = ";".join(sorted_text_headers.keys())
-
-    # Step 6: Create payload hash. In this example, the payload (body of
-    # the request) contains the request parameters.
-    payload_hash = hashlib.sha256(body).hexdigest()
-
-    # Step 7: Combine elements to create canonical request
-    canonical_request = (
-        method
-        + "\n"
-        + canonical_uri
-        + "\n"
-        + canonical_querystring
-        + "\n"
-        + canonical_headers
-        + "\n"
-        + signed_headers
-        + "\n"
-        + payload_hash
-    )
-
-    # ************* TASK 2: CREATE THE STRING TO SIGN*************
-    # Match the algorithm to the hashing algorithm you use, either SHA-1 or
-    # SHA-256 (recommended)
-    algorithm = "AWS4-HMAC-SHA256"
-    credential_scope = date_stamp + "/" + region + "/" + service + "/" + "aws4_request"
-    string_to_sign = (
-        algorithm
-        + "\n"
-        + amz_date
-        + "\n"
-        + credential_scope
-        + "\n"
-        + hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()
-    )
-
-    # ************* TASK 3: CALCULATE THE SIGNATURE *************
-    # Create the signing key using the function defined above.
-    signing_key = getSignatureKey(secret_key, date_stamp, region, service)
-
-    # Sign the string_to_sign using the signing_key
-    signature = hmac.new(signing_key, (string_to_sign).encode("utf-8"), hashlib.sha256).hexdigest()
-
-    # ************* TASK 4: ADD SIGNING INFORMATION TO THE REQUEST *************
-    # Put the signature information in a header named Authorization.
-    authorization_header = (
-        algorithm
-        + " "
-        + "Credential="
-        + access_key
-        + "/"
-        + credential_scope
-        + ", "
-        + "SignedHeaders="
-        + signed_headers
-        + ", "
-        + "Signature="
-        + signature
-    )
-
-    return {
-        "X-Amz-Date": amz_date,
-        "Authorization": authorization_header,
-    }
+
+@lru_cache(maxsize=16)
+def _get_signer(access_key: str, secret_key: str, service: str) -> Signer:
+    return Signer(access_key, secret_key, service)
+
+
+def get_authorization_headers(
+    access_key: str, secret_key: str, region: str, service: str, method: str, url: str, headers: dict, body: bytes
+) -> dict:
+    signer = _get_signer(access_key, secret_key, service)
+    return signer.get_authorization_headers(region, method, url, headers, body)
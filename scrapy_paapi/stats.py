@@ -0,0 +1,121 @@
+"""
+Stats of PA-API calls recorded in the hot path of PaapiMiddleware.
+
+All values are plain Scrapy stats under the ``paapi/`` prefix so that they show up in the stats dump at the end of
+a crawl and can be exported by scrapy_paapi.prometheus.PaapiPrometheusExporter.
+"""
+
+import time
+from typing import Optional, Sequence
+
+from scrapy.http import Response
+from scrapy.statscollectors import StatsCollector
+
+from scrapy_paapi.batch import MAX_ITEM_IDS
+from scrapy_paapi.request import PaapiRequest
+
+# Upper bounds (in seconds) of the latency histogram buckets. "inf" is always added.
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Upper bounds (in seconds) of the signing and parsing histogram buckets.
+CPU_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05)
+
+
+def get_error_code(data) -> str:
+    """
+    Returns the Code of the first error of an error response, or its __type without the Exception suffix if it
+    has no errors, e.g. "TooManyRequests" for "com.amazon.paapi5#TooManyRequestsException".
+    """
+
+    if not isinstance(data, dict):
+        return "Unknown"
+    errors = data.get("Errors")
+    if errors and isinstance(errors[0], dict) and "Code" in errors[0]:
+        return errors[0]["Code"]
+    error_type = data.get("__type", "").rpartition("#")[2]
+    if error_type.endswith("Exception"):
+        error_type = error_type[: -len("Exception")]
+    return error_type or "Unknown"
+
+
+class PaapiStats:
+    """
+    Records PA-API specific stats to a Scrapy stats collector.
+
+    Histograms are stored as cumulative buckets in the same way as Prometheus:
+    ``<prefix>/le_<bound>`` counts the observations less than or equal to the bound,
+    and ``<prefix>/sum`` and ``<prefix>/count`` hold the sum and the number of observations.
+    """
+
+    def __init__(self, stats: StatsCollector):
+        self._stats = stats
+
+    def observe(self, prefix: str, value: float, buckets: Sequence[float]):
+        """
+        Adds an observation to the histogram at prefix.
+        """
+
+        inc_value = self._stats.inc_value
+        for bound in buckets:
+            if value <= bound:
+                inc_value(f"{prefix}/le_{bound}")
+        inc_value(f"{prefix}/le_inf")
+        inc_value(f"{prefix}/sum", value)
+        inc_value(f"{prefix}/count")
+
+    def record_signing(self, seconds: float):
+        self.observe("paapi/sign_seconds", seconds, CPU_BUCKETS)
+
+    def record_response(self, request: PaapiRequest, response: Response, convert_seconds: float):
+        """
+        Records stats of a response which has been converted to a PaapiResponse.
+        """
+
+        inc_value = self._stats.inc_value
+        operation = request.meta["paapi_operation"]
+        host = request.headers.get("host", b"").decode("utf-8")
+
+        inc_value(f"paapi/response_count/{operation}/{response.status}")
+        inc_value(f"paapi/response_bytes/{operation}", len(response.body))
+        wire_bytes: Optional[int] = request.meta.get("paapi_wire_bytes")
+        if wire_bytes is not None:  # set by PaapiDownloadHandler or when PaapiMiddleware decompressed the response
+            inc_value(f"paapi/wire_bytes/{operation}", wire_bytes)
+            inc_value(f"paapi/wire_bytes_saved/{operation}", len(response.body) - wire_bytes)
+        self.observe("paapi/convert_seconds", convert_seconds, CPU_BUCKETS)
+
+        download_latency: Optional[float] = request.meta.get("download_latency")
+        if download_latency is not None:  # not set for a cached response
+            self.observe(f"paapi/latency_seconds/{operation}/{host}", download_latency, LATENCY_BUCKETS)
+
+        if operation == "GetItems":
+            item_ids = len(request.paapi_data.get("ItemIds", ()))
+            # Not paapi/batch/item_id_count, which counts only the requests batched by PaapiBatchMiddleware
+            inc_value("paapi/get_items/item_id_count", item_ids)
+            inc_value("paapi/get_items/call_count")
+            self._stats.set_value(
+                "paapi/get_items/fill_ratio",
+                self._stats.get_value("paapi/get_items/item_id_count")
+                / (self._stats.get_value("paapi/get_items/call_count") * MAX_ITEM_IDS),
+            )
+
+        start = time.perf_counter()
+        try:
+            data = response.json()  # cached in the response, so callbacks do not parse it again
+        except ValueError:
+            inc_value(f"paapi/invalid_json_count/{operation}")
+            return
+        self.observe(f"paapi/parse_seconds/{operation}", time.perf_counter() - start, CPU_BUCKETS)
+
+        if response.status >= 400:
+            inc_value(f"paapi/error_count/{get_error_code(data)}")
+            return
+
+        if not isinstance(data, dict):
+            return
+        if operation == "GetBrowseNodes":
+            count = len(data.get("BrowseNodesResult", {}).get("BrowseNodes", ()))
+        else:
+            count = len(data.get(response.result_key, {}).get("Items", ()))
+        inc_value(f"paapi/item_count/{operation}", count)
+        for error in data.get("Errors", ()):
+            inc_value(f"paapi/error_count/{error.get('Code', 'Unknown')}")
@@ -0,0 +1,145 @@
+import hashlib
+import os
+from typing import Dict, Optional, Tuple
+
+from scrapy.crawler import Crawler
+from scrapy.utils.defer import maybe_deferred_to_future
+from scrapy.utils.httpobj import urlparse_cached
+from twisted.internet.task import deferLater
+
+from scrapy_paapi.bucket import SharedTokenBucket, TokenBucket
+from scrapy_paapi.credentials import CredentialPool
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import PaapiErrorResponse
+from scrapy_paapi.utils import get_reactor
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+class _Quota:
+    def __init__(self, tps: float, tpd: float, min_tps_ratio: float, shared_path: Optional[str] = None):
+        self.tps = tps
+        self.min_tps = tps * min_tps_ratio
+        if shared_path is None:
+            self.per_second = TokenBucket(rate=tps, capacity=max(tps, 1.0))
+            self.per_day = TokenBucket(rate=tpd / SECONDS_PER_DAY, capacity=tpd)
+        else:
+            self.per_second = SharedTokenBucket(shared_path + ".tps", rate=tps, capacity=max(tps, 1.0))
+            self.per_day = SharedTokenBucket(shared_path + ".tpd", rate=tpd / SECONDS_PER_DAY, capacity=tpd)
+
+    def reserve(self) -> float:
+        return max(self.per_second.reserve(), self.per_day.reserve())
+
+    def decrease(self):
+        self.per_second.adjust_rate(lambda rate: max(self.min_tps, rate / 2))
+
+    def increase(self):
+        self.per_second.adjust_rate(lambda rate: min(self.tps, rate + self.tps / 20))
+
+
+class PaapiThrottleMiddleware:
+    """
+    Delays PaapiRequests so that they stay under the TPS (transactions per second) and TPD (transactions per day)
+    quotas of each (access key, partner tag, host).
+
+    The credential of a request is chosen from AMAZON_CREDENTIALS here, before the quota is reserved, so that the
+    requests are spread over the quotas of all the credentials. The tps of a credential overrides
+    PAAPI_THROTTLE_TPS, and PAAPI_THROTTLE_QUOTAS of the partner tag overrides both.
+
+    When a request gets TooManyRequests (HTTP 429), the TPS of the key is halved and then recovers step by step
+    as requests succeed. A request retried by PaapiRetryMiddleware is also delayed by its backoff.
+
+    If PAAPI_THROTTLE_SHARED_DIR is set, the quotas are kept in files in the directory and shared by all the
+    processes using it, e.g. the workers of scrapy_paapi.shard.
+
+    This middleware must be placed after PaapiRetryMiddleware and before PaapiMiddleware.
+    """
+
+    def __init__(
+        self,
+        crawler: Crawler,
+        access_key: str,
+        tps: float,
+        tpd: float,
+        quotas: Dict[str, dict],
+        min_tps_ratio: float = 0.1,
+        shared_dir: Optional[str] = None,
+        pool: Optional[CredentialPool] = None,
+    ):
+        self._stats = crawler.stats
+        self._access_key = access_key
+        self._pool = pool
+        self._tps = tps
+        self._tpd = tpd
+        self._quotas_settings = quotas
+        self._min_tps_ratio = min_tps_ratio
+        self._shared_dir = shared_dir
+        self._quotas: Dict[Tuple[str, str, str], _Quota] = {}
+
+    @classmethod
+    def from_crawler(cls, crawler: Crawler):
+        return cls(
+            crawler=crawler,
+            access_key=crawler.settings.get("AMAZON_ACCESS_KEY", os.environ.get("AMAZON_ACCESS_KEY")),
+            tps=crawler.settings.getfloat("PAAPI_THROTTLE_TPS", 1.0),
+            tpd=crawler.settings.getfloat("PAAPI_THROTTLE_TPD", 8640),
+            quotas=crawler.settings.getdict("PAAPI_THROTTLE_QUOTAS"),
+            shared_dir=crawler.settings.get("PAAPI_THROTTLE_SHARED_DIR"),
+            pool=CredentialPool.from_crawler(crawler),  # shared with PaapiMiddleware
+        )
+
+    def _get_quota(self, request: PaapiRequest, access_key: Optional[str] = None) -> _Quota:
+        if access_key is None:
+            access_key = request.meta.get("paapi_access_key", self._access_key)
+        partner_tag = request.paapi_data["PartnerTag"]
+        key = (access_key, partner_tag, urlparse_cached(request).netloc)
+
+        quota = self._quotas.get(key)
+        if quota is None:
+            credential = self._pool.get(access_key) if self._pool is not None else None
+            tps = credential.tps if credential is not None and credential.tps is not None else self._tps
+            quota_settings = self._quotas_settings.get(partner_tag, {})
+            shared_path = None
+            if self._shared_dir:
+                os.makedirs(self._shared_dir, exist_ok=True)
+                shared_path = os.path.join(self._shared_dir, hashlib.sha1(repr(key).encode("utf-8")).hexdigest())
+            quota = self._quotas[key] = _Quota(
+                tps=quota_settings.get("tps", tps),
+                tpd=quota_settings.get("tpd", self._tpd),
+                min_tps_ratio=self._min_tps_ratio,
+                shared_path=shared_path,
+            )
+        return quota
+
+    async def process_request(self, request, spider):
+        if not isinstance(request, PaapiRequest):
+            return  # proceed to next middleware
+
+        if self._pool is not None:
+            _, new_request = self._pool.assign(
+                request, get_available=lambda c: self._get_quota(request, c.access_key).per_second.available()
+            )
+            if new_request is not None:
+                return new_request  # throttled when it comes back with the PartnerTag of the credential
+
+        request.meta["paapi_throttled"] = True
+        delay = max(self._get_quota(request).reserve(), request.meta.pop("paapi_retry_delay", 0.0))
+        if delay <= 0:
+            return
+
+        self._stats.inc_value("paapi/throttle/delayed_count")
+        self._stats.inc_value("paapi/throttle/delay_seconds", delay)
+        await maybe_deferred_to_future(deferLater(get_reactor(), delay, lambda: None))
+
+    def process_response(self, request, response, spider):
+        if not isinstance(request, PaapiRequest) or not request.meta.get("paapi_throttled"):
+            return response  # non-paapi response, or response of a request held by another middleware
+
+        quota = self._get_quota(request)
+        if isinstance(response, PaapiErrorResponse) and response.status == 429:
+            self._stats.inc_value("paapi/throttle/too_many_requests")
+            quota.decrease()
+        else:
+            quota.increase()
+
+        return response
@@ -0,0 +1,122 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from scrapy import Spider
+from scrapy.crawler import Crawler
+from scrapy.http import Request
+from scrapy.utils.defer import deferred_from_coro
+from twisted.internet.defer import Deferred, DeferredList
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def json_loads(data: Union[bytes, str]) -> Any:
+    """
+    Parses JSON with orjson if it is installed, otherwise with the json module.
+    """
+
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def get_reactor():
+    """
+    Returns the installed reactor. Importing it at module level would install the default reactor before Scrapy
+    installs the one in TWISTED_REACTOR, e.g. the asyncio reactor.
+    """
+
+    from twisted.internet import reactor
+
+    return reactor
+
+
+def download(crawler: Crawler, request: Request, spider: Spider) -> Deferred:
+    """
+    Downloads a request through the downloader middlewares without passing it to the spider.
+    """
+
+    engine = crawler.engine
+    if hasattr(engine, "download_async"):  # Scrapy >= 2.14
+        return deferred_from_coro(engine.download_async(request))
+    return engine.download(request, spider)
+
+
+def gather(deferreds: List[Deferred]) -> Deferred:
+    """
+    Returns a deferred that fires with the list of the results of the deferreds, or fails with the first failure.
+    """
+
+    d = DeferredList(deferreds, fireOnOneErrback=True, consumeErrors=True)
+    d.addCallbacks(
+        lambda results: [result for _, result in results],
+        lambda failure: failure.value.subFailure,  # unwrap FirstError
+    )
+    return d
+
+
+class TimeBoundedCache:
+    """
+    Cache of values that expire ttl seconds after they are put.
+
+    Keys are kept in the order they are put, which is also the order they expire in, so expired keys are removed
+    from the head in amortized constant time. When there are more than max_size keys, the oldest keys are removed.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self._ttl = ttl
+        self._max_size = max_size
+        self._entries: Dict[str, Tuple[float, Any]] = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= (time.monotonic() if now is None else now):
+            return None
+        return entry[1]
+
+    def put(self, key: str, value: Any, now: Optional[float] = None):
+        now = time.monotonic() if now is None else now
+        self._entries.pop(key, None)  # move to the tail
+        self._entries[key] = (now + self._ttl, value)
+
+        entries = self._entries
+        while entries:
+            oldest_key = next(iter(entries))
+            if entries[oldest_key][0] > now and len(entries) <= self._max_size:
+                break
+            del entries[oldest_key]
+
+
+class TimeBoundedSet(TimeBoundedCache):
+    """
+    Set of keys that expire ttl seconds after they are added.
+    """
+
+    def add(self, key: str, now: Optional[float] = None):
+        self.put(key, True, now)
+
+
+class KeyPrefixes:
+    """
+    Assigns short prefixes to long keys, e.g. the parameters of requests, to be prepended to the keys of caches.
+    """
+
+    def __init__(self):
+        self._prefixes: Dict[str, str] = {}
+
+    def get(self, key: str) -> str:
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = self._prefixes[key] = f"{len(self._prefixes)} "
+        return prefix
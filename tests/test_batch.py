@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from scrapy.exceptions import DontCloseSpider
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import ensureDeferred, succeed
+
+from scrapy_paapi import batch
+from scrapy_paapi.batch import PaapiBatchMiddleware
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+
+
+def test_batch_get_items(monkeypatch):
+    downloaded = []
+
+    def download(crawler, request, spider):
+        downloaded.append(request)
+        item_ids = request.paapi_data["ItemIds"]
+        body = {
+            "ItemsResult": {"Items": [{"ASIN": item_id} for item_id in item_ids[1:]]},
+            "Errors": [
+                {
+                    "__type": "com.amazon.paapi5#ErrorData",
+                    "Code": "ItemNotAccessible",
+                    "Message": f"The ItemId {item_ids[0]} is not accessible through the Product Advertising API.",
+                }
+            ],
+        }
+        return succeed(GetItemsResponse(request.url, body=json.dumps(body).encode(), request=request))
+
+    monkeypatch.setattr(batch, "download", download)
+    crawler = get_crawler(settings_dict={"PAAPI_BATCH_LINGER": 60})
+    middleware = PaapiBatchMiddleware.from_crawler(crawler)
+
+    results = {}
+    for i in range(10):
+        request = PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000000{i}"])
+        d = ensureDeferred(middleware.process_request(request, None))
+        d.addCallback(lambda response, i=i: results.__setitem__(i, response))
+
+    assert len(downloaded) == 1
+    assert downloaded[0].paapi_data["ItemIds"] == [f"B00000000{i}" for i in range(10)]
+    assert results[0].errors[0]["Code"] == "ItemNotAccessible"
+    assert "ItemsResult" not in results[0].json()
+    assert results[1].items == [{"ASIN": "B000000001"}]
+    assert results[1].errors == []
+    assert results[9].request.paapi_data["ItemIds"] == ["B000000009"]
+    assert results[9].meta["paapi_batch_split"]
+
+
+def test_batch_keeps_download_meta(monkeypatch):
+    downloaded = []
+
+    def download(crawler, request, spider):
+        downloaded.append(request)
+        return succeed(GetItemsResponse(request.url, body=b"{}", request=request))
+
+    monkeypatch.setattr(batch, "download", download)
+    crawler = get_crawler(settings_dict={"PAAPI_BATCH_LINGER": 60})
+    middleware = PaapiBatchMiddleware.from_crawler(crawler)
+
+    for i, timeout in enumerate([10, 10, 20]):
+        meta = {"download_timeout": timeout, "paapi_access_key": "AK1", "paapi_dedup_keys": [i]}
+        request = PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000000{i}"], meta=meta)
+        ensureDeferred(middleware.process_request(request, None))
+
+    with pytest.raises(DontCloseSpider):
+        middleware.spider_idle(None)
+    middleware.spider_idle(None)  # nothing pending
+
+    assert [r.paapi_data["ItemIds"] for r in downloaded] == [["B000000000", "B000000001"], ["B000000002"]]
+    assert downloaded[0].meta["download_timeout"] == 10
+    assert downloaded[1].meta["download_timeout"] == 20
+    assert downloaded[0].meta["paapi_access_key"] == "AK1"
+    assert downloaded[0].meta["paapi_batched"]
+    assert "paapi_dedup_keys" not in downloaded[0].meta
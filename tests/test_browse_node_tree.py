@@ -0,0 +1,48 @@
+import json
+
+from scrapy_paapi.browse_node_tree import BrowseNodeTree, BrowseNodeTreeCrawler
+from scrapy_paapi.response import GetBrowseNodesResponse
+
+
+def make_response(request, browse_nodes):
+    body = json.dumps({"BrowseNodesResult": {"BrowseNodes": browse_nodes}}).encode()
+    return GetBrowseNodesResponse(request.url, body=body, request=request)
+
+
+def test_tree_save_and_load(tmp_path):
+    tree = BrowseNodeTree()
+    tree.add(
+        {
+            "Id": "2",
+            "DisplayName": "Child",
+            "Ancestor": {"Id": "1", "DisplayName": "Root"},
+            "Children": [{"Id": "3", "DisplayName": "Grandchild"}],
+        },
+        fetched_at=100,
+    )
+    path = str(tmp_path / "tree.jsonl.gz")
+    tree.save(path)
+    tree = BrowseNodeTree.load(path)
+
+    assert tree.get("2").parent_id == "1"
+    assert tree.get("2").children_ids == ("3",)
+    assert tree.get("3").parent_id == "2"
+    assert tree.is_fresh("2", ttl=10, now=105)
+    assert not tree.is_fresh("2", ttl=10, now=115)
+    assert not tree.is_fresh("1", ttl=10, now=105)
+
+
+def test_crawler_batches_and_skips_fresh_nodes():
+    tree = BrowseNodeTree()
+    tree.add({"Id": "1", "Children": [{"Id": str(i)} for i in range(100, 112)]}, fetched_at=float("inf"))
+    tree.add({"Id": "100"}, fetched_at=float("inf"))  # fresh leaf
+    crawler = BrowseNodeTreeCrawler("www.amazon.com", "tag-20", tree)
+
+    requests = list(crawler.start(["1"]))
+    assert len(requests) == 1  # the remaining node waits for more nodes
+    assert sorted(requests[0].paapi_data["BrowseNodeIds"]) == [str(i) for i in range(102, 112)]
+
+    browse_nodes = [{"Id": "111", "Children": [{"Id": "200"}, {"Id": "102"}]}]
+    next_requests = list(crawler.parse(make_response(requests[0], browse_nodes)))
+    assert [r.paapi_data["BrowseNodeIds"] for r in next_requests] == [["101", "200"]]
+    assert tree.get("200").parent_id == "111"
@@ -0,0 +1,73 @@
+import asyncio
+import gzip
+
+from scrapy_paapi.bulk import BloomFilter, PaapiBulkSpider, iter_get_items_requests, iter_item_ids
+
+
+def test_bloom_filter():
+    bloom = BloomFilter(1000)
+
+    assert bloom.add("B000000001")
+    assert not bloom.add("B000000001")
+    assert "B000000001" in bloom
+    assert "B000000002" not in bloom
+
+
+def test_iter_item_ids(tmp_path):
+    path = tmp_path / "asins.csv.gz"
+    with gzip.open(path, "wt") as f:
+        f.write("asin,marketplace\nB000000001,www.amazon.co.jp\nB000000002,\n")
+
+    assert list(iter_item_ids(str(path), "www.amazon.com")) == [
+        ("www.amazon.co.jp", "B000000001"),
+        ("www.amazon.com", "B000000002"),
+    ]
+
+
+def test_iter_item_ids_skips_blank_item_ids(tmp_path):
+    path = tmp_path / "asins.jsonl"
+    path.write_text('{"asin": " B000000001\\n"}\n{"asin": "  "}\n" B000000002 "\n')
+    assert list(iter_item_ids(str(path), "www.amazon.com")) == [
+        ("www.amazon.com", "B000000001"),
+        ("www.amazon.com", "B000000002"),
+    ]
+
+    path = tmp_path / "asins.csv"
+    path.write_text("asin\n B000000003 \n\n,\n")
+    assert list(iter_item_ids(str(path), "www.amazon.com")) == [("www.amazon.com", "B000000003")]
+
+
+def test_iter_get_items_requests():
+    rows = [("www.amazon.com", f"B{i:09d}") for i in range(25)] + [("www.amazon.co.jp", "B000000000")]
+    rows += [("www.amazon.com", "B000000000")]
+    requests = list(iter_get_items_requests(rows, "tag-20", seen=BloomFilter(100)))
+
+    assert [(r.paapi_data["Marketplace"], len(r.paapi_data["ItemIds"])) for r in requests] == [
+        ("www.amazon.com", 10),
+        ("www.amazon.com", 10),
+        ("www.amazon.com", 5),
+        ("www.amazon.co.jp", 1),
+    ]
+
+
+def test_bulk_spider(tmp_path):
+    path = tmp_path / "asins.txt"
+    path.write_text("B000000001\nB000000002\nB000000001\n")
+    spider = PaapiBulkSpider("bulk", item_ids_path=str(path), partner_tag="tag-20", dedup_capacity=100)
+
+    requests = list(spider.start_requests())
+    assert len(requests) == 1
+    assert requests[0].paapi_data["ItemIds"] == ["B000000001", "B000000002"]
+    assert requests[0].callback == spider.parse
+
+
+def test_bulk_spider_start(tmp_path):
+    path = tmp_path / "asins.txt"
+    path.write_text("B000000001\nB000000002\n")
+    spider = PaapiBulkSpider("bulk", item_ids_path=str(path), partner_tag="tag-20")
+
+    async def collect():
+        return [request async for request in spider.start()]  # called by Scrapy >= 2.13
+
+    requests = asyncio.run(collect())
+    assert [r.paapi_data["ItemIds"] for r in requests] == [["B000000001", "B000000002"]]
@@ -0,0 +1,84 @@
+import json
+
+from scrapy import Spider
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.browse_node_tree import BrowseNodeTree, BrowseNodeTreeCrawler
+from scrapy_paapi.checkpoint import CheckpointLog, PaapiCheckpointMiddleware, get_cursor_key
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse, SearchItemsResponse
+
+
+def search_items_response(request, item_count):
+    body = {"SearchResult": {"Items": [{"ASIN": f"B00000000{i}"} for i in range(item_count)]}}
+    return SearchItemsResponse(request.url, body=json.dumps(body).encode(), request=request)
+
+
+def test_checkpoint_log_resumes_from_index_and_log(tmp_path):
+    path = str(tmp_path / "checkpoint.log")
+    checkpoint = CheckpointLog(path)
+    checkpoint.add_item_ids("www.amazon.com", ["B000000001", "B000000002"])
+    checkpoint.add_page("key", 1, False)
+    checkpoint.snapshot()
+    checkpoint.add_page("key", 2, True)
+    checkpoint.add_browse_node("www.amazon.com", "1", ["2", "3"])
+    checkpoint.close()
+    with open(path, "a") as f:
+        f.write('["i","www.amazon.com",["B00')  # partially written when the process died
+
+    checkpoint = CheckpointLog(path)
+    assert checkpoint.is_item_completed("www.amazon.com", "B000000002")
+    assert not checkpoint.is_item_completed("www.amazon.co.jp", "B000000002")
+    assert checkpoint.get_next_page("key") is None
+    assert checkpoint.get_next_page("other") == 1
+    assert checkpoint.get_browse_node_children("www.amazon.com", "1") == ("2", "3")
+
+    checkpoint.add_item_ids("www.amazon.com", ["B000000003"])
+    checkpoint.close()
+    assert CheckpointLog(path).is_item_completed("www.amazon.com", "B000000003")
+
+
+def test_middleware_records_and_rewrites_requests(tmp_path):
+    crawler = get_crawler(settings_dict={"PAAPI_CHECKPOINT_FILE": str(tmp_path / "checkpoint.log")})
+    middleware = PaapiCheckpointMiddleware.from_crawler(crawler)
+    spider = Spider("test")
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000002"])
+    response = GetItemsResponse(request.url, body=b'{"ItemsResult": {"Items": []}}', request=request)
+    assert list(middleware.process_spider_output(response, [], spider)) == []
+
+    page1 = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="kindle")
+    page2 = search_items_response(page1, 10).follow_next_page()
+    list(middleware.process_spider_output(search_items_response(page1, 10), [page2], spider))
+
+    requests = list(
+        middleware.process_start_requests(
+            [
+                PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000003"]),
+                PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000002"]),
+                PaapiRequest.search_items(
+                    "www.amazon.com", "tag-20", keywords="kindle", resources=["Offers.Summaries"]
+                ),
+            ],
+            spider,
+        )
+    )
+    assert [r.paapi_data.get("ItemIds") for r in requests] == [["B000000003"], None]
+    assert requests[1].paapi_data["ItemPage"] == 2
+
+    list(middleware.process_spider_output(search_items_response(page2, 3), [], spider))  # the last page
+    assert list(middleware.process_start_requests([page1, page2], spider)) == []
+    assert (
+        get_cursor_key(page2.paapi_data)
+        == '{"Keywords":"kindle","Marketplace":"www.amazon.com","Operation":"SearchItems"}'
+    )
+
+
+def test_browse_node_tree_crawler_skips_checkpointed_nodes(tmp_path):
+    checkpoint = CheckpointLog(str(tmp_path / "checkpoint.log"))
+    checkpoint.add_browse_node("www.amazon.com", "1", ["2", "3"])
+    checkpoint.add_browse_node("www.amazon.com", "2", [])
+    crawler = BrowseNodeTreeCrawler("www.amazon.com", "tag-20", BrowseNodeTree(), checkpoint=checkpoint)
+
+    requests = list(crawler.start(["1"]))
+    assert [r.paapi_data["BrowseNodeIds"] for r in requests] == [["3"]]
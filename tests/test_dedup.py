@@ -0,0 +1,54 @@
+import json
+
+from scrapy.exceptions import IgnoreRequest
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import ensureDeferred, succeed
+
+from scrapy_paapi import dedup
+from scrapy_paapi.dedup import PaapiDedupMiddleware
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+from scrapy_paapi.utils import get_reactor
+
+
+def get_items_response(request):
+    body = {"ItemsResult": {"Items": [{"ASIN": item_id} for item_id in request.paapi_data["ItemIds"]]}}
+    return GetItemsResponse(request.url, body=json.dumps(body).encode(), request=request)
+
+
+def process_request(middleware, request) -> list:
+    get_reactor()  # installed for maybe_deferred_to_future
+    results = []
+    ensureDeferred(middleware.process_request(request, None)).addBoth(results.append)
+    return results
+
+
+def test_dedup_in_flight_and_recent_item_ids(monkeypatch):
+    downloaded = []
+
+    def download(crawler, request, spider):
+        downloaded.append(request)
+        return succeed(get_items_response(request))
+
+    monkeypatch.setattr(dedup, "download", download)
+    middleware = PaapiDedupMiddleware.from_crawler(get_crawler())
+
+    request1 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000002"])
+    assert process_request(middleware, request1) == [None]
+
+    # B000000002 is in flight, so only B000000003 is fetched
+    request2 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000003", "B000000002"])
+    results = process_request(middleware, request2)
+    assert [r.paapi_data["ItemIds"] for r in downloaded] == [["B000000003"]]
+    assert results == []
+
+    middleware.process_response(request1, get_items_response(request1), None)
+    assert [item["ASIN"] for item in results[0].items] == ["B000000003", "B000000002"]
+    assert results[0].request is request2
+
+    # Other resources are fetched separately
+    request3 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], resources=["ItemInfo.Title"])
+    assert process_request(middleware, request3) == [None]
+
+    request4 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000002"])
+    assert process_request(middleware, request4)[0].check(IgnoreRequest)
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+from scrapy_paapi.constant import GET_ITEMS_RESOURCES
+from scrapy_paapi.exporters import COLUMNS, PaapiArrowItemExporter, PaapiParquetItemExporter, get_columns
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def make_item(i):
+    return {
+        "ASIN": f"B00000000{i}",
+        "ItemInfo": {
+            "ByLineInfo": {"Brand": {"DisplayValue": "Brand", "Label": "Brand", "Locale": "en_US"}},
+            "Features": {"DisplayValues": ["a", "b"]},
+        },
+        "Offers": {
+            "Listings": [
+                {"Price": {"Amount": 1.0}, "IsBuyBoxWinner": False},
+                {"Price": {"Amount": 2.5 + i}, "IsBuyBoxWinner": True, "MerchantInfo": {"Name": "Amazon.com"}},
+            ]
+        },
+        "BrowseNodeInfo": {"BrowseNodes": [{"Id": "1"}, {"Id": "2"}]},
+    }
+
+
+def test_columns_are_derived_from_resources():
+    assert all(column.resource is None or column.resource in GET_ITEMS_RESOURCES for column in COLUMNS)
+    assert [column.name for column in get_columns(["ItemInfo.Title"])] == ["asin", "detail_page_url", "title"]
+
+
+def test_export_parquet():
+    f = io.BytesIO()
+    exporter = PaapiParquetItemExporter(f, row_group_size=2)
+    exporter.start_exporting()
+    for i in range(5):
+        exporter.export_item(make_item(i))
+    exporter.finish_exporting()
+
+    parquet_file = pq.ParquetFile(io.BytesIO(f.getvalue()))
+    assert parquet_file.metadata.num_row_groups == 3
+    table = parquet_file.read()
+    assert table.num_rows == 5
+    assert table.column("price").to_pylist() == [2.5, 3.5, 4.5, 5.5, 6.5]
+    assert table.column("brand").to_pylist()[0] == "Brand"
+    assert table.column("features").to_pylist()[0] == ["a", "b"]
+    assert table.column("browse_node_ids").to_pylist()[0] == ["1", "2"]
+    assert table.column("title").to_pylist()[0] is None
+
+
+def test_export_arrow():
+    f = io.BytesIO()
+    exporter = PaapiArrowItemExporter(f, row_group_size=2, resources=["Offers.Listings.MerchantInfo"])
+    exporter.start_exporting()
+    for i in range(3):
+        exporter.export_item(make_item(i))
+    exporter.finish_exporting()
+
+    table = pa.ipc.open_stream(f.getvalue()).read_all()
+    assert table.column_names == ["asin", "detail_page_url", "merchant_id", "merchant_name"]
+    assert pa.types.is_dictionary(table.schema.field("merchant_name").type)
+    assert table.column("merchant_name").to_pylist() == ["Amazon.com"] * 3
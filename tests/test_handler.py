@@ -0,0 +1,61 @@
+import gzip
+import zlib
+
+from scrapy import Request
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.handler import PaapiDownloadHandler, decode_body
+from scrapy_paapi.middleware import PaapiMiddleware
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+
+
+def test_decode_body():
+    body = b'{"ItemsResult": {"Items": []}}'
+    assert decode_body(gzip.compress(body), [b"gzip"]) == body
+    assert decode_body(zlib.compress(body), [b"deflate"]) == body
+    assert decode_body(gzip.compress(zlib.compress(body)), [b"deflate, gzip"]) == body
+    assert decode_body(body, [b"unknown"]) is None
+
+
+def test_middleware_decompresses_before_converting_response():
+    crawler = get_crawler(settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK"})
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    middleware.process_request(request, None)
+    assert request.headers["Accept-Encoding"].startswith(b"gzip, deflate")
+    assert b"accept-encoding" in request.headers["Authorization"]  # signed
+
+    body = b'{"ItemsResult": {"Items": [{"ASIN": "B000000001", "DetailPageURL": "https://www.amazon.com/dp/"}]}}'
+    compressed = gzip.compress(body)
+    response = Response(request.url, body=compressed, headers={"Content-Encoding": "gzip"}, request=request)
+    response = middleware.process_response(request, response, None)
+    assert isinstance(response, GetItemsResponse)
+    assert "Content-Encoding" not in response.headers
+    assert response.items[0]["ASIN"] == "B000000001"
+
+    stats = crawler.stats.get_stats()
+    assert stats["paapi/response_bytes/GetItems"] == len(body)
+    assert stats["paapi/wire_bytes/GetItems"] == len(compressed)
+    assert stats["paapi/wire_bytes_saved/GetItems"] == len(body) - len(compressed)
+
+    crawler = get_crawler(
+        settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK", "PAAPI_COMPRESSION_ENABLED": False}
+    )
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    PaapiMiddleware.from_crawler(crawler).process_request(request, None)
+    assert request.headers["Accept-Encoding"] == b"identity"
+
+
+def test_download_handler_uses_separate_pool_for_paapi_requests():
+    crawler = get_crawler(settings_dict={"PAAPI_DOWNLOAD_POOL_SIZE": 64, "PAAPI_DOWNLOAD_KEEPALIVE_SECONDS": 30})
+    handler = PaapiDownloadHandler.from_crawler(crawler)
+
+    paapi_handler = handler._get_handler(PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"]))
+    default_handler = handler._get_handler(Request("https://www.amazon.com/"))
+    assert paapi_handler is not default_handler
+    assert paapi_handler._pool.maxPersistentPerHost == 64
+    assert paapi_handler._pool.cachedConnectionTimeout == 30
+    assert default_handler._pool.maxPersistentPerHost == crawler.settings.getint("CONCURRENT_REQUESTS_PER_DOMAIN")
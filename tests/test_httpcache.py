@@ -0,0 +1,42 @@
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+from scrapy.spiders import Spider
+
+from scrapy_paapi.httpcache import PaapiCacheStorage, get_fingerprint
+from scrapy_paapi.request import PaapiRequest
+
+
+def test_fingerprint_ignores_order_and_headers():
+    request1 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000002"])
+    request2 = PaapiRequest.get_items(
+        "www.amazon.com", "tag-20", ["B000000002", "B000000001"], headers={"X-Amz-Date": "20210102T030405Z"}
+    )
+    request2 = request2.replace(data=dict(request2.paapi_data, Resources=request2.paapi_data["Resources"][::-1]))
+    request3 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+
+    assert get_fingerprint(request1) == get_fingerprint(request2)
+    assert get_fingerprint(request1) != get_fingerprint(request3)
+
+    request4 = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], headers={"Accept-Language": "es-US"})
+    assert get_fingerprint(request3) != get_fingerprint(request4)
+
+
+def test_store_and_retrieve(tmp_path):
+    storage = PaapiCacheStorage(Settings({"HTTPCACHE_DIR": str(tmp_path), "PAAPI_HTTPCACHE_TTLS": {"GetItems": 60}}))
+    spider = Spider("test")
+    storage.open_spider(spider)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    assert storage.retrieve_response(spider, request) is None
+
+    response = TextResponse(
+        request.url, status=200, headers={"Content-Type": "application/json"}, body=b'{"ItemsResult": {}}'
+    )
+    storage.store_response(spider, request, response)
+    cached = storage.retrieve_response(spider, request)
+    assert cached.status == 200
+    assert cached.body == response.body
+
+    storage.ttls["GetItems"] = 0  # never expires
+    assert storage.retrieve_response(spider, request) is not None
+    storage.close_spider(spider)
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import Deferred, ensureDeferred
+
+from scrapy_paapi import localization
+from scrapy_paapi.localization import PaapiLocalizationMiddleware
+from scrapy_paapi.request import PaapiRequest, PaapiRequestTemplate
+from scrapy_paapi.response import GetItemsResponse
+from scrapy_paapi.utils import get_reactor
+
+RESOURCES = ["ItemInfo.Title", "Offers.Listings.Price"]
+
+
+def get_items_response(request):
+    data = request.paapi_data
+    language = data["LanguagesOfPreference"][0]
+    items = []
+    for item_id in data["ItemIds"]:
+        item = {"ASIN": item_id, "DetailPageURL": f"https://www.amazon.ae/dp/{item_id}?language={language}"}
+        if "ItemInfo.Title" in data["Resources"]:
+            item["ItemInfo"] = {"Title": {"DisplayValue": f"{item_id} in {language}"}}
+        if "Offers.Listings.Price" in data["Resources"]:
+            item["Offers"] = {"Listings": [{"Price": {"Amount": 10.0}}]}
+        items.append(item)
+    return GetItemsResponse(request.url, body=json.dumps({"ItemsResult": {"Items": items}}).encode(), request=request)
+
+
+def test_localization_fetches_common_resources_once(monkeypatch):
+    downloads = []  # (request, deferred)
+
+    def download(crawler, request, spider):
+        d = Deferred()
+        downloads.append((request, d))
+        return d
+
+    monkeypatch.setattr(localization, "download", download)
+    get_reactor()  # installed for maybe_deferred_to_future
+    middleware = PaapiLocalizationMiddleware.from_crawler(get_crawler())
+
+    def get_items(item_ids, language):
+        request = PaapiRequest.get_items(
+            "www.amazon.ae", "tag-21", item_ids, resources=RESOURCES, languages_of_preference=[language]
+        )
+        results = []
+        ensureDeferred(middleware.process_request(request, None)).addCallback(results.append)
+        return results
+
+    ar_results = get_items(["B000000001", "B000000002"], "ar_AE")
+    en_results = get_items(["B000000002", "B000000001"], "en_AE")  # while the ar_AE request is in flight
+    assert [(r.paapi_data["ItemIds"], r.paapi_data["Resources"]) for r, _ in downloads] == [
+        (["B000000001", "B000000002"], RESOURCES),
+        (["B000000002", "B000000001"], ["ItemInfo.Title"]),
+    ]
+    assert downloads[1][0].headers["Accept-Language"] == b"en-AE"
+
+    for request, d in downloads:
+        d.callback(get_items_response(request))
+    assert [item["ItemInfo"]["Title"]["DisplayValue"] for item in en_results[0].items] == [
+        "B000000002 in en_AE",
+        "B000000001 in en_AE",
+    ]
+    assert en_results[0].items[0]["Offers"]["Listings"][0]["Price"]["Amount"] == 10.0
+    assert en_results[0].items[0]["DetailPageURL"].endswith("language=en_AE")
+    assert ar_results[0].items == get_items_response(ar_results[0].request).items
+
+    # Served from the cache without downloading
+    cached_results = get_items(["B000000001"], "en_AE")
+    assert len(downloads) == 2
+    assert cached_results[0].items[0]["ItemInfo"]["Title"]["DisplayValue"] == "B000000001 in en_AE"
+
+
+def test_cached_part_covers_resources():
+    middleware = PaapiLocalizationMiddleware.from_crawler(get_crawler())
+    middleware._cache.put("a", (frozenset(["ItemInfo.Title", "Images.Primary.Small"]), {"ASIN": "a"}))
+    assert middleware._get_part("a", frozenset(["ItemInfo.Title"])) == {"ASIN": "a"}
+    assert middleware._get_part("a", frozenset(["Offers.Listings.Price"])) is None
+    assert middleware._get_part("b", frozenset(["ItemInfo.Title"])) is None
+
+
+def test_accept_language_follows_languages_of_preference():
+    request = PaapiRequest.get_items("www.amazon.ae", "tag-21", ["B000000001"], languages_of_preference=["ar_AE"])
+    assert request.headers["Accept-Language"] == b"ar-AE"
+    assert request.replace(url=request.url).headers["Accept-Language"] == b"ar-AE"
+
+    replaced = request.replace(data=dict(request.paapi_data, LanguagesOfPreference=["en_AE"]))
+    assert replaced.headers["Accept-Language"] == b"en-AE"
+    replaced = request.replace(body=json.dumps(dict(request.paapi_data, LanguagesOfPreference=["en_AE"])))
+    assert replaced.headers["Accept-Language"] == b"en-AE"
+
+    request = PaapiRequest.get_items("www.amazon.ae", "tag-21", ["B000000001"], headers={"accept-language": "en-AE"})
+    assert request.headers.getlist("Accept-Language") == [b"en-AE"]
+    replaced = request.replace(data=dict(request.paapi_data, LanguagesOfPreference=["ar_AE"]))
+    assert replaced.headers.getlist("Accept-Language") == [b"en-AE"]
+
+    template = PaapiRequestTemplate("www.amazon.ae", "tag-21", "GetItems")
+    request = template.request({"ItemIds": ["B000000001"]}).replace(url=template.url)
+    replaced = request.replace(data=dict(request.paapi_data, LanguagesOfPreference=["ar_AE"]))
+    assert replaced.headers["Accept-Language"] == b"ar-AE"
+    assert PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"]).headers["Accept-Language"] == b"en-US"
+
+
+def test_template_headers_follow_data():
+    template = PaapiRequestTemplate("www.amazon.ae", "tag-21", "GetItems")
+
+    request = template.request({"ItemIds": ["B000000001"], "LanguagesOfPreference": ["ar_AE"]})
+    assert request.headers["Accept-Language"] == b"ar-AE"
+
+    request = template.request({"ItemIds": ["B000000001"]}, headers={b"accept-language": b"en-AE", "X-Foo": "bar"})
+    assert request.headers.getlist("Accept-Language") == [b"en-AE"]
+    assert request.headers["X-Foo"] == b"bar"
+
+    with pytest.raises(ValueError, match="Marketplace"):
+        template.request({"ItemIds": ["B000000001"], "Marketplace": "www.amazon.sa"})
@@ -0,0 +1,53 @@
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.middleware import PaapiMiddleware
+from scrapy_paapi.request import PaapiRequest, PaapiRequestTemplate
+
+
+def test_sign_request():
+    crawler = get_crawler(settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK"})
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    assert middleware.process_request(request, None) is None
+    assert request.headers["Authorization"].startswith(b"AWS4-HMAC-SHA256 Credential=AK/")
+    assert request.headers["Host"] == b"webservices.amazon.com"
+
+
+def test_credential_pool_retries_with_another_credential():
+    crawler = get_crawler(
+        settings_dict={
+            "AMAZON_CREDENTIALS": [
+                {"access_key": "AK1", "secret_key": "SK1", "partner_tag": "tag1-20"},
+                {"access_key": "AK2", "secret_key": "SK2", "partner_tag": "tag2-20"},
+            ]
+        }
+    )
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    request = middleware.process_request(request, None)  # rewrites PartnerTag
+    first_access_key = request.meta["paapi_access_key"]
+    assert request.paapi_data["PartnerTag"] == {"AK1": "tag1-20", "AK2": "tag2-20"}[first_access_key]
+    assert middleware.process_request(request, None) is None
+
+    body = b'{"__type": "com.amazon.paapi5#UnrecognizedClientException", "Errors": []}'
+    retry_request = middleware.process_response(request, Response(request.url, status=401, body=body), None)
+    assert retry_request.meta["paapi_failed_access_keys"] == [first_access_key]
+
+    retry_request = middleware.process_request(retry_request, None)
+    assert retry_request.meta["paapi_access_key"] != first_access_key
+
+
+def test_sign_request_from_template():
+    crawler = get_crawler(settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK"})
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    template = PaapiRequestTemplate("www.amazon.co.jp", "tag-22", "GetItems")
+    request = template.request({"ItemIds": ["B000000001"]}, meta={"foo": "bar"})
+    assert request.paapi_data == PaapiRequest.get_items("www.amazon.co.jp", "tag-22", ["B000000001"]).paapi_data
+    assert request.meta == {"foo": "bar", "paapi_operation": "GetItems"}
+
+    assert middleware.process_request(request, None) is None
+    assert b"/us-west-2/" in request.headers["Authorization"]
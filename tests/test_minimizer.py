@@ -0,0 +1,85 @@
+import json
+
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.minimizer import PaapiResourceMinimizerMiddleware, PaapiResourceMinimizerSpiderMiddleware
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse
+
+SETTINGS = {
+    "PAAPI_MINIMIZER_WARMUP": 1,
+    "SPIDER_MIDDLEWARES": {"scrapy_paapi.PaapiResourceMinimizerSpiderMiddleware": 100},
+}
+
+
+def parse_items(response):
+    for item in response.items:
+        yield {
+            "asin": item["ASIN"],
+            "title": item["ItemInfo"]["Title"]["DisplayValue"],
+            "price": dict(item["Offers"]["Listings"][0]["Price"]),
+        }
+
+
+def test_minimizer_narrows_resources():
+    crawler = get_crawler(settings_dict=SETTINGS)
+    middleware = PaapiResourceMinimizerMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], callback=parse_items)
+    assert middleware.process_request(request, None) is None
+    item = {
+        "ASIN": "B000000001",
+        "ItemInfo": {"Title": {"DisplayValue": "Title"}},
+        "Offers": {"Listings": [{"Price": {"Amount": 9.99, "Currency": "USD"}}]},
+    }
+    body = json.dumps({"ItemsResult": {"Items": [item]}}).encode()
+    response = GetItemsResponse(request.url, body=body, request=request)
+    response = middleware.process_response(request, response, None)
+    result = PaapiResourceMinimizerSpiderMiddleware().process_spider_output(response, parse_items(response), None)
+    assert next(result) == {"asin": "B000000001", "title": "Title", "price": {"Amount": 9.99, "Currency": "USD"}}
+
+    # Not narrowed until the callback has returned
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000002"], callback=parse_items)
+    assert middleware.process_request(request, None) is None
+    assert list(result) == []
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000003"], callback=parse_items)
+    narrowed_request = middleware.process_request(request, None)
+    assert narrowed_request.paapi_data["Resources"] == ["ItemInfo.Title", "Offers.Listings.Price"]
+    assert narrowed_request.meta["paapi_minimized"]
+    assert middleware.process_request(narrowed_request, None) is None
+
+
+def parse_json(response):
+    for item in response.json()["ItemsResult"]["Items"]:
+        yield {"asin": item["ASIN"], "title": item["ItemInfo"]["Title"]["DisplayValue"]}
+
+
+def test_minimizer_does_not_narrow_without_recorded_reads():
+    crawler = get_crawler(settings_dict=SETTINGS)
+    middleware = PaapiResourceMinimizerMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], callback=parse_json)
+    middleware.process_request(request, None)
+    body = json.dumps(
+        {"ItemsResult": {"Items": [{"ASIN": "B000000001", "ItemInfo": {"Title": {"DisplayValue": "Title"}}}]}}
+    ).encode()
+    response = middleware.process_response(request, GetItemsResponse(request.url, body=body, request=request), None)
+    list(PaapiResourceMinimizerSpiderMiddleware().process_spider_output(response, parse_json(response), None))
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000002"], callback=parse_json)
+    assert middleware.process_request(request, None) is None
+    assert "paapi_minimized" not in request.meta  # still recording
+
+
+def test_minimizer_counts_narrowed_response_without_full_responses():
+    crawler = get_crawler(settings_dict=SETTINGS)
+    middleware = PaapiResourceMinimizerMiddleware.from_crawler(crawler)
+
+    # e.g. restored from JOBDIR after a restart
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], meta={"paapi_minimized": True})
+    response = GetItemsResponse(request.url, body=b'{"ItemsResult": {"Items": []}}', request=request)
+    assert middleware.process_response(request, response, None) is response
+
+    assert crawler.stats.get_value("paapi/minimizer/narrowed_response_count") == 1
+    assert crawler.stats.get_value("paapi/minimizer/bytes_saved") == 0
@@ -0,0 +1,41 @@
+from scrapy_paapi.model import BrowseNode, Item, Price
+
+
+def test_item_from_dict_materializes_requested_branches():
+    item = Item.from_dict(
+        {
+            "ASIN": "B000000001",
+            "ItemInfo": {"Title": {"DisplayValue": "Title", "Label": "Title", "Locale": "en_US"}},
+            "Offers": {
+                "Listings": [
+                    {
+                        "Id": "listing",
+                        "IsBuyBoxWinner": True,
+                        "Price": {"Amount": 9.99, "Currency": "USD", "DisplayAmount": "$9.99"},
+                    }
+                ]
+            },
+        }
+    )
+
+    assert item.asin == "B000000001"
+    assert item.title == "Title"
+    assert item.buy_box_listing.price == Price(9.99, "USD", "$9.99")
+    assert {item.buy_box_listing.price, Price(9.99, "USD", "$9.99")} == {Price(9.99, "USD", "$9.99")}
+    assert item.brand is None
+    assert item.browse_nodes is None
+    assert item.primary_image is None
+
+
+def test_browse_node_from_dict():
+    node = BrowseNode.from_dict(
+        {
+            "Id": "2",
+            "DisplayName": "Child",
+            "Ancestor": {"Id": "1", "DisplayName": "Root"},
+            "Children": [{"Id": "3", "DisplayName": "Grandchild"}],
+        }
+    )
+
+    assert node.ancestor == BrowseNode("1", display_name="Root")
+    assert node.children == (BrowseNode("3", display_name="Grandchild"),)
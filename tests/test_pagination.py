@@ -0,0 +1,110 @@
+import json
+
+from scrapy.spidermiddlewares.httperror import HttpError
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import succeed
+
+from scrapy_paapi import pagination
+from scrapy_paapi.pagination import fetch_all_pages, iter_items_of_pages
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetVariationsResponse, PaapiErrorResponse, SearchItemsResponse
+from scrapy_paapi.retry import PaapiRetryMiddleware
+
+
+def make_response(request, item_count, total_result_count=None):
+    data = request.paapi_data
+    search_result = {"Items": [{"ASIN": f"B{data.get('ItemPage', 1):03d}{i:06d}"} for i in range(item_count)]}
+    if total_result_count is not None:
+        search_result["TotalResultCount"] = total_result_count
+    body = json.dumps({"SearchResult": search_result}).encode()
+    return SearchItemsResponse(request.url, body=body, request=request)
+
+
+def test_follow_all_pages():
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="test")
+
+    requests = make_response(request, 10, total_result_count=35).follow_all_pages()
+    assert [r.paapi_data["ItemPage"] for r in requests] == [2, 3, 4]
+    assert len(make_response(request, 10).follow_all_pages()) == 9
+    assert make_response(request, 5).follow_all_pages() == []
+
+
+def test_fetch_all_pages_discards_pages_past_the_last_page(monkeypatch):
+    def download(crawler, request, spider):
+        page = request.paapi_data["ItemPage"]
+        return succeed(make_response(request, 10 if page < 3 else 3 if page == 3 else 0))
+
+    monkeypatch.setattr(pagination, "download", download)
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="test")
+
+    results = []
+    fetch_all_pages(get_crawler(), make_response(request, 10)).addCallback(results.append)
+    responses = results[0]
+
+    assert [r.request.paapi_data.get("ItemPage", 1) for r in responses] == [1, 2, 3]
+    assert len(list(iter_items_of_pages(responses))) == 23
+
+
+def make_error_response(request, status, code):
+    body = json.dumps({"Errors": [{"Code": code, "Message": ""}]}).encode()
+    return PaapiErrorResponse(request.url, status=status, body=body, request=request)
+
+
+def test_fetch_all_pages_fails_on_error_page(monkeypatch):
+    def download(crawler, request, spider):
+        page = request.paapi_data["ItemPage"]
+        if page == 3:
+            return succeed(make_error_response(request, 429, "TooManyRequests"))
+        if page == 5:
+            return succeed(make_error_response(request, 404, "NoResults"))
+        return succeed(make_response(request, 10))
+
+    monkeypatch.setattr(pagination, "download", download)
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="test")
+
+    failures = []
+    fetch_all_pages(get_crawler(), make_response(request, 10)).addErrback(failures.append)
+    assert failures[0].check(HttpError)
+    assert failures[0].value.response.status == 429
+
+    # NoResults of a speculative page ends the pages
+    response = make_response(request.replace(data=dict(request.paapi_data, ItemPage=3)), 10)
+    results = []
+    fetch_all_pages(get_crawler(), response).addCallback(results.append)
+    assert [r.request.paapi_data.get("ItemPage", 1) for r in results[0]] == [3, 4]
+
+
+def test_get_variations_follow_all_pages():
+    request = PaapiRequest.get_variations("www.amazon.com", "tag-20", "B000000000")
+    body = json.dumps(
+        {"VariationsResult": {"Items": [], "VariationSummary": {"PageCount": 4, "VariationCount": 35}}}
+    ).encode()
+    response = GetVariationsResponse(request.url, body=body, request=request)
+
+    assert response.follow_next_page().paapi_data["VariationPage"] == 2
+    assert [r.paapi_data["VariationPage"] for r in response.follow_all_pages()] == [2, 3, 4]
+
+
+def test_next_pages_do_not_inherit_retry_state():
+    retry = PaapiRetryMiddleware.from_crawler(get_crawler())
+    request = PaapiRequest.get_variations("www.amazon.com", "tag-20", "B000000000", meta={"foo": "bar"})
+    request.meta.update(paapi_access_key="AK1", paapi_failed_access_keys=["AK1"])  # set by PaapiMiddleware
+    error_body = json.dumps({"__type": "com.amazon.paapi5#InternalFailureException", "Errors": []}).encode()
+    request = retry.process_response(request, PaapiErrorResponse(request.url, status=500, body=error_body), None)
+    assert request.meta["paapi_retry_times"] == 1
+
+    body = json.dumps({"VariationsResult": {"Items": [], "VariationSummary": {"PageCount": 3}}}).encode()
+    response = GetVariationsResponse(request.url, body=body, request=request)
+
+    for next_request in [response.follow_next_page()] + response.follow_all_pages():
+        assert next_request.meta == {"foo": "bar", "paapi_operation": "GetVariations"}
+
+
+def test_next_search_pages_do_not_inherit_retry_state():
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="test", meta={"foo": "bar"})
+    request.meta.update(paapi_retry_times=1, paapi_throttled=True, retry_times=2)
+
+    response = make_response(request, 10, total_result_count=35)
+
+    for next_request in [response.follow_next_page()] + response.follow_all_pages():
+        assert next_request.meta == {"foo": "bar", "paapi_operation": "SearchItems"}
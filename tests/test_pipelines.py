@@ -0,0 +1,54 @@
+import pytest
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.pipelines import ItemChangeStore, PaapiChangeDetectionPipeline
+
+
+def make_item(amount, title="Title"):
+    return {
+        "ASIN": "B000000001",
+        "DetailPageURL": "https://www.amazon.com/dp/B000000001",
+        "ItemInfo": {"Title": {"DisplayValue": title}},
+        "Offers": {"Listings": [{"Price": {"Amount": amount}}]},
+    }
+
+
+def test_change_detection(tmp_path):
+    crawler = get_crawler(settings_dict={"PAAPI_CHANGES_DB": str(tmp_path / "changes.sqlite3")})
+    pipeline = PaapiChangeDetectionPipeline.from_crawler(crawler)
+    pipeline.open_spider(None)
+
+    assert pipeline.process_item(make_item(10.0), None)["changes"] is None  # new item
+    with pytest.raises(DropItem):
+        pipeline.process_item(make_item(10.0), None)
+
+    original_item = make_item(12.5)
+    item = pipeline.process_item(original_item, None)
+    assert item["changes"] == {"Offers.Listings[0].Price.Amount": [10.0, 12.5]}
+    assert "changes" not in original_item  # e.g. an item of the cached response.json()
+    pipeline.close_spider(None)
+
+    # The state is kept across crawls
+    pipeline = PaapiChangeDetectionPipeline.from_crawler(crawler)
+    pipeline.open_spider(None)
+    with pytest.raises(DropItem):
+        pipeline.process_item(make_item(12.5), None)
+    pipeline.close_spider(None)
+
+
+def test_iter_stale_first(tmp_path):
+    store = ItemChangeStore(str(tmp_path / "changes.sqlite3"))
+    store.mark_changed("www.amazon.com", "B000000001", b"1", {}, now=0)
+    store.mark_changed("www.amazon.com", "B000000002", b"2", {}, now=0)
+    for now in range(1, 10):
+        store.mark_changed("www.amazon.com", "B000000001", b"1", {}, now=now)  # changes every time
+        store.mark_checked("www.amazon.com", "B000000002", now=now)
+    store.mark_changed("www.amazon.co.jp", "B000000003", b"3", {}, now=0)
+
+    assert list(store.iter_stale_first("www.amazon.com", now=10)) == [
+        ("www.amazon.com", "B000000001"),
+        ("www.amazon.com", "B000000002"),
+    ]
+    assert len(list(store.iter_stale_first(limit=2, now=10))) == 2
+    store.close()
@@ -0,0 +1,23 @@
+import json
+
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse, SearchItemsResponse
+
+
+def test_json_is_parsed_once():
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    body = json.dumps({"ItemsResult": {"Items": [{"ASIN": "B000000001"}]}}).encode()
+    response = GetItemsResponse(request.url, body=body, request=request)
+
+    assert response.json() is response.json()
+    assert list(response.iter_items()) == response.items == [{"ASIN": "B000000001"}]
+
+
+def test_search_items_follow_next_page():
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="test", item_page=2)
+    body = json.dumps({"SearchResult": {"Items": [{"ASIN": f"B00000000{i}"} for i in range(10)]}}).encode()
+    response = SearchItemsResponse(request.url, body=body, request=request)
+
+    next_request = response.follow_next_page()
+    assert next_request.paapi_data["ItemPage"] == 3
+    assert request.paapi_data["ItemPage"] == 2
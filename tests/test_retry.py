@@ -0,0 +1,114 @@
+import json
+
+import pytest
+from scrapy import Spider
+from scrapy.core.downloader.middleware import DownloaderMiddlewareManager
+from scrapy.http import Request, TextResponse
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import ensureDeferred
+
+from scrapy_paapi import batch
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse, PaapiErrorResponse
+from scrapy_paapi.retry import PaapiRetryMiddleware
+
+
+def make_error_response(request, status, code, message=""):
+    body = json.dumps(
+        {
+            "__type": f"com.amazon.paapi5#{code}Exception",
+            "Errors": [{"__type": "com.amazon.paapi5#ErrorData", "Code": code, "Message": message}],
+        }
+    ).encode()
+    return PaapiErrorResponse(request.url, status=status, body=body, request=request)
+
+
+def test_retry_throttled_request():
+    middleware = PaapiRetryMiddleware.from_crawler(get_crawler(settings_dict={"PAAPI_RETRY_BACKOFF_MAX": 5}))
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], headers={"Authorization": "x"})
+
+    retry_request = middleware.process_response(request, make_error_response(request, 429, "TooManyRequests"), None)
+
+    assert 0 <= retry_request.meta["paapi_retry_delay"] <= 2
+
+    assert retry_request.meta["paapi_retry_times"] == 1
+    assert "Authorization" not in retry_request.headers
+
+
+def test_retry_respects_dont_retry_and_max_retry_times():
+    middleware = PaapiRetryMiddleware.from_crawler(get_crawler())
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], meta={"dont_retry": True})
+    response = make_error_response(request, 429, "TooManyRequests")
+    assert middleware.process_response(request, response, None) is response
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], meta={"max_retry_times": 1})
+    retry_request = middleware.process_response(request, make_error_response(request, 429, "TooManyRequests"), None)
+    assert "dont_retry" not in retry_request.meta
+    response = make_error_response(retry_request, 429, "TooManyRequests")
+    assert middleware.process_response(retry_request, response, None) is response
+    assert retry_request.meta["dont_retry"]  # not retried by RetryMiddleware either
+
+
+@pytest.mark.filterwarnings("error:.*returned a Deferred")
+def test_batched_request_is_retried_once_as_a_whole(monkeypatch):
+    crawler = get_crawler(
+        settings_dict={
+            "AMAZON_ACCESS_KEY": "AK",
+            "AMAZON_SECRET_KEY": "SK",
+            "DOWNLOADER_MIDDLEWARES_BASE": {},
+            "DOWNLOADER_MIDDLEWARES": {
+                "scrapy_paapi.PaapiDedupMiddleware": 538,
+                "scrapy_paapi.PaapiBatchMiddleware": 540,
+                "scrapy_paapi.PaapiRetryMiddleware": 555,
+                "scrapy_paapi.PaapiThrottleMiddleware": 557,
+                "scrapy_paapi.PaapiMiddleware": 560,
+            },
+            "PAAPI_BATCH_LINGER": 60,
+            "PAAPI_RETRY_BACKOFF_BASE": 0,  # not to wait for the reactor
+            "PAAPI_THROTTLE_TPS": 100,
+        }
+    )
+    crawler.spider = Spider("test")
+    manager = DownloaderMiddlewareManager.from_crawler(crawler)
+    downloaded = []
+
+    async def download_func(request):
+        downloaded.append(request)
+        return make_error_response(request, 500, "InternalFailure").replace(cls=TextResponse)
+
+    async def fetch(request):
+        while True:  # as the engine schedules the requests returned by the middlewares
+            result = await manager.download_async(download_func, request)
+            if not isinstance(result, Request):
+                return result
+            request = result
+
+    monkeypatch.setattr(batch, "download", lambda crawler, request, spider: ensureDeferred(fetch(request)))
+    responses = []
+    for i in range(10):
+        request = PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000000{i}"])
+        ensureDeferred(fetch(request)).addCallback(responses.append)
+
+    assert len(downloaded) == 4  # PAAPI_RETRY_TIMES + 1
+    assert [r.status for r in responses] == [500] * 10
+    assert crawler.stats.get_value("paapi/retry/count") == 3
+    assert crawler.stats.get_value("paapi/retry/max_reached") == 1
+
+
+def test_permanent_error_strips_failed_item_ids():
+    middleware = PaapiRetryMiddleware.from_crawler(get_crawler())
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "INVALID"])
+
+    response = make_error_response(
+        request, 400, "InvalidParameterValue", "The ItemId INVALID provided in the request is invalid."
+    )
+    retry_request = middleware.process_response(request, response, None)
+    assert retry_request.paapi_data["ItemIds"] == ["B000000001"]
+
+    body = json.dumps({"ItemsResult": {"Items": [{"ASIN": "B000000001"}]}}).encode()
+    response = middleware.process_response(retry_request, GetItemsResponse(request.url, body=body), None)
+    assert response.errors[0]["Code"] == "InvalidParameterValue"
+
+    response = make_error_response(request, 400, "InvalidParameterValue", "Invalid Marketplace.")
+    assert middleware.process_response(request, response, None) is response
@@ -0,0 +1,41 @@
+import pytest
+from scrapy import Request
+from scrapy.squeues import FifoMemoryQueue
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.scheduler import PaapiFairPriorityQueue
+
+
+def test_fair_sharing_between_queues():
+    crawler = get_crawler(settings_dict={"PAAPI_SCHEDULER_WEIGHTS": {"SearchItems": 2}})
+    pqueue = PaapiFairPriorityQueue.from_crawler(crawler, FifoMemoryQueue, "")
+
+    for i in range(6):
+        pqueue.push(PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000000{i}"]))
+    for i in range(6):
+        pqueue.push(PaapiRequest.search_items("www.amazon.com", "tag-20", keywords=f"k{i}"))
+    pqueue.push(Request("https://example.com/"))
+    full_batch = PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000001{i}" for i in range(10)])
+    pqueue.push(full_batch)
+
+    assert len(pqueue) == 14
+    assert crawler.stats.get_value("paapi/scheduler/queue_depth/GetItems/www.amazon.com") == 7
+
+    popped = [pqueue.pop() for _ in range(6)]
+    assert popped[0] is full_batch
+    operations = [r.meta.get("paapi_operation", "other") for r in popped]
+    # SearchItems gets twice the share of GetItems and the other queue
+    assert operations.count("SearchItems") == 3
+    assert operations.count("GetItems") == 2  # including the full batch
+    assert operations.count("other") == 1
+
+    while pqueue.pop() is not None:
+        pass
+    assert len(pqueue) == 0
+
+
+def test_weights_must_be_positive():
+    crawler = get_crawler(settings_dict={"PAAPI_SCHEDULER_WEIGHTS": {"GetItems": 1, "SearchItems": 0}})
+    with pytest.raises(ValueError, match="SearchItems"):
+        PaapiFairPriorityQueue.from_crawler(crawler, FifoMemoryQueue, "")
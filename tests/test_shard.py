@@ -0,0 +1,73 @@
+from scrapy_paapi.shard import ConsistentHashRing, Shard, merge_outputs, merge_stats
+from scrapy_paapi.bucket import SharedTokenBucket
+
+
+def test_consistent_hash_ring_moves_keys_only_to_new_shard():
+    keys = [f"B{i:09d}" for i in range(10000)]
+    ring3 = ConsistentHashRing(3)
+    ring4 = ConsistentHashRing(4)
+
+    counts = [0] * 4
+    for key in keys:
+        shard = ring4.get_shard(key)
+        counts[shard] += 1
+        assert shard in (ring3.get_shard(key), 3)
+    assert min(counts) > 2000
+
+    shards = [Shard(i, 4) for i in range(4)]
+    assert all(sum(shard.owns(key) for shard in shards) == 1 for key in keys[:100])
+    assert Shard().owns("B000000001")
+
+
+def test_shared_token_bucket(tmp_path):
+    path = str(tmp_path / "bucket")
+    bucket1 = SharedTokenBucket(path, rate=1.0, capacity=2, now=0)
+    bucket2 = SharedTokenBucket(path, rate=1.0, capacity=2, now=0)  # another process
+
+    assert bucket1.reserve(now=0) == 0
+    assert bucket2.reserve(now=0) == 0
+    assert bucket1.reserve(now=0) == 1.0
+    assert bucket2.reserve(now=0) == 2.0
+
+    bucket1.rate = 2.0
+    assert bucket2.available(now=2) == 2.0
+    assert bucket2.adjust_rate(lambda rate: rate / 2, now=2) == 1.0
+    assert bucket1.rate == 1.0
+    bucket1.close()
+    bucket2.close()
+
+    # The configured rate replaces the one left by an earlier run
+    bucket3 = SharedTokenBucket(path, rate=5.0, capacity=2, now=3)
+    assert bucket3.rate == 5.0
+    bucket3.close()
+
+
+def test_merge_stats_and_outputs(tmp_path):
+    stats = merge_stats(
+        [
+            {"item_scraped_count": 3, "memusage/max": 100, "start_time": "2021-01-01T00:00:01", "finish_reason": "a"},
+            {"item_scraped_count": 4, "memusage/max": 200, "start_time": "2021-01-01T00:00:00", "finish_reason": "a"},
+            {"item_scraped_count": 5, "finish_reason": "shutdown"},
+        ]
+    )
+    assert stats == {
+        "item_scraped_count": 12,
+        "memusage/max": 200,
+        "start_time": "2021-01-01T00:00:00",
+        "finish_reason": "a,shutdown",
+    }
+
+    paths = []
+    for i in range(2):
+        path = tmp_path / f"output-{i}.csv"
+        path.write_text(f"asin\nB00000000{i}\n")
+        paths.append(str(path))
+    output = tmp_path / "items.csv"
+    assert merge_outputs(paths + [str(tmp_path / "missing.csv")], str(output)) == [str(output)]
+    assert output.read_text() == "asin\nB000000000\nB000000001\n"
+
+    # Named by the index of the worker even if an output is missing
+    path = tmp_path / "output-1.parquet"
+    path.write_bytes(b"PAR1")
+    paths = [str(tmp_path / "output-0.parquet"), str(path)]
+    assert merge_outputs(paths, str(tmp_path / "items.parquet")) == [str(tmp_path / "items-1.parquet")]
@@ -0,0 +1,38 @@
+import datetime
+
+from scrapy.http import Headers
+
+from scrapy_paapi.signer import Signer, getSignatureKey
+
+
+def test_authorization_headers():
+    signer = Signer("AK", "SK")
+    headers = Headers({"Host": "webservices.amazon.com", "Content-Type": "application/json", "X-Amz-Target": "x"})
+    auth_headers = signer.get_authorization_headers(
+        "us-east-1",
+        "POST",
+        "https://webservices.amazon.com/paapi5/getitems",
+        headers,
+        b'{"a":1}',
+        now=datetime.datetime(2021, 1, 2, 3, 4, 5),
+    )
+
+    assert auth_headers == {
+        "X-Amz-Date": "20210102T030405Z",
+        "Authorization": "AWS4-HMAC-SHA256 Credential=AK/20210102/us-east-1/ProductAdvertisingAPI/aws4_request, "
+        "SignedHeaders=content-type;host;x-amz-target, "
+        "Signature=72c7ce6a28220a7a24bd79fbe86cfe54e0b3e62905a1c18ba2f9b940ff197700",
+    }
+
+
+def test_signing_key_cache_rolls_over():
+    signer = Signer("AK", "SK", max_cached_keys=2)
+
+    _, key = signer.get_signing_key("20210102", "us-east-1")
+    assert key == getSignatureKey("SK", "20210102", "us-east-1", "ProductAdvertisingAPI")
+    signer.get_signing_key("20210102", "eu-west-1")
+    signer.get_signing_key("20210102", "us-west-2")
+    assert list(signer._scopes) == [("20210102", "eu-west-1"), ("20210102", "us-west-2")]
+
+    signer.get_signing_key("20210103", "us-east-1")
+    assert list(signer._scopes) == [("20210103", "us-east-1")]
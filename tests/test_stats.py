@@ -0,0 +1,51 @@
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+
+from scrapy_paapi.middleware import PaapiMiddleware
+from scrapy_paapi.prometheus import render_metrics
+from scrapy_paapi.request import PaapiRequest
+
+
+def test_record_stats_of_calls():
+    crawler = get_crawler(settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK"})
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001", "B000000002"])
+    middleware.process_request(request, None)
+    request.meta["download_latency"] = 0.3
+    body = b'{"ItemsResult": {"Items": [{"ASIN": "B000000001"}]}, "Errors": [{"Code": "InvalidParameterValue"}]}'
+    response = middleware.process_response(request, Response(request.url, body=body, request=request), None)
+    assert response.json()["ItemsResult"]["Items"][0]["ASIN"] == "B000000001"
+
+    stats = crawler.stats.get_stats()
+    assert stats["paapi/sign_seconds/count"] == 1
+    assert "paapi/latency_seconds/GetItems/webservices.amazon.com/le_0.25" not in stats
+    assert stats["paapi/latency_seconds/GetItems/webservices.amazon.com/le_0.5"] == 1
+    assert stats["paapi/latency_seconds/GetItems/webservices.amazon.com/le_inf"] == 1
+    assert stats["paapi/response_bytes/GetItems"] == len(body)
+    assert stats["paapi/item_count/GetItems"] == 1
+    assert stats["paapi/get_items/fill_ratio"] == 0.2
+    assert stats["paapi/error_count/InvalidParameterValue"] == 1
+
+    metrics = render_metrics(stats)
+    assert "# TYPE paapi_latency_seconds histogram\n" in metrics
+    assert 'paapi_latency_seconds_bucket{operation="GetItems",host="webservices.amazon.com",le="+Inf"} 1\n' in metrics
+    assert 'paapi_item_count_total{operation="GetItems"} 1\n' in metrics
+    assert "paapi_get_items_fill_ratio 0.2\n" in metrics
+    buckets = [line for line in metrics.splitlines() if line.startswith("paapi_latency_seconds_bucket")]
+    assert [line.split('le="')[1].split('"')[0] for line in buckets] == ["0.5", "1.0", "2.5", "5.0", "10.0", "+Inf"]
+    assert 'paapi_error_count_total{code="InvalidParameterValue"} 1\n' in metrics
+
+
+def test_error_response_stats():
+    crawler = get_crawler(settings_dict={"AMAZON_ACCESS_KEY": "AK", "AMAZON_SECRET_KEY": "SK"})
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.search_items("www.amazon.com", "tag-20", keywords="foo")
+    middleware.process_request(request, None)
+    body = b'{"__type": "com.amazon.paapi5#TooManyRequestsException", "Errors": []}'
+    middleware.process_response(request, Response(request.url, status=429, body=body, request=request), None)
+
+    stats = crawler.stats.get_stats()
+    assert stats["paapi/response_count/SearchItems/429"] == 1
+    assert stats["paapi/error_count/TooManyRequests"] == 1
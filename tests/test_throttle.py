@@ -0,0 +1,165 @@
+from scrapy.http import Response
+from scrapy.utils.test import get_crawler
+from twisted.internet.defer import ensureDeferred
+
+from scrapy_paapi.bucket import TokenBucket
+from scrapy_paapi.middleware import PaapiMiddleware
+from scrapy_paapi.request import PaapiRequest
+from scrapy_paapi.response import GetItemsResponse, PaapiErrorResponse
+from scrapy_paapi.retry import PaapiRetryMiddleware
+from scrapy_paapi.throttle import PaapiThrottleMiddleware
+from scrapy_paapi.utils import get_reactor
+
+DELAYED = "delayed"
+
+
+def test_token_bucket_spaces_out_reservations():
+    bucket = TokenBucket(rate=2, capacity=2, now=0)
+
+    assert [bucket.reserve(now=0) for _ in range(4)] == [0, 0, 0.5, 1.0]
+    assert bucket.reserve(now=10) == 0
+    assert bucket.available(now=10) == 1
+
+
+def process_request(middleware, request):
+    """
+    Returns the result of process_request(), or DELAYED if it waits. The wait is cancelled, as no reactor runs.
+    """
+
+    get_reactor()  # installed for maybe_deferred_to_future
+    results = []
+    d = ensureDeferred(middleware.process_request(request, None))
+    d.addBoth(results.append)
+    if results:
+        return results[0]
+    d.cancel()
+    return DELAYED
+
+
+def make_throttle(**settings):
+    crawler = get_crawler(settings_dict=dict(settings, AMAZON_ACCESS_KEY="AK", AMAZON_SECRET_KEY="SK"))
+    return crawler, PaapiThrottleMiddleware.from_crawler(crawler)
+
+
+def test_throttle_delays_requests_over_tps():
+    crawler, throttle = make_throttle(PAAPI_THROTTLE_TPS=2)
+    requests = [PaapiRequest.get_items("www.amazon.com", "tag-20", [f"B00000000{i}"]) for i in range(3)]
+
+    results = [process_request(throttle, request) for request in requests]
+
+    assert results[:2] == [None, None]
+    assert results[2] == DELAYED
+    assert crawler.stats.get_value("paapi/throttle/delayed_count") == 1
+    assert 0 < crawler.stats.get_value("paapi/throttle/delay_seconds") <= 0.5
+
+
+def test_throttle_halves_tps_on_too_many_requests():
+    crawler, throttle = make_throttle(PAAPI_THROTTLE_TPS=10)
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    process_request(throttle, request)
+    quota = throttle._get_quota(request)
+
+    response = PaapiErrorResponse(request.url, status=429, body=b"{}", request=request)
+    assert throttle.process_response(request, response, None) is response
+    assert quota.per_second.rate == 5
+    assert crawler.stats.get_value("paapi/throttle/too_many_requests") == 1
+
+    for _ in range(3):
+        throttle.process_response(request, PaapiErrorResponse(request.url, status=429, body=b"{}"), None)
+    assert quota.per_second.rate == 1  # PAAPI_THROTTLE_TPS * 0.1 at least
+
+    for _ in range(30):
+        throttle.process_response(request, GetItemsResponse(request.url, body=b"{}"), None)
+    assert quota.per_second.rate == 10  # recovered, but not above PAAPI_THROTTLE_TPS
+
+
+def test_throttle_quotas_per_partner_tag():
+    _, throttle = make_throttle(PAAPI_THROTTLE_TPS=1, PAAPI_THROTTLE_QUOTAS={"fast-20": {"tps": 5, "tpd": 100}})
+
+    fast_results = [
+        process_request(throttle, PaapiRequest.get_items("www.amazon.com", "fast-20", ["B000000001"])) for _ in range(5)
+    ]
+    slow_results = [
+        process_request(throttle, PaapiRequest.get_items("www.amazon.com", "slow-20", ["B000000001"])) for _ in range(2)
+    ]
+
+    assert fast_results == [None] * 5
+    assert slow_results[0] is None
+    assert slow_results[1] == DELAYED
+
+    fast_quota = throttle._get_quota(PaapiRequest.get_items("www.amazon.com", "fast-20", ["B000000001"]))
+    assert fast_quota.per_day.capacity == 100
+
+
+def test_throttle_spreads_requests_over_credentials():
+    crawler = get_crawler(
+        settings_dict={
+            "AMAZON_CREDENTIALS": [
+                {"access_key": "AK1", "secret_key": "SK1", "partner_tag": "tag1-20", "tps": 1},
+                {"access_key": "AK2", "secret_key": "SK2", "partner_tag": "tag2-20", "tps": 1},
+            ]
+        }
+    )
+    throttle = PaapiThrottleMiddleware.from_crawler(crawler)
+    middleware = PaapiMiddleware.from_crawler(crawler)
+
+    requests = []
+    for item_id in ["B000000001", "B000000002"]:
+        request = PaapiRequest.get_items("www.amazon.com", "tag1-20", [item_id])
+        rewritten_request = process_request(throttle, request)
+        if rewritten_request is not None:  # PartnerTag of the credential
+            request = rewritten_request
+            assert process_request(throttle, request) is None  # the quota is reserved only once
+        assert middleware.process_request(request, None) is None
+        requests.append(request)
+
+    assert [r.meta["paapi_access_key"] for r in requests] == ["AK1", "AK2"]
+    assert [r.paapi_data["PartnerTag"] for r in requests] == ["tag1-20", "tag2-20"]
+    assert crawler.stats.get_value("paapi/credentials/1/request_count") == 1
+
+    # Both quotas are used up
+    result = process_request(throttle, PaapiRequest.get_items("www.amazon.com", "tag1-20", ["B000000003"]))
+    if isinstance(result, PaapiRequest):
+        result = process_request(throttle, result)
+    assert result == DELAYED
+
+
+def test_too_many_requests_is_seen_by_throttle_before_switching_credentials():
+    crawler = get_crawler(
+        settings_dict={
+            "AMAZON_CREDENTIALS": [
+                {"access_key": "AK1", "secret_key": "SK1", "partner_tag": "tag-20", "tps": 10},
+                {"access_key": "AK2", "secret_key": "SK2", "partner_tag": "tag-20", "tps": 10},
+            ],
+            "PAAPI_RETRY_BACKOFF_BASE": 0,
+        }
+    )
+    middleware = PaapiMiddleware.from_crawler(crawler)
+    retry = PaapiRetryMiddleware.from_crawler(crawler)
+    throttle = PaapiThrottleMiddleware.from_crawler(crawler)
+
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"])
+    assert process_request(throttle, request) is None
+    assert middleware.process_request(request, None) is None
+    first_access_key = request.meta["paapi_access_key"]
+    quota = throttle._get_quota(request)
+
+    body = b'{"__type": "com.amazon.paapi5#TooManyRequestsException", "Errors": []}'
+    response = middleware.process_response(request, Response(request.url, status=429, body=body), None)
+    response = throttle.process_response(request, response, None)
+    assert quota.per_second.rate == 5
+
+    retry_request = retry.process_response(request, response, None)
+    assert process_request(throttle, retry_request) is None
+    assert retry_request.meta["paapi_access_key"] != first_access_key
+
+
+def test_throttle_delays_retried_request():
+    crawler, throttle = make_throttle()
+    request = PaapiRequest.get_items("www.amazon.com", "tag-20", ["B000000001"], meta={"paapi_retry_delay": 2.0})
+
+    result = process_request(throttle, request)
+
+    assert result == DELAYED
+    assert "paapi_retry_delay" not in request.meta
+    assert crawler.stats.get_value("paapi/throttle/delay_seconds") == 2.0
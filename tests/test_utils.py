@@ -0,0 +1,31 @@
+from scrapy_paapi.utils import KeyPrefixes, TimeBoundedCache, TimeBoundedSet
+
+
+def test_time_bounded_cache():
+    cache = TimeBoundedCache(ttl=10, max_size=100)
+    cache.put("a", {"ASIN": "a"}, now=0)
+    assert cache.get("a", now=5) == {"ASIN": "a"}
+    assert cache.get("a", now=15) is None
+    assert cache.get("b", now=5) is None
+
+
+def test_time_bounded_set():
+    recent = TimeBoundedSet(ttl=10, max_size=2)
+    recent.add("a", now=0)
+    recent.add("b")
+    recent.add("c")
+    assert len(recent) == 2
+    assert "a" not in recent
+    assert "c" in recent
+
+    recent = TimeBoundedSet(ttl=10, max_size=100)
+    recent.add("a", now=0)
+    recent.add("b", now=20)
+    assert len(recent) == 1
+
+
+def test_key_prefixes():
+    prefixes = KeyPrefixes()
+    assert prefixes.get("https://example.com {}") == "0 "
+    assert prefixes.get('https://example.com {"Condition": "New"}') == "1 "
+    assert prefixes.get("https://example.com {}") == "0 "